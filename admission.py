@@ -0,0 +1,115 @@
+# admission.py
+
+import threading
+import time
+from collections import OrderedDict
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate      # tokens refilled per second
+        self.burst = burst    # bucket capacity
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.quiet_until = 0.0  # end of the wait the source was last told to back off for
+
+    def allow(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def charge(self, cost):
+        # Spend tokens already used up; the debt is capped at one burst.
+        self.tokens = max(-self.burst, self.tokens - cost)
+
+    def retry_after(self):
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+class AdmissionControl:
+    """Per-source token buckets in front of the tracker's bounded ingress queue.
+
+    Buckets are keyed by the sender's (ip, port). The table is capped; the
+    least recently seen sources are forgotten first, which only ever gives
+    them a fresh (full) bucket.
+
+    A multi-session client (sessions.py) runs many players behind one
+    source, so they all share its bucket. Each session the tracker has
+    registered from that source also gets a smaller bucket of its own
+    (``add_session``), so one busy session cannot use up the source's
+    whole allowance. Session buckets only ever refuse more: a request must
+    pass both, and naming a session that was not registered from the
+    source changes nothing.
+    """
+
+    def __init__(self, rate=50.0, burst=100, max_sources=10000, session_rate=10.0, session_burst=20):
+        self.rate = rate
+        self.burst = burst
+        self.max_sources = max_sources
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.buckets = OrderedDict()
+        self.sessions = OrderedDict()  # (addr, session) -> TokenBucket, for sessions registered from addr
+        self.lock = threading.Lock()
+        self.counters = {"admitted": 0, "rate_limited": 0, "shed": 0}
+
+    def admit(self, addr, session=None):
+        """Decide on one datagram from ``addr``, naming ``session`` if it does.
+
+        Returns ``(True, 0)`` when it may be queued. Otherwise returns
+        ``(False, retry_after)``; ``retry_after`` is 0 when the source was
+        already told to back off and that wait is not over yet, so a flood
+        is dropped silently instead of being answered packet for packet.
+        """
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(addr)
+            if bucket is None:
+                bucket = self.buckets[addr] = TokenBucket(self.rate, self.burst)
+                if len(self.buckets) > self.max_sources:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(addr)
+            limited = bucket
+            session_bucket = self.sessions.get((addr, session)) if session is not None else None
+            if session_bucket is None or session_bucket.allow(now):
+                if bucket.allow(now):
+                    self.counters["admitted"] += 1
+                    return True, 0
+                if session_bucket is not None:
+                    session_bucket.tokens += 1  # refused by the source's bucket: not spent
+            else:
+                limited = session_bucket
+            self.counters["rate_limited"] += 1
+            retry_after = limited.retry_after()
+            # Only a source that comes back before the wait it was given is
+            # ignored. One that waited but lost the new tokens to other
+            # traffic (heartbeat batches) is told again rather than timing out.
+            if now < limited.quiet_until:
+                return False, 0
+            limited.quiet_until = now + retry_after
+            return False, retry_after
+
+    def add_session(self, addr, session):
+        """Give ``session``, just registered from ``addr``, a bucket of its own within the source's."""
+        with self.lock:
+            self.sessions[(addr, session)] = TokenBucket(self.session_rate, self.session_burst)
+            self.sessions.move_to_end((addr, session))
+            if len(self.sessions) > self.max_sources:
+                self.sessions.popitem(last=False)
+
+    def charge(self, addr, cost, session=None):
+        """Spend ``cost`` extra tokens for ``addr`` (e.g. the other commands of a batch)."""
+        with self.lock:
+            for bucket in (self.buckets.get(addr), self.sessions.get((addr, session))):
+                if bucket is not None:
+                    bucket.charge(cost)
+
+    def record_shed(self):
+        with self.lock:
+            self.counters["shed"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters, sources=len(self.buckets), sessions=len(self.sessions))
@@ -0,0 +1,221 @@
+# ai.py
+
+import os
+import random
+import time
+from collections import namedtuple
+from common import CARD_POINTS, DECK_SIZE, score_card_ids, shoe_decks
+
+TURN_BUDGET = float(os.environ.get('CARDGAME_AI_BUDGET', 0.5))  # seconds of thinking per turn
+CHUNK_ROLLOUTS = 200   # rollouts per worker task; small enough to stop close to the budget
+
+# What one seat can see when it is its turn. Card ids at face-down positions
+# of ``cards`` are ignored; the engine never looks at them.
+TurnView = namedtuple('TurnView', [
+    'cards',       # own six card ids, row-major
+    'face_up',     # own 6-bit face-up mask
+    'others',      # tuple of (username, cards, face_up) for the other seats
+    'discard',     # discard pile as card ids, top last
+    'allow_steal',
+    'hole',        # hole number, so per-hole memory can be reset
+])
+
+Decision = namedtuple('Decision', ['action', 'expected', 'rollouts', 'elapsed', 'rollouts_per_s'])
+
+def face_down(mask):
+    return [pos for pos in range(6) if not mask >> pos & 1]
+
+def unseen_cards(view):
+    """Every card id this seat cannot see: the shoe minus visible hands and the discard pile.
+
+    With a multi-deck shoe an id is listed once for each copy not seen.
+    """
+    seen = [0] * DECK_SIZE
+    for pos in range(6):
+        if view.face_up >> pos & 1:
+            seen[view.cards[pos]] += 1
+    for _, cards, mask in view.others:
+        for pos in range(6):
+            if mask >> pos & 1:
+                seen[cards[pos]] += 1
+    for card in view.discard:
+        seen[card] += 1
+    decks = shoe_decks(len(view.others) + 1)
+    return [card for card in range(DECK_SIZE) for _ in range(decks - seen[card])]
+
+def estimate(cards, known, mean):
+    """Expected hand score with unknown positions valued at ``mean``; a column pairs only if both cards are known."""
+    total = 0.0
+    for col in range(3):
+        top, bottom = col, col + 3
+        if known[top] and known[bottom]:
+            if cards[top] % 13 != cards[bottom] % 13:
+                total += CARD_POINTS[cards[top]] + CARD_POINTS[cards[bottom]]
+        else:
+            total += (CARD_POINTS[cards[top]] if known[top] else mean) + (CARD_POINTS[cards[bottom]] if known[bottom] else mean)
+    return total
+
+def best_placement(cards, face_up, card, mean):
+    """Position at which to keep ``card`` (None to discard it), judged by the expected hand score."""
+    known = [bool(face_up >> pos & 1) for pos in range(6)]
+    best_pos, best_score = None, estimate(cards, known, mean)
+    for pos in range(6):
+        trial, trial_known = list(cards), list(known)
+        trial[pos], trial_known[pos] = card, True
+        score = estimate(trial, trial_known, mean)
+        if score < best_score:
+            best_pos, best_score = pos, score
+    return best_pos
+
+def candidate_actions(view, held=()):
+    """Every legal turn; steals of cards in ``held`` (ones we already had) are left out."""
+    actions = [('stock',)]
+    if view.discard:
+        actions += [('discard', pos) for pos in range(6)]
+    if view.allow_steal:
+        own_down = face_down(view.face_up)
+        for name, cards, mask in view.others:
+            for target_pos in range(6):
+                if mask >> target_pos & 1 and cards[target_pos] not in held:
+                    actions += [('steal', name, target_pos, own_pos) for own_pos in own_down]
+    return actions
+
+def run_rollouts(view, actions, rollouts, seed):
+    """Worker task: total final-hand score of each action over ``rollouts`` sampled deals of the unseen cards."""
+    rng = random.Random(seed)
+    unseen = unseen_cards(view)
+    mean = sum(CARD_POINTS[card] for card in unseen) / len(unseen) if unseen else 0.0
+    hidden = face_down(view.face_up)
+    others = {name: cards for name, cards, _ in view.others}
+    totals = [0] * len(actions)
+    for _ in range(rollouts):
+        # One possible world: our face-down cards and the next stock card.
+        sample = rng.sample(unseen, min(len(unseen), len(hidden) + 1))
+        world = list(view.cards)
+        for pos, card in zip(hidden, sample):
+            world[pos] = card
+        drawn = sample[len(hidden)] if len(sample) > len(hidden) else None
+        for index, action in enumerate(actions):
+            hand = list(world)
+            if action[0] == 'stock':
+                if drawn is not None:
+                    pos = best_placement(view.cards, view.face_up, drawn, mean)
+                    if pos is not None:
+                        hand[pos] = drawn
+            elif action[0] == 'discard':
+                hand[action[1]] = view.discard[-1]
+            else:
+                _, name, target_pos, own_pos = action
+                hand[own_pos] = others[name][target_pos]
+            totals[index] += score_card_ids(hand)
+    return totals
+
+class MonteCarloAI:
+    """Chooses a turn by Monte-Carlo rollouts over the cards this seat has not seen.
+
+    Every candidate (draw from stock, take the discard into each position,
+    each possible steal) is scored on the same sampled worlds with the
+    game's own scoring (card points, matching columns score zero); the
+    lowest average wins. Rollouts run in chunks on a process pool until
+    the per-turn time budget is spent.
+
+    Stealing is not limited by the rules, and a one-turn lookahead would
+    happily pass a low card around the table forever. The engine therefore
+    never steals back a card it has already held face-up in the current
+    hole, so each card can change hands only a bounded number of times.
+
+    With ``workers=0`` rollouts run inline in the calling thread, which is
+    cheaper for bots and benchmarks running many seats in one process.
+    """
+
+    def __init__(self, workers=None, budget=TURN_BUDGET):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.budget = budget
+        self.pool = None
+        self.rng = random.Random()
+        self.stats = {"turns": 0, "rollouts": 0, "seconds": 0.0}
+        self.hole = None
+        self.held = set()  # card ids we have had face-up this hole
+
+    def remember(self, view):
+        if view.hole != self.hole:
+            self.hole = view.hole
+            self.held = set()
+        self.held.update(view.cards[pos] for pos in range(6) if view.face_up >> pos & 1)
+
+    def decide(self, view):
+        self.remember(view)
+        actions = candidate_actions(view, self.held)
+        if len(actions) == 1:
+            return Decision(actions[0], None, 0, 0.0, 0.0)
+        if self.workers == 0:
+            return self.decide_inline(view, actions)
+        # Imported here: the pool machinery is most of this module's import
+        # cost, and inline engines and human players never need it.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+        if self.pool is None:
+            # spawn: players are multi-threaded, and forking a threaded process is unsafe
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        start = time.perf_counter()
+        deadline = start + self.budget
+        totals = [0] * len(actions)
+        rollouts = 0
+        pending = set()
+        while True:
+            while len(pending) < self.workers and time.perf_counter() < deadline:
+                pending.add(self.pool.submit(run_rollouts, view, actions, CHUNK_ROLLOUTS, self.rng.getrandbits(64)))
+            if not pending:
+                break
+            remaining = deadline - time.perf_counter()
+            # Past the budget without a single result (e.g. the pool is still
+            # starting): block for the first chunk rather than spin.
+            timeout = max(0.0, remaining) if rollouts or remaining > 0 else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                totals = [a + b for a, b in zip(totals, future.result())]
+                rollouts += CHUNK_ROLLOUTS
+            if rollouts and time.perf_counter() >= deadline:
+                # Chunks still running finish in the background; their results are dropped.
+                for future in pending:
+                    future.cancel()
+                break
+        return self.choose(view, actions, totals, rollouts, time.perf_counter() - start)
+
+    def decide_inline(self, view, actions):
+        start = time.perf_counter()
+        deadline = start + self.budget
+        totals = [0] * len(actions)
+        rollouts = 0
+        seed = self.rng.getrandbits(64)
+        while not rollouts or time.perf_counter() < deadline:
+            # Smaller chunks inline so the budget is respected more closely
+            chunk = run_rollouts(view, actions, CHUNK_ROLLOUTS // 10, seed + rollouts)
+            totals = [a + b for a, b in zip(totals, chunk)]
+            rollouts += CHUNK_ROLLOUTS // 10
+        return self.choose(view, actions, totals, rollouts, time.perf_counter() - start)
+
+    def choose(self, view, actions, totals, rollouts, elapsed):
+        best = min(range(len(actions)), key=totals.__getitem__)
+        if actions[best][0] == 'steal':
+            # It may be stolen from us before our next turn; remember it now.
+            _, name, target_pos, _ = actions[best]
+            self.held.add(next(cards for other, cards, _ in view.others if other == name)[target_pos])
+        self.stats["turns"] += 1
+        self.stats["rollouts"] += rollouts
+        self.stats["seconds"] += elapsed
+        return Decision(actions[best], totals[best] / rollouts, rollouts, elapsed, rollouts / elapsed if elapsed else 0.0)
+
+    def place(self, view, card):
+        """Where to put a card just drawn from the stock (None discards it)."""
+        unseen = [c for c in unseen_cards(view) if c != card]
+        mean = sum(CARD_POINTS[c] for c in unseen) / len(unseen) if unseen else 0.0
+        return best_placement(view.cards, view.face_up, card, mean)
+
+    def rollouts_per_second(self):
+        return self.stats["rollouts"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
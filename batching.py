@@ -0,0 +1,72 @@
+# batching.py
+
+import json
+import threading
+import time
+
+BATCH_MAX_COMMANDS = 256    # the tracker's MAX_BATCH
+BATCH_MAX_BYTES = 12000     # encoded envelope size, safely under the tracker's 16 KiB receive buffer
+
+def split_batches(msgs):
+    """Group messages into batch envelopes within the command and size limits, keeping their order."""
+    batches, current, size = [], [], 0
+    for msg in msgs:
+        encoded = len(json.dumps(msg)) + 2
+        if current and (len(current) == BATCH_MAX_COMMANDS or size + encoded > BATCH_MAX_BYTES):
+            batches.append(current)
+            current, size = [], 0
+        current.append(msg)
+        size += encoded
+    if current:
+        batches.append(current)
+    return [{"command": "batch", "commands": batch} for batch in batches]
+
+class AutoBatcher:
+    """Coalesces tracker requests made close together, from any number of threads, into batch envelopes.
+
+    ``request`` queues a message and blocks until its response arrives.
+    The first request of a burst waits ``window`` seconds for company,
+    then everything queued goes out through ``send_batch`` (a callable
+    taking a list of messages and returning their responses in order).
+    Only one batch is in flight at a time; requests arriving meanwhile
+    form the next one.
+    """
+
+    def __init__(self, send_batch, window=0.002):
+        self.send_batch = send_batch
+        self.window = window
+        self.lock = threading.Lock()
+        self.queued = []       # [msg, event, response] waiting for the next batch
+        self.flushing = False
+        self.stats = {"requests": 0, "batches": 0}
+
+    def request(self, msg):
+        entry = [msg, threading.Event(), None]
+        with self.lock:
+            self.queued.append(entry)
+            self.stats["requests"] += 1
+            leader = not self.flushing
+            self.flushing = True
+        if leader:
+            self.flush()
+        entry[1].wait()
+        return entry[2]
+
+    def flush(self):
+        # Runs on the thread whose request opened the batch.
+        time.sleep(self.window)
+        while True:
+            with self.lock:
+                entries, self.queued = self.queued, []
+                if not entries:
+                    self.flushing = False
+                    return
+            try:
+                responses = self.send_batch([entry[0] for entry in entries])
+            except Exception as e:
+                print(f"DEBUG: Batched tracker request failed: {e}")
+                responses = [None] * len(entries)
+            self.stats["batches"] += 1
+            for entry, response in zip(entries, responses):
+                entry[2] = response
+                entry[1].set()
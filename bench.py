@@ -0,0 +1,1128 @@
+# bench.py
+"""Local benchmarks. Usage: python bench.py <scenario> [--out results.json] [--baseline old.json]"""
+
+import argparse
+import collections
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import tracemalloc
+import subprocess
+import sys
+import threading
+import time
+from transport import StreamClient, BufferPool, recv_datagram, decode_json
+from chunking import Chunker, Reassembler, is_chunk, is_nack, REASSEMBLY_TIMEOUT
+from batching import AutoBatcher, split_batches
+
+TRACKER_PORT = 1750
+UNIX_PATH = "/tmp/cardgame-bench.sock"
+PLAYER_BASE_PORT = 1900   # headless players bind consecutive t/p ports from here (group 1 range)
+STARTUP_BUDGET_MS = 100   # interpreter start to a constructed Player, median of cold processes
+
+# Run in a fresh interpreter by the startup scenario: import player and build one Player.
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import player
+imported = time.perf_counter()
+p = player.Player('127.0.0.1', int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]), 1)
+built = time.perf_counter()
+p.get_local_ip()
+print(json.dumps({"import_s": imported - started, "construct_s": built - imported,
+                  "local_ip_s": time.perf_counter() - built}))
+"""
+
+# Run in its own process by the dealer scenario: a headless AI dealer the benchmark can kill.
+DEALER_SCRIPT = """
+import sys
+import player
+from ai import MonteCarloAI
+player.HOLE_PAUSE = 0
+p = player.Player('127.0.0.1', int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]), 1)
+p.ai = MonteCarloAI(workers=0, budget=float(sys.argv[5]))
+p.register(sys.argv[4])
+p.run(interactive=False)
+"""
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p90_ms": pick(0.90),
+            "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
+
+def start_tracker(port, *extra):
+    proc = subprocess.Popen([sys.executable, "tracker.py", str(port), *extra],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(0.2)
+    deadline = time.time() + 10
+    try:
+        while time.time() < deadline:
+            try:
+                sock.sendto(json.dumps({"command": "metrics"}).encode(), ("127.0.0.1", port))
+                sock.recvfrom(65535)
+                return proc
+            except OSError:
+                continue
+    finally:
+        sock.close()
+    proc.kill()
+    raise RuntimeError(f"tracker did not come up on port {port}")
+
+reply_chunks = {}  # socket -> Reassembler, one per socket since each starts a timer thread
+reply_chunks_lock = threading.Lock()
+
+def request(sock, msg, addr):
+    start = time.perf_counter()
+    sock.sendto(json.dumps(msg).encode(), addr)
+    data, _ = sock.recvfrom(65535)
+    if is_chunk(data):
+        # Large replies arrive in chunks (chunking.py)
+        with reply_chunks_lock:
+            chunks = reply_chunks.get(sock)
+            if chunks is None:
+                chunks = reply_chunks[sock] = Reassembler(sock)
+        while (data := chunks.add(data, addr)) is None:
+            data, _ = sock.recvfrom(65535)
+    return json.loads(data.decode()), time.perf_counter() - start
+
+def tracker_metrics(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(2)
+        response, _ = request(sock, {"command": "metrics"}, ("127.0.0.1", port))
+        return response
+
+def polite_client(port, rate, stop, latencies, outcomes):
+    """Issue query_players at a steady ``rate`` and record each round trip."""
+    addr = ("127.0.0.1", port)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(1.0)
+        interval = 1.0 / rate
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                response, latency = request(sock, {"command": "query_players"}, addr)
+                latencies.append(latency)
+                status = response.get("status")
+                outcomes[status] = outcomes.get(status, 0) + 1
+            except socket.timeout:
+                outcomes["timeout"] = outcomes.get("timeout", 0) + 1
+            time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+def flood_client(port, rate, duration, sent, payload=None):
+    """Send ``payload`` (default query_players) from one address at ``rate`` datagrams/s, never reading replies."""
+    payload = payload or json.dumps({"command": "query_players"}).encode()
+    addr = ("127.0.0.1", port)
+    count = 0
+    start = time.perf_counter()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        while (elapsed := time.perf_counter() - start) < duration:
+            if count >= elapsed * rate:
+                time.sleep(0.001)
+                continue
+            try:
+                sock.sendto(payload, addr)
+                count += 1
+            except BlockingIOError:
+                time.sleep(0.001)
+    sent.value = count
+
+def run_clients(port, clients, rate, abusers, abuse_rate, duration):
+    # Abusers run in their own processes so they do not steal the GIL from the
+    # measuring threads.
+    stop = threading.Event()
+    latencies, outcomes = [], {}
+    threads = [threading.Thread(target=polite_client, args=(port, rate, stop, latencies, outcomes))
+               for _ in range(clients)]
+    floods = [(multiprocessing.Process(target=flood_client, args=(port, abuse_rate, duration, sent)), sent)
+              for sent in (multiprocessing.Value("q", 0) for _ in range(abusers))]
+    for proc, _ in floods:
+        proc.start()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    for proc, _ in floods:
+        proc.join()
+    return {"latency": percentiles(latencies), "outcomes": outcomes,
+            "flood_datagrams": sum(sent.value for _, sent in floods)}
+
+def bench_admission(args):
+    """Latency of well-behaved clients with and without a flooding neighbour."""
+    results = {}
+    configs = {"protected": []}
+    if args.compare:
+        configs["unprotected"] = ["--rate", "1e9", "--burst", "1000000000", "--queue-size", "1000000"]
+    for label, extra in configs.items():
+        proc = start_tracker(args.port, *extra)
+        try:
+            baseline = run_clients(args.port, args.clients, args.rate, 0, 0, args.duration)
+            abused = run_clients(args.port, args.clients, args.rate, args.abusers, args.abuse_rate, args.duration)
+            results[label] = {"baseline": baseline, "under_abuse": abused,
+                              "tracker": tracker_metrics(args.port).get("admission")}
+        finally:
+            proc.kill()
+            proc.wait()
+    return results
+
+def register_fake_players(port, count, stop):
+    """Fill the tracker's roster and return each registration's latency.
+
+    The players are kept alive with heartbeats until ``stop`` is set. They
+    point at the discard port, so game notifications go nowhere.
+    """
+    names = [f"bench{i:05d}" for i in range(count)]
+    latencies = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(2)
+        for name in names:
+            latencies.append(request(sock, {"command": "register", "player": name, "IPv4": "127.0.0.1",
+                                            "t-port": 9, "p-port": 9}, ("127.0.0.1", port))[1])
+    def heartbeats():
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            while not stop.wait(5):
+                for i, name in enumerate(names):
+                    sock.sendto(json.dumps({"command": "heartbeat", "player": name}).encode(), ("127.0.0.1", port))
+                    if i % 50 == 49:
+                        time.sleep(0.005)  # pace the burst so the tracker's receive buffer keeps up
+    threading.Thread(target=heartbeats, daemon=True).start()
+    return latencies
+
+def measure_udp(port, requests, msg):
+    latencies, errors = [], 0
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(0.25)
+        start = time.perf_counter()
+        for _ in range(requests):
+            try:
+                latencies.append(request(sock, msg, ("127.0.0.1", port))[1])
+            except (socket.timeout, OSError):
+                errors += 1
+        elapsed = time.perf_counter() - start
+    return {"latency": percentiles(latencies), "errors": errors, "requests_per_s": round(len(latencies) / elapsed)}
+
+def measure_stream(kind, address, requests, msg, depth):
+    """Round trips over one persistent connection, ``depth`` requests in flight at a time."""
+    client = StreamClient(kind, address)
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    try:
+        for _ in range(0, requests, depth):
+            sent = time.perf_counter()
+            try:
+                replies = client.pipeline([msg] * depth)
+            except OSError:
+                errors += depth
+                continue
+            # With pipelining only the batch is timed; spread it over its requests.
+            latencies.extend([(time.perf_counter() - sent) / len(replies)] * len(replies))
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+    return {"latency": percentiles(latencies), "errors": errors, "requests_per_s": round(len(latencies) / elapsed)}
+
+def bench_transport(args):
+    """query_players over UDP versus persistent TCP and Unix-socket connections on localhost."""
+    proc = start_tracker(args.port, "--tcp", "--unix", UNIX_PATH, "--rate", "1e9", "--burst", "1000000000")
+    stop = threading.Event()
+    try:
+        register_fake_players(args.port, args.players, stop)
+        msg = {"command": "query_players"}
+        payload = len(json.dumps(StreamClient("tcp", ("127.0.0.1", args.port)).request(msg)))
+        results = {"players": args.players, "payload_bytes": payload,
+                   "udp": measure_udp(args.port, args.requests, msg)}
+        for kind, address in (("tcp", ("127.0.0.1", args.port)), ("unix", UNIX_PATH)):
+            results[kind] = measure_stream(kind, address, args.requests, msg, 1)
+            results[f"{kind}_pipelined_{args.depth}"] = measure_stream(kind, address, args.requests, msg, args.depth)
+        return results
+    finally:
+        stop.set()
+        proc.kill()
+        proc.wait()
+
+def process_cpu(pid):
+    """User+system CPU seconds of another process (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+def process_rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def own_cpu():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def timed_ops(sock, port, msgs):
+    """Send each message in turn; return (latencies, failures, elapsed seconds)."""
+    latencies, failures = [], 0
+    start = time.perf_counter()
+    for msg in msgs:
+        try:
+            response, latency = request(sock, msg, ("127.0.0.1", port))
+        except socket.timeout:
+            failures += 1
+            continue
+        latencies.append(latency)
+        if response.get("status") != "SUCCESS":
+            failures += 1
+    return latencies, failures, time.perf_counter() - start
+
+def op_summary(latencies, failures, elapsed):
+    return {"latency": percentiles(latencies), "failures": failures,
+            "ops_per_s": round(len(latencies) / elapsed) if elapsed else None}
+
+def bench_tracker(args):
+    """register / query / start_game / end throughput and latency, plus tracker memory per player."""
+    proc = start_tracker(args.port, "--rate", "1e9", "--burst", "1000000000")
+    stop = threading.Event()
+    try:
+        rss_before, cpu_before = process_rss_kb(proc.pid), process_cpu(proc.pid)
+        start = time.perf_counter()
+        register = register_fake_players(args.port, args.players, stop)
+        results = {"players": args.players,
+                   "register": op_summary(register, 0, time.perf_counter() - start)}
+        rss_after = process_rss_kb(proc.pid)
+        if rss_before and rss_after:
+            results["tracker_kb_per_player"] = round((rss_after - rss_before) / args.players, 3)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(2)
+            for command in ("query_players", "query_games"):
+                results[command] = op_summary(*timed_ops(sock, args.port, [{"command": command}] * args.requests))
+            # Two-seat games between consecutive fake players, then end them all.
+            dealers = [f"bench{i:05d}" for i in range(0, args.players - 1, 2)]
+            started = time.perf_counter()
+            game_ids, latencies, failures = [], [], 0
+            for dealer in dealers:
+                response, latency = request(sock, {"command": "start_game", "player": dealer, "n": 1,
+                                                   "#holes": 1}, ("127.0.0.1", args.port))
+                latencies.append(latency)
+                if response.get("status") == "SUCCESS":
+                    game_ids.append((response["game_id"], dealer))
+                else:
+                    failures += 1
+            results["start_game"] = op_summary(latencies, failures, time.perf_counter() - started)
+            results["end"] = op_summary(*timed_ops(sock, args.port, [
+                {"command": "end", "game-identifier": game_id, "player": dealer} for game_id, dealer in game_ids]))
+        cpu_after = process_cpu(proc.pid)
+        if cpu_before is not None and cpu_after is not None:
+            results["tracker_cpu_s"] = round(cpu_after - cpu_before, 3)
+        return results
+    finally:
+        stop.set()
+        proc.kill()
+        proc.wait()
+
+def count_sends(chunker, sent):
+    """Wrap ``chunker.sendto`` so every datagram a player sends is counted in ``sent``."""
+    send = chunker.sendto
+    def sendto(sock, payload, addr):
+        sent["datagrams"] += 1
+        sent["bytes"] += len(payload)
+        return send(sock, payload, addr)
+    chunker.sendto = sendto
+
+def bench_game(args):
+    """Full games between headless AI players: time per turn and hole, CPU and traffic per game."""
+    import player as player_module
+    import render
+    from ai import MonteCarloAI
+    player_module.HOLE_PAUSE = 0
+    devnull = open(os.devnull, "w")
+    render.screen.stream = devnull
+    proc = start_tracker(args.port, "--rate", "1e9", "--burst", "1000000000")
+    players = []
+    sent = {"datagrams": 0, "bytes": 0}
+    try:
+        with contextlib.redirect_stdout(devnull):
+            for i in range(args.seats):
+                p = player_module.Player("127.0.0.1", args.port, PLAYER_BASE_PORT + 2 * i,
+                                         PLAYER_BASE_PORT + 2 * i + 1, 1)
+                p.ai = MonteCarloAI(workers=0, budget=args.ai_budget)
+                count_sends(p.chunker, sent)
+                p.register(f"seat{i}")
+                if i >= args.seats - args.frozen:
+                    p.start_listening()  # a hung seat: it gets its turns but never plays them
+                else:
+                    threading.Thread(target=p.run, kwargs={"interactive": False}, daemon=True).start()
+                players.append(p)
+            dealer = players[0]
+            games = []
+            for game in range(args.games):
+                cpu_before, tracker_before = own_cpu(), process_cpu(proc.pid)
+                turns_before, holes_before = len(dealer.turn_durations), len(dealer.hole_durations)
+                timed_out_before = dealer.turns_timed_out
+                sent_before = dict(sent)
+                started = time.perf_counter()
+                request_msg = {"command": "start_game", "player": dealer.name, "n": args.seats - 1,
+                               "#holes": args.holes, "allow_steal": args.steal, "seed": game}
+                if args.turn_timeout is not None:
+                    request_msg["turn_timeout"] = args.turn_timeout
+                response = dealer.send_to_tracker(request_msg)
+                if not response or response.get("status") != "SUCCESS":
+                    raise RuntimeError(f"start_game failed: {response}")
+                deadline = time.time() + args.game_timeout
+                while time.time() < deadline and (len(dealer.hole_durations) - holes_before < args.holes
+                                                  or any(p.in_game for p in players)):
+                    time.sleep(0.01)
+                elapsed = time.perf_counter() - started
+                tracker_after = process_cpu(proc.pid)
+                games.append({
+                    "seconds": elapsed,
+                    "turns": len(dealer.turn_durations) - turns_before,
+                    "turns_timed_out": dealer.turns_timed_out - timed_out_before,
+                    "cpu_s": own_cpu() - cpu_before,
+                    "tracker_cpu_s": (tracker_after - tracker_before) if tracker_before is not None else None,
+                    "datagrams": sent["datagrams"] - sent_before["datagrams"],
+                    "bytes": sent["bytes"] - sent_before["bytes"],
+                    "completed": time.time() < deadline,
+                })
+        return {
+            "seats": args.seats, "holes": args.holes, "games": len(games),
+            "completed": sum(g["completed"] for g in games),
+            "game_seconds": percentiles([g["seconds"] for g in games]),
+            "turn": percentiles(dealer.turn_durations),
+            "hole": percentiles(dealer.hole_durations),
+            "turns_per_game": sum(g["turns"] for g in games) / len(games),
+            "turns_timed_out": sum(g["turns_timed_out"] for g in games),
+            "cpu_s_per_game": round(sum(g["cpu_s"] for g in games) / len(games), 3),
+            "tracker_cpu_s_per_game": round(sum(g["tracker_cpu_s"] or 0 for g in games) / len(games), 4),
+            "datagrams_per_turn": round(sum(g["datagrams"] for g in games) / max(1, sum(g["turns"] for g in games)), 1),
+            "bytes_per_turn": round(sum(g["bytes"] for g in games) / max(1, sum(g["turns"] for g in games))),
+        }
+    finally:
+        for p in players:
+            p.running = False
+        proc.kill()
+        proc.wait()
+
+def parse_importtime(stderr):
+    """-X importtime output -> {module: cumulative seconds} for player and the modules it imports directly."""
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2  # one space, then two per nesting level
+        seconds = int(cumulative) / 1e6
+        if depth == 1:
+            # A module is printed after everything it imported
+            children[name.strip()] = seconds
+        elif depth == 0:
+            if name.strip() == "player":
+                return dict(children, player=seconds)
+            children = {}
+    return {}
+
+def bench_startup(args):
+    """Cold start of player.py: time to a constructed Player against STARTUP_BUDGET_MS, plus an import report."""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # measure with cached bytecode, as installed players run
+    command = [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT,
+               str(args.port), str(PLAYER_BASE_PORT), str(PLAYER_BASE_PORT + 1)]
+    runs, imports = [], {}
+    for run in range(args.starts + 1):
+        started = time.perf_counter()
+        proc = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+        wall = time.perf_counter() - started
+        if run == 0:
+            continue  # warm-up: writes bytecode caches and fills the page cache
+        inner = json.loads(proc.stdout.strip().splitlines()[-1])
+        runs.append(dict(inner, wall_s=wall))
+        for name, seconds in parse_importtime(proc.stderr).items():
+            imports.setdefault(name, []).append(seconds)
+    wall = percentiles([r["wall_s"] for r in runs])
+    return {
+        "starts": len(runs),
+        "process_wall": wall,
+        "import_player": percentiles([r["import_s"] for r in runs]),
+        "construct_player": percentiles([r["construct_s"] for r in runs]),
+        "get_local_ip": percentiles([r["local_ip_s"] for r in runs]),
+        "budget_ms": STARTUP_BUDGET_MS,
+        "within_budget": wall["p50_ms"] <= STARTUP_BUDGET_MS,
+        # median cumulative import time of each module player imports, slowest first
+        "imports_ms": {name: round(sorted(times)[len(times) // 2] * 1000, 3)
+                       for name, times in sorted(imports.items(), key=lambda item: -sorted(item[1])[len(item[1]) // 2])},
+    }
+
+def failover_client(ports, stop, successes):
+    """Query the leader in a loop, moving down the tracker list on silence or NOT_LEADER like players do."""
+    index = 0
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(0.05)
+        while not stop.is_set():
+            try:
+                response, _ = request(sock, {"command": "query_games"}, ("127.0.0.1", ports[index]))
+                if response.get("status") != "NOT_LEADER":
+                    successes.append((time.perf_counter(), ports[index]))
+                    time.sleep(0.002)
+                    continue
+            except socket.timeout:
+                pass
+            except OSError:
+                time.sleep(0.002)
+            index = (index + 1) % len(ports)
+
+def bench_failover(args):
+    """Kill the leader tracker and time until a follower leads and clients are served again."""
+    ports = [args.port, args.port + 1, args.port + 2]
+    replica = [port + 1000 for port in ports]
+    trials = []
+    for _ in range(args.trials):
+        unlimited = ("--rate", "1e9", "--burst", "1000000000")
+        procs = [start_tracker(ports[0], "--replica-port", str(replica[0]), *unlimited)]
+        for rank in (1, 2):
+            ahead = ",".join(f"127.0.0.1:{port}" for port in replica[:rank])
+            procs.append(start_tracker(ports[rank], "--replica-port", str(replica[rank]), "--follow", ahead,
+                                       *unlimited))
+        stop = threading.Event()
+        try:
+            register_fake_players(ports[0], args.players, stop)
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.settimeout(2)
+                for i in range(0, args.players - 1, 2):
+                    request(sock, {"command": "start_game", "player": f"bench{i:05d}", "n": 1, "#holes": 1},
+                            ("127.0.0.1", ports[0]))
+            expected = tracker_metrics(ports[0])
+            expected = (expected["players"], expected["games"])
+            deadline = time.time() + 5
+            while time.time() < deadline:
+                followers = [tracker_metrics(port) for port in ports[1:]]
+                if all((m["players"], m["games"]) == expected for m in followers):
+                    break
+                time.sleep(0.01)
+            successes = []
+            client_stop = threading.Event()
+            client = threading.Thread(target=failover_client, args=(ports, client_stop, successes), daemon=True)
+            client.start()
+            time.sleep(0.2)
+            killed = time.perf_counter()
+            procs[0].kill()
+            promoted = None
+            while time.perf_counter() - killed < 10:
+                metrics = tracker_metrics(ports[1])
+                if metrics["role"] == "leader":
+                    promoted = time.perf_counter() - killed
+                    break
+                time.sleep(0.005)
+            time.sleep(0.2)
+            client_stop.set()
+            client.join()
+            served = next((t - killed for t, port in successes if t > killed and port != ports[0]), None)
+            after = tracker_metrics(ports[1])
+            trials.append({"promoted_s": promoted, "client_outage_s": served,
+                           "state_intact": (after["players"], after["games"]) == expected,
+                           "second_follower_role": tracker_metrics(ports[2])["role"]})
+        finally:
+            stop.set()
+            for proc in procs:
+                proc.kill()
+                proc.wait()
+    return {
+        "players": args.players,
+        "trials": len(trials),
+        "promotion": percentiles([t["promoted_s"] for t in trials if t["promoted_s"] is not None]),
+        "client_outage": percentiles([t["client_outage_s"] for t in trials if t["client_outage_s"] is not None]),
+        "state_intact": all(t["state_intact"] for t in trials),
+        "under_1s": all(t["client_outage_s"] is not None and t["client_outage_s"] < 1.0 for t in trials),
+        "second_follower_stays_follower": all(t["second_follower_role"] == "follower" for t in trials),
+    }
+
+# A typical in-game datagram: the dealer's pile update early in a hole
+PILES_MESSAGE = json.dumps({"command": "update_piles", "stock_pile": [f"{v}\u2660" for v in range(2, 11)] * 4,
+                            "discard_pile": ["K\u2665"], "sender": "dealer", "epoch": 12345678, "seq": 42,
+                            "game": 0}).encode()
+
+def receive_copying(sock, pool):
+    # The old path: a fresh 64 KB bytes object per datagram, then a decoded str copy
+    data, addr = sock.recvfrom(65535)
+    return json.loads(data.decode())
+
+def receive_pooled(sock, pool):
+    buffer, view, addr = recv_datagram(sock, pool)
+    try:
+        return decode_json(view)
+    finally:
+        view.release()
+        pool.release(buffer)
+
+RECEIVE_PATHS = {"copy": receive_copying, "pooled": receive_pooled}
+
+def drain(sock, receive, pool, on_datagram=None):
+    """Receive until the sender has been quiet for the socket timeout; return the count."""
+    count = 0
+    while True:
+        try:
+            receive(sock, pool)
+        except socket.timeout:
+            return count
+        count += 1
+        if on_datagram:
+            on_datagram()
+
+def bench_alloc(args):
+    """Receive-path allocations and CPU under a sustained datagram rate: recvfrom copy vs pooled recvfrom_into."""
+    results = {"payload_bytes": len(PILES_MESSAGE), "rate": args.abuse_rate}
+    for name, receive in RECEIVE_PATHS.items():
+        pool = BufferPool()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+            sock.bind(("127.0.0.1", args.port))
+            sock.settimeout(0.5)
+            # Throughput and CPU at the sustained rate, without tracing
+            sent = multiprocessing.Value("q", 0)
+            sender = multiprocessing.Process(target=flood_client,
+                                             args=(args.port, args.abuse_rate, args.duration, sent, PILES_MESSAGE))
+            cpu = own_cpu()
+            sender.start()
+            received = drain(sock, receive, pool)
+            sender.join()
+            cpu = own_cpu() - cpu
+            # Allocation profile: the transient peak each datagram adds on top of live memory
+            peaks = []
+            def measure():
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - current)
+                tracemalloc.reset_peak()
+            traced = multiprocessing.Value("q", 0)
+            sender = multiprocessing.Process(target=flood_client,
+                                             args=(args.port, min(args.abuse_rate, 2000), 1.0, traced, PILES_MESSAGE))
+            tracemalloc.start()
+            sender.start()
+            drain(sock, receive, pool, measure)
+            sender.join()
+            tracemalloc.stop()
+        peaks.sort()
+        results[name] = {
+            "sent": sent.value,
+            "received": received,
+            "cpu_us_per_datagram": round(cpu / received * 1e6, 3) if received else None,
+            "buffer_allocations": received if name == "copy" else pool.stats["allocated"],
+            "peak_bytes_per_datagram": {"p50": peaks[len(peaks) // 2], "max": peaks[-1]} if peaks else None,
+        }
+    return results
+
+IP_FRAGMENT_PAYLOAD = 1480  # bytes per IP fragment on a 1500-byte MTU
+
+class LossySocket:
+    """Drops each outgoing datagram with probability ``loss``."""
+
+    def __init__(self, sock, loss, rng):
+        self.sock = sock
+        self.loss = loss
+        self.rng = rng
+
+    def sendto(self, data, addr):
+        if self.rng.random() >= self.loss:
+            self.sock.sendto(data, addr)
+
+def serve_nacks(sock, chunker, lossy, stop):
+    while not stop.is_set():
+        try:
+            data, addr = sock.recvfrom(65535)
+        except socket.timeout:
+            continue
+        if is_nack(data):
+            chunker.resend(lossy, data, addr)
+
+def bench_chunking(args):
+    """Delivery and latency of chunked messages under random loss, against whole-datagram IP fragmentation."""
+    rng = random.Random(1)
+    results = {}
+    for size in (4096, 16384, 60000):
+        payload = b'{' + bytes(rng.getrandbits(8) for _ in range(size - 1))
+        for loss in (0.01, 0.05):
+            sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sender.bind(("127.0.0.1", 0))
+            receiver.bind(("127.0.0.1", 0))
+            sender.settimeout(0.05)
+            chunker = Chunker()
+            lossy_sender = LossySocket(sender, loss, rng)
+            reassembler = Reassembler(LossySocket(receiver, loss, rng))  # NACKs can be lost too
+            stop = threading.Event()
+            threading.Thread(target=serve_nacks, args=(sender, chunker, lossy_sender, stop), daemon=True).start()
+            latencies, lost = [], 0
+            for _ in range(args.messages):
+                started = time.perf_counter()
+                chunker.sendto(lossy_sender, payload, receiver.getsockname())
+                deadline = started + REASSEMBLY_TIMEOUT
+                delivered = None
+                while delivered is None and time.perf_counter() < deadline:
+                    receiver.settimeout(max(0.001, deadline - time.perf_counter()))
+                    try:
+                        data, addr = receiver.recvfrom(65535)
+                    except socket.timeout:
+                        break
+                    delivered = reassembler.add(data, addr) if is_chunk(data) else data
+                if delivered == payload:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    lost += 1
+            stop.set()
+            fragments = math.ceil(size / IP_FRAGMENT_PAYLOAD)
+            results[f"{size}B_loss{loss}"] = {
+                "chunks": math.ceil(size / 1200),
+                "delivered": len(latencies) / args.messages,
+                "latency": percentiles(latencies),
+                "resent_chunks": chunker.stats["resent"],
+                "nacks": reassembler.stats["nacks"],
+                # One datagram in `fragments` IP fragments arrives only if all of them do
+                "ip_fragmentation_delivered": round((1 - loss) ** fragments, 4),
+            }
+            sender.close()
+            receiver.close()
+    return results
+
+def run_batch_phase(args, phase, send):
+    """Register args.players players on a fresh tracker through ``send``; return (summary, tracker metrics)."""
+    proc = start_tracker(args.port, "--rate", "1e9", "--burst", "1000000000")
+    msgs = [{"command": "register", "player": f"{phase}{i:05d}", "IPv4": "127.0.0.1",
+             "t-port": 9, "p-port": 9} for i in range(args.players)]
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(2)
+            cpu_before = process_cpu(proc.pid)
+            start = time.perf_counter()
+            summary = send(sock, msgs)
+            elapsed = time.perf_counter() - start
+            cpu_after = process_cpu(proc.pid)
+        summary["ops_per_s"] = round(args.players / elapsed)
+        if cpu_before is not None and cpu_after is not None:
+            summary["tracker_cpu_us_per_op"] = round((cpu_after - cpu_before) * 1e6 / args.players, 1)
+        return summary, tracker_metrics(args.port)["metrics"]
+    finally:
+        proc.kill()
+        proc.wait()
+
+def bench_batch(args):
+    """Registrations one per request, in explicit batch envelopes, and auto-batched from several threads."""
+    addr = ("127.0.0.1", args.port)
+
+    def single(sock, msgs):
+        return op_summary(*timed_ops(sock, args.port, msgs))
+
+    def batched(sock, msgs):
+        envelopes = split_batches(msgs)
+        latencies, failures = [], 0
+        for envelope in envelopes:
+            response, latency = request(sock, envelope, addr)
+            latencies.append(latency)
+            failures += sum(1 for reply in response.get("responses", envelope["commands"])
+                            if not reply or reply.get("status") != "SUCCESS")
+        return {"envelopes": len(envelopes), "envelope_latency": percentiles(latencies), "failures": failures}
+
+    def auto_batched(sock, msgs):
+        # Independent callers on several threads, coalesced by an AutoBatcher
+        send_lock = threading.Lock()
+        def send_batch(batch):
+            replies = []
+            with send_lock:
+                for envelope in split_batches(batch):
+                    replies.extend(request(sock, envelope, addr)[0]["responses"])
+            return replies
+        batcher = AutoBatcher(send_batch)
+        latencies, failures = [], 0
+        def caller(share):
+            nonlocal failures
+            for msg in share:
+                started = time.perf_counter()
+                reply = batcher.request(msg)
+                latencies.append(time.perf_counter() - started)
+                if not reply or reply.get("status") != "SUCCESS":
+                    failures += 1
+        threads = [threading.Thread(target=caller, args=(msgs[i::args.clients],)) for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {"threads": args.clients, "batches": batcher.stats["batches"],
+                "latency": percentiles(latencies), "failures": failures}
+
+    results = {"players": args.players}
+    for phase, send in (("single", single), ("batched", batched), ("auto_batched", auto_batched)):
+        results[phase], metrics = run_batch_phase(args, phase, send)
+        results[phase]["tracker_batches"] = metrics.get("batches", 0)
+    return results
+
+def lobby_churn(port, rate, duration, appeared):
+    """Register and de-register players at ``rate`` ops/s; record when each registration was acknowledged."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(2)
+        deadline = time.perf_counter() + duration
+        i = 0
+        while time.perf_counter() < deadline:
+            name = f"churn{i:05d}"
+            request(sock, {"command": "register", "player": name, "IPv4": "127.0.0.1", "t-port": 9, "p-port": 9},
+                    ("127.0.0.1", port))
+            appeared[name] = time.perf_counter()
+            time.sleep(1 / rate)
+            if i % 2:
+                request(sock, {"command": "de_register", "player": name}, ("127.0.0.1", port))
+                time.sleep(1 / rate)
+            i += 1
+
+def lobby_watcher(port, stop, counts, seen):
+    """Subscribe to the lobby and count what arrives; the first watcher also records when churn players appear."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(0.2)
+        request(sock, {"command": "subscribe_lobby"}, ("127.0.0.1", port))
+        chunks = Reassembler(sock)
+        while not stop.is_set():
+            try:
+                data, addr = sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            counts["datagrams"] += 1
+            counts["bytes"] += len(data)
+            if is_chunk(data):
+                data = chunks.add(data, addr)
+                if data is None:
+                    continue
+            msg = json.loads(data)
+            counts[msg["command"]] += 1
+            if seen is not None:
+                now = time.perf_counter()
+                names = msg["players"] if msg["command"] == "lobby_update" else \
+                    {player["username"]: player for player in msg["players"]}
+                for name, player in names.items():
+                    if player is not None:
+                        seen.setdefault(name, now)
+
+def lobby_poller(port, stop, interval, counts, seen):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(2)
+        version = None
+        while not stop.wait(interval):
+            msg = {"command": "query_players"}
+            if version is not None:
+                msg["version"] = version
+            sock.sendto(json.dumps(msg).encode(), ("127.0.0.1", port))
+            counts["datagrams"] += 1
+            counts["bytes"] += len(json.dumps(msg))
+            data, _ = sock.recvfrom(65535)
+            chunks = Reassembler(sock)
+            while True:
+                counts["datagrams"] += 1
+                counts["bytes"] += len(data)
+                if not is_chunk(data):
+                    break
+                data = chunks.add(data, ("127.0.0.1", port))
+                if data is not None:
+                    break
+                data, _ = sock.recvfrom(65535)
+            response = json.loads(data)
+            version = response.get("version", version)
+            if seen is not None and response.get("status") == "SUCCESS":
+                now = time.perf_counter()
+                for player in response["players"]:
+                    seen.setdefault(player["username"], now)
+
+def bench_lobby(args):
+    """Lobby traffic per client under roster churn: pushed subscriptions versus polling query_players."""
+    results = {"players": args.players, "clients": args.clients, "churn_ops_per_s": args.rate}
+    for mode in ("push", "poll"):
+        proc = start_tracker(args.port, "--rate", "1e9", "--burst", "1000000000")
+        stop = threading.Event()
+        try:
+            register_fake_players(args.port, args.players, stop)
+            counts = [collections.Counter() for _ in range(args.clients)]
+            appeared, seen = {}, {}
+            if mode == "push":
+                threads = [threading.Thread(target=lobby_watcher, args=(args.port, stop, counts[i], seen if i == 0 else None))
+                           for i in range(args.clients)]
+            else:
+                threads = [threading.Thread(target=lobby_poller, args=(args.port, stop, args.poll_interval, counts[i],
+                                                                       seen if i == 0 else None))
+                           for i in range(args.clients)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.5)  # let every subscriber take its first snapshot
+            for counter in counts:
+                counter.clear()
+            cpu_before = process_cpu(proc.pid)
+            lobby_churn(args.port, args.rate, args.duration, appeared)
+            time.sleep(max(0.5, args.poll_interval if mode == "poll" else 0))
+            cpu_after = process_cpu(proc.pid)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            elapsed = args.duration + max(0.5, args.poll_interval if mode == "poll" else 0)
+            total = sum(counts, collections.Counter())
+            delays = [seen[name] - at for name, at in appeared.items() if name in seen and seen[name] >= at]
+            results[mode] = {
+                "bytes_per_client_per_s": round(total["bytes"] / args.clients / elapsed),
+                "datagrams_per_client_per_s": round(total["datagrams"] / args.clients / elapsed, 1),
+                # Players who leave again within one tick (push) or before the next poll are never seen
+                "changes_seen": round(len(delays) / len(appeared), 3) if appeared else None,
+                "visibility_delay": percentiles(delays),
+            }
+            if mode == "push":
+                results[mode].update(updates=total["lobby_update"] // args.clients,
+                                     snapshots=total["lobby_snapshot"])
+                results[mode]["tracker_lobby"] = tracker_metrics(args.port).get("lobby")
+            if cpu_before is not None and cpu_after is not None:
+                results[mode]["tracker_cpu_s"] = round(cpu_after - cpu_before, 3)
+        finally:
+            stop.set()
+            proc.kill()
+            proc.wait()
+    return results
+
+def bench_deal(args):
+    """Cost of setting up a hole's deal on the dealer: computed inline versus taken from the prepared pool."""
+    import player as player_module
+    seats = [f"seat{i}" for i in range(args.seats)]
+    holes = range(1, args.holes * args.games + 1)
+    inline = []
+    for hole in holes:
+        started = time.perf_counter()
+        player_module.prepare_deal(7, hole, seats)
+        inline.append(time.perf_counter() - started)
+    pool = player_module.DealPool()
+    pooled = []
+    for hole in holes:
+        pool.prefetch(8, hole, seats)
+        time.sleep(0.002)  # the rest of the hole, during which the worker deals the next one
+        started = time.perf_counter()
+        pool.take(8, hole, seats)
+        pooled.append(time.perf_counter() - started)
+    return {"seats": args.seats, "deals": len(holes), "inline": percentiles(inline),
+            "pooled": percentiles(pooled), "pool": dict(pool.stats)}
+
+def bench_dealer(args):
+    """Kill the dealer's process mid-game and time until its successor deals the next turn."""
+    import tempfile
+    import player as player_module
+    from ai import MonteCarloAI
+    from gamelog import GameLog
+    from replay import replay_game, ReplayError
+    import render
+    player_module.HOLE_PAUSE = 0
+    player_module.GAME_LOG_DIR = tempfile.mkdtemp(prefix="cardgame-dealer-")
+    devnull = open(os.devnull, "w")
+    render.screen.stream = devnull
+    rng = random.Random(0)
+    trials = []
+    for trial in range(args.trials):
+        base = PLAYER_BASE_PORT + trial * 2 * args.seats
+        proc = start_tracker(args.port, "--rate", "1e9", "--burst", "1000000000")
+        dealer_name = f"dealer{trial}"
+        dealer = subprocess.Popen([sys.executable, "-c", DEALER_SCRIPT, str(args.port), str(base), str(base + 1),
+                                   dealer_name, str(args.ai_budget)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seats = []
+        try:
+            with contextlib.redirect_stdout(devnull):
+                for i in range(1, args.seats):
+                    p = player_module.Player("127.0.0.1", args.port, base + 2 * i, base + 2 * i + 1, 1)
+                    p.ai = MonteCarloAI(workers=0, budget=args.ai_budget)
+                    p.register(f"seat{trial}_{i}")
+                    threading.Thread(target=p.run, kwargs={"interactive": False}, daemon=True).start()
+                    seats.append(p)
+                request_msg = {"command": "start_game", "player": dealer_name, "n": args.seats - 1,
+                               "#holes": args.holes, "allow_steal": args.steal, "seed": trial}
+                deadline = time.time() + 10
+                while (response := seats[0].send_to_tracker(request_msg)).get("status") != "SUCCESS":
+                    if time.time() > deadline:  # the dealer process has not registered yet
+                        raise RuntimeError(f"start_game failed: {response}")
+                    time.sleep(0.05)
+                while not all(p.in_game for p in seats):
+                    time.sleep(0.01)
+                with seats[0].lock:
+                    successor_name = seats[0].successor().username
+                successor = next(p for p in seats if p.name == successor_name)
+                # Let a few turns go by, then kill it at some point within a turn
+                while not successor.dealer_backup or successor.dealer_backup["turn"] < 2:
+                    time.sleep(0.005)
+                time.sleep(rng.uniform(0, 0.2))
+                killed = time.perf_counter()
+                dealer.kill()
+                dealer.wait()
+                took_over = recovered = None
+                deadline = time.time() + args.game_timeout
+                while time.time() < deadline and any(p.in_game for p in seats):
+                    if took_over is None and successor.is_dealer:
+                        took_over = time.perf_counter() - killed
+                    if recovered is None and successor.turn_durations:
+                        recovered = time.perf_counter() - killed
+                    time.sleep(0.002)
+            logs = [os.path.join(player_module.GAME_LOG_DIR, name)
+                    for name in os.listdir(player_module.GAME_LOG_DIR) if name.endswith(f"_{trial}.glog")]
+            try:
+                replayed = bool(logs) and bool(replay_game(GameLog.load(logs[0])))
+            except ReplayError:
+                replayed = False
+            trials.append({"took_over_s": took_over, "recovered_s": recovered,
+                           "completed": time.time() < deadline, "log_replays": replayed})
+        finally:
+            for p in seats:
+                p.running = False
+            dealer.kill()
+            proc.kill()
+            proc.wait()
+    return {
+        "seats": args.seats, "holes": args.holes, "trials": len(trials),
+        "failover_timeout_s": player_module.DEALER_FAILOVER_TIMEOUT,
+        "took_over": percentiles([t["took_over_s"] for t in trials if t["took_over_s"] is not None]),
+        "recovered": percentiles([t["recovered_s"] for t in trials if t["recovered_s"] is not None]),
+        "completed": sum(t["completed"] for t in trials),
+        "logs_replay": sum(t["log_replays"] for t in trials),
+    }
+
+def bench_sessions(args):
+    """Many player identities on one socket pair (sessions.py) playing concurrent games."""
+    import player as player_module
+    import render
+    import sessions as sessions_module
+    player_module.HOLE_PAUSE = 0
+    devnull = open(os.devnull, "w")
+    render.screen.stream = devnull
+    proc = start_tracker(args.port)  # default rate limits: the whole host is one source address
+    host = sessions_module.SessionHost("127.0.0.1", args.port, PLAYER_BASE_PORT, PLAYER_BASE_PORT + 1, 1,
+                                       ai_budget=args.ai_budget)
+    threads_before = threading.active_count()
+    try:
+        with contextlib.redirect_stdout(devnull):
+            host.start()
+            started = time.perf_counter()
+            sessions = [host.add(f"session{i}") for i in range(args.sessions)]
+            registered = time.perf_counter() - started
+            sessions = [s for s in sessions if s is not None]
+            dealers = sessions[::args.seats][:len(sessions) // args.seats]
+            cpu_before = own_cpu()
+            started = time.perf_counter()
+            for game, dealer in enumerate(dealers):
+                response = dealer.send_to_tracker({"command": "start_game", "player": dealer.name,
+                                                   "n": args.seats - 1, "#holes": args.holes,
+                                                   "allow_steal": args.steal, "seed": game})
+                if not response or response.get("status") != "SUCCESS":
+                    raise RuntimeError(f"start_game failed: {response}")
+            deadline = time.time() + args.game_timeout
+            while time.time() < deadline and (any(len(d.hole_durations) < args.holes for d in dealers)
+                                              or any(s.in_game for s in sessions)):
+                time.sleep(0.01)
+            elapsed = time.perf_counter() - started
+            threads_peak = threading.active_count() - threads_before
+        turns = [t for dealer in dealers for t in dealer.turn_durations]
+        return {
+            "sessions": len(sessions), "ports": 2, "seats": args.seats, "holes": args.holes,
+            "register_s": round(registered, 3),
+            "games": len(dealers),
+            "completed": sum(len(d.hole_durations) >= args.holes for d in dealers),
+            "all_games_s": round(elapsed, 3),
+            "turns": len(turns),
+            "turn": percentiles(turns),
+            "cpu_s": round(own_cpu() - cpu_before, 3),
+            "threads": threads_peak,
+            "host": host.metrics(),
+            "admission": tracker_metrics(args.port).get("admission"),
+        }
+    finally:
+        host.running = False
+        for session in list(host.sessions.values()):
+            session.running = False
+        proc.kill()
+        proc.wait()
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+def compare(baseline, results):
+    """Ratio new/old for every numeric metric present in both runs."""
+    old = dict(flatten(baseline.get("results", {})))
+    return {path: round(value / old[path], 3) for path, value in flatten(results["results"])
+            if old.get(path) not in (None, 0)}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+SCENARIOS = {
+    "admission": bench_admission,
+    "transport": bench_transport,
+    "tracker": bench_tracker,
+    "game": bench_game,
+    "startup": bench_startup,
+    "failover": bench_failover,
+    "alloc": bench_alloc,
+    "chunking": bench_chunking,
+    "batch": bench_batch,
+    "lobby": bench_lobby,
+    "deal": bench_deal,
+    "dealer": bench_dealer,
+    "sessions": bench_sessions,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--port", type=int, default=TRACKER_PORT)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per measured phase")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=20.0, help="requests per second per polite client")
+    parser.add_argument("--abusers", type=int, default=2)
+    parser.add_argument("--abuse-rate", type=float, default=5000.0, help="datagrams per second per abuser")
+    parser.add_argument("--compare", action="store_true", help="also run with admission control disabled")
+    parser.add_argument("--players", type=int, default=200, help="registered players (sets the payload size)")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per transport")
+    parser.add_argument("--depth", type=int, default=16, help="requests in flight when pipelining")
+    parser.add_argument("--seats", type=int, default=4, help="players per game (up to common.MAX_SEATS)")
+    parser.add_argument("--holes", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=64, help="player identities on one socket pair (sessions)")
+    parser.add_argument("--games", type=int, default=3)
+    parser.add_argument("--steal", action="store_true", help="allow stealing in benchmark games")
+    parser.add_argument("--ai-budget", type=float, default=0.01, help="AI thinking time per turn")
+    parser.add_argument("--game-timeout", type=float, default=300.0)
+    parser.add_argument("--turn-timeout", type=float, help="per-turn deadline requested at start_game")
+    parser.add_argument("--frozen", type=int, default=0, help="seats that never play their turns (game scenario)")
+    parser.add_argument("--messages", type=int, default=200, help="messages per size and loss rate (chunking)")
+    parser.add_argument("--trials", type=int, default=5, help="leader or dealer kills (failover, dealer)")
+    parser.add_argument("--starts", type=int, default=20, help="cold player processes to start")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between lobby polls")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier results file to compare against (ratios new/old)")
+    args = parser.parse_args()
+    results = {"scenario": args.scenario, "commit": git_commit(), "timestamp": time.time(),
+               "results": SCENARIOS[args.scenario](args)}
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["vs_baseline"] = compare(json.load(f), results)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    main()
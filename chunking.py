@@ -0,0 +1,204 @@
+# chunking.py
+
+import collections
+import itertools
+import random
+import struct
+import threading
+import time
+
+# Messages larger than one chunk travel as several binary datagrams instead
+# of one IP-fragmented datagram, so a lost piece costs one re-sent chunk
+# rather than the whole message. JSON datagrams always start with '{', so
+# the first byte tells the kinds apart.
+CHUNK_MAGIC = 0xC7
+NACK_MAGIC = 0xC8
+CHUNK_HEADER = struct.Struct('>BIHH')  # magic, message id, chunk index, chunk count
+NACK_HEADER = struct.Struct('>BI')     # magic, message id; then one '>H' per missing index
+CHUNK_PAYLOAD = 1200       # message bytes per chunk; with the chunk, UDP and IP headers it fits a 1280-byte MTU
+MAX_CHUNKS = 1024          # largest message is MAX_CHUNKS * CHUNK_PAYLOAD bytes
+NACK_LIMIT = 500           # missing indices per NACK datagram
+
+REASSEMBLY_TIMEOUT = 2.0          # seconds an incomplete message is kept
+REASSEMBLY_MEMORY = 4 * 1024 * 1024  # bytes of incomplete messages buffered per receiver
+NACK_DELAY = 0.02                 # seconds without a new chunk before the missing ones are re-requested
+MAX_NACKS = 5                     # re-requests per message before waiting out the timeout
+RETAIN_SECONDS = 2.0              # how long a sender keeps chunks for re-requests
+RETAIN_MEMORY = 4 * 1024 * 1024   # bytes of sent chunks kept for re-requests
+
+def is_chunk(view):
+    return len(view) >= CHUNK_HEADER.size and view[0] == CHUNK_MAGIC
+
+def is_nack(view):
+    return len(view) >= NACK_HEADER.size and view[0] == NACK_MAGIC
+
+class Chunker:
+    """Sender side: splits large payloads into chunks and answers re-requests.
+
+    Chunks of recent messages are kept per destination for RETAIN_SECONDS
+    (and at most RETAIN_MEMORY bytes, oldest dropped first) so a NACK can
+    be answered from memory. Chunks are only ever re-sent to the address
+    they were first sent to, each at most once per NACK, and a message is
+    re-sent for at most MAX_NACKS NACKs, so a forged NACK cannot make the
+    sender reflect more than a few copies of the message.
+    """
+
+    def __init__(self):
+        self.ids = itertools.count(random.getrandbits(31))
+        self.sent = collections.OrderedDict()  # (addr, message id) -> [time, chunks, NACKs answered]
+        self.retained = 0
+        self.lock = threading.Lock()
+        self.stats = {"chunked": 0, "chunks": 0, "resent": 0, "unknown_nacks": 0, "refused_nacks": 0}
+
+    def sendto(self, sock, payload, addr):
+        """Send ``payload`` to ``addr``: as is when it fits one chunk, otherwise chunked."""
+        if len(payload) <= CHUNK_PAYLOAD:
+            sock.sendto(payload, addr)
+            return
+        count = -(-len(payload) // CHUNK_PAYLOAD)
+        if count > MAX_CHUNKS:
+            raise ValueError(f"message of {len(payload)} bytes exceeds {MAX_CHUNKS} chunks")
+        message_id = next(self.ids) & 0xFFFFFFFF
+        view = memoryview(payload)
+        chunks = [CHUNK_HEADER.pack(CHUNK_MAGIC, message_id, index, count) +
+                  view[index * CHUNK_PAYLOAD:(index + 1) * CHUNK_PAYLOAD] for index in range(count)]
+        self.retain((addr, message_id), chunks)
+        for chunk in chunks:
+            sock.sendto(chunk, addr)
+        self.stats["chunked"] += 1
+        self.stats["chunks"] += count
+
+    def retain(self, key, chunks):
+        now = time.monotonic()
+        with self.lock:
+            self.sent[key] = [now, chunks, 0]
+            self.retained += sum(map(len, chunks))
+            while self.sent:
+                sent_at, oldest, _ = next(iter(self.sent.values()))
+                if now - sent_at < RETAIN_SECONDS and self.retained <= RETAIN_MEMORY:
+                    break
+                self.sent.popitem(last=False)
+                self.retained -= sum(map(len, oldest))
+
+    def resend(self, sock, view, addr):
+        """Answer a NACK from ``addr`` by re-sending the chunks it lists."""
+        _, message_id = NACK_HEADER.unpack_from(view)
+        missing = struct.unpack_from(f'>{(len(view) - NACK_HEADER.size) // 2}H', view, NACK_HEADER.size)
+        with self.lock:
+            entry = self.sent.get((addr, message_id))
+            if entry is not None and entry[2] < MAX_NACKS:
+                entry[2] += 1
+                chunks = entry[1]
+            else:
+                chunks = None
+        if chunks is None:
+            self.stats["unknown_nacks" if entry is None else "refused_nacks"] += 1
+            return
+        for index in sorted(set(missing)):
+            if index >= len(chunks):
+                break
+            sock.sendto(chunks[index], addr)
+            self.stats["resent"] += 1
+
+class Partial:
+    __slots__ = ('chunks', 'received', 'size', 'started', 'progress', 'nacks')
+
+    def __init__(self, count, now):
+        self.chunks = [None] * count
+        self.received = 0
+        self.size = 0
+        self.started = now
+        self.progress = now
+        self.nacks = 0
+
+class Reassembler:
+    """Receiver side: collects chunks per (sender, message id) into whole messages.
+
+    ``add`` returns the complete payload when the last missing chunk
+    arrives. A background thread, started with the first chunk and idle
+    while nothing is incomplete, re-requests missing chunks after
+    NACK_DELAY without progress and drops messages older than
+    ``timeout``. Incomplete
+    messages are capped at ``memory`` bytes in total, dropping the
+    oldest first, so a flood of first chunks cannot exhaust memory.
+    """
+
+    def __init__(self, sock, timeout=REASSEMBLY_TIMEOUT, memory=REASSEMBLY_MEMORY):
+        self.sock = sock  # NACKs go out on the socket the chunks arrived on
+        self.timeout = timeout
+        self.memory = memory
+        self.partial = collections.OrderedDict()  # (addr, message id) -> Partial
+        self.buffered = 0
+        self.lock = threading.Lock()
+        self.pending = threading.Event()
+        self.timer = None
+        self.stats = {"reassembled": 0, "duplicate_chunks": 0, "nacks": 0, "expired": 0, "evicted": 0,
+                      "malformed": 0}
+
+    def add(self, view, addr):
+        _, message_id, index, count = CHUNK_HEADER.unpack_from(view)
+        if not 0 < count <= MAX_CHUNKS or index >= count:
+            self.stats["malformed"] += 1
+            return None
+        key = (addr, message_id)
+        data = bytes(view[CHUNK_HEADER.size:])  # copied: the receive buffer is reused
+        now = time.monotonic()
+        with self.lock:
+            partial = self.partial.get(key)
+            if partial is None:
+                partial = self.partial[key] = Partial(count, now)
+                self.pending.set()
+                if self.timer is None:
+                    self.timer = threading.Thread(target=self.run_timers, daemon=True)
+                    self.timer.start()
+            if len(partial.chunks) != count:
+                self.stats["malformed"] += 1
+                return None
+            if partial.chunks[index] is not None:
+                self.stats["duplicate_chunks"] += 1
+                return None
+            partial.chunks[index] = data
+            partial.received += 1
+            partial.size += len(data)
+            partial.progress = now
+            self.buffered += len(data)
+            if partial.received == count:
+                del self.partial[key]
+                self.buffered -= partial.size
+                self.stats["reassembled"] += 1
+                return b''.join(partial.chunks)
+            while self.buffered > self.memory and self.partial:
+                _, evicted = self.partial.popitem(last=False)
+                self.buffered -= evicted.size
+                self.stats["evicted"] += 1
+        return None
+
+    def run_timers(self):
+        while True:
+            self.pending.wait()
+            time.sleep(NACK_DELAY)
+            self.check()
+
+    def check(self):
+        now = time.monotonic()
+        nacks = []
+        with self.lock:
+            for key, partial in list(self.partial.items()):
+                if now - partial.started > self.timeout:
+                    del self.partial[key]
+                    self.buffered -= partial.size
+                    self.stats["expired"] += 1
+                elif now - partial.progress >= NACK_DELAY and partial.nacks < MAX_NACKS:
+                    missing = [i for i, chunk in enumerate(partial.chunks) if chunk is None][:NACK_LIMIT]
+                    nacks.append((key, missing))
+                    partial.nacks += 1
+                    partial.progress = now
+            if not self.partial:
+                self.pending.clear()
+        for (addr, message_id), missing in nacks:
+            try:
+                self.sock.sendto(NACK_HEADER.pack(NACK_MAGIC, message_id) +
+                                 struct.pack(f'>{len(missing)}H', *missing), addr)
+                self.stats["nacks"] += 1
+            except OSError:
+                pass
@@ -0,0 +1,161 @@
+# chunking_test.py
+
+import struct
+import time
+import unittest
+from chunking import (Chunker, Reassembler, is_chunk, is_nack, CHUNK_HEADER, CHUNK_MAGIC, CHUNK_PAYLOAD,
+                      NACK_HEADER, NACK_MAGIC, NACK_DELAY, MAX_NACKS)
+
+ADDR = ('10.0.0.1', 1234)
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []  # (datagram, addr)
+
+    def sendto(self, data, addr):
+        self.sent.append((bytes(data), addr))
+
+def reassembler(sock, **kwargs):
+    chunks = Reassembler(sock, **kwargs)
+    chunks.timer = True  # no background thread: the tests call check() themselves
+    return chunks
+
+def nack(message_id, missing):
+    return NACK_HEADER.pack(NACK_MAGIC, message_id) + struct.pack(f'>{len(missing)}H', *missing)
+
+def message_id(chunk):
+    return CHUNK_HEADER.unpack_from(chunk)[1]
+
+class ChunkerTest(unittest.TestCase):
+    def setUp(self):
+        self.sock = FakeSocket()
+        self.chunker = Chunker()
+        self.payload = bytes(range(256)) * 20  # 5120 bytes: five chunks
+
+    def test_small_payload_goes_as_is(self):
+        self.chunker.sendto(self.sock, b'{"command": "x"}', ADDR)
+        self.assertEqual(self.sock.sent, [(b'{"command": "x"}', ADDR)])
+        self.assertEqual(self.chunker.stats["chunked"], 0)
+
+    def test_large_payload_is_chunked(self):
+        self.chunker.sendto(self.sock, self.payload, ADDR)
+        chunks = [data for data, _ in self.sock.sent]
+        self.assertEqual(len(chunks), -(-len(self.payload) // CHUNK_PAYLOAD))
+        self.assertTrue(all(is_chunk(chunk) and not is_nack(chunk) for chunk in chunks))
+        self.assertEqual(b''.join(chunk[CHUNK_HEADER.size:] for chunk in chunks), self.payload)
+
+    def test_resend_answers_listed_chunks(self):
+        self.chunker.sendto(self.sock, self.payload, ADDR)
+        chunks = [data for data, _ in self.sock.sent]
+        self.sock.sent.clear()
+        self.chunker.resend(self.sock, nack(message_id(chunks[0]), [3, 1]), ADDR)
+        self.assertEqual(self.sock.sent, [(chunks[1], ADDR), (chunks[3], ADDR)])
+
+    def test_resend_ignores_repeated_and_unknown_indices(self):
+        self.chunker.sendto(self.sock, self.payload, ADDR)
+        chunks = [data for data, _ in self.sock.sent]
+        self.sock.sent.clear()
+        self.chunker.resend(self.sock, nack(message_id(chunks[0]), [0] * 600 + [2, 2, 999]), ADDR)
+        self.assertEqual(self.sock.sent, [(chunks[0], ADDR), (chunks[2], ADDR)])
+
+    def test_resend_answers_at_most_max_nacks(self):
+        self.chunker.sendto(self.sock, self.payload, ADDR)
+        request = nack(message_id(self.sock.sent[0][0]), [0])
+        self.sock.sent.clear()
+        for _ in range(MAX_NACKS + 3):
+            self.chunker.resend(self.sock, request, ADDR)
+        self.assertEqual(len(self.sock.sent), MAX_NACKS)
+        self.assertEqual(self.chunker.stats["refused_nacks"], 3)
+
+    def test_resend_only_to_the_original_address(self):
+        self.chunker.sendto(self.sock, self.payload, ADDR)
+        request = nack(message_id(self.sock.sent[0][0]), [0])
+        self.sock.sent.clear()
+        self.chunker.resend(self.sock, request, ('10.0.0.2', 1234))
+        self.assertEqual(self.sock.sent, [])
+        self.assertEqual(self.chunker.stats["unknown_nacks"], 1)
+
+class ReassemblerTest(unittest.TestCase):
+    def setUp(self):
+        self.sender = FakeSocket()
+        self.receiver = FakeSocket()
+        self.chunker = Chunker()
+        self.payload = bytes(range(256)) * 20
+        self.chunker.sendto(self.sender, self.payload, ADDR)
+        self.chunks = [data for data, _ in self.sender.sent]
+        self.sender.sent.clear()
+
+    def test_reassembles_in_order(self):
+        chunks = reassembler(self.receiver)
+        results = [chunks.add(memoryview(chunk), ADDR) for chunk in self.chunks]
+        self.assertEqual(results[:-1], [None] * (len(self.chunks) - 1))
+        self.assertEqual(results[-1], self.payload)
+        self.assertEqual(chunks.stats["reassembled"], 1)
+
+    def test_reorders_and_drops_duplicates(self):
+        chunks = reassembler(self.receiver)
+        order = [4, 0, 0, 2, 3, 3, 1]
+        results = [chunks.add(self.chunks[i], ADDR) for i in order]
+        self.assertEqual([r for r in results if r is not None], [self.payload])
+        self.assertEqual(chunks.stats["duplicate_chunks"], 2)
+
+    def test_senders_are_kept_apart(self):
+        chunks = reassembler(self.receiver)
+        for chunk in self.chunks[:-1]:
+            self.assertIsNone(chunks.add(chunk, ('10.0.0.9', 1)))
+        self.assertIsNone(chunks.add(self.chunks[-1], ADDR))
+        self.assertEqual(len(chunks.partial), 2)
+
+    def test_lost_chunks_are_re_requested(self):
+        chunks = reassembler(self.receiver)
+        for i in (0, 2, 4):
+            chunks.add(self.chunks[i], ADDR)
+        time.sleep(NACK_DELAY)
+        chunks.check()
+        [(request, addr)] = self.receiver.sent
+        self.assertEqual(addr, ADDR)
+        self.assertTrue(is_nack(request))
+        self.assertEqual(struct.unpack_from('>2H', request, NACK_HEADER.size), (1, 3))
+        self.chunker.resend(self.sender, request, ADDR)
+        results = [chunks.add(data, ADDR) for data, _ in self.sender.sent]
+        self.assertEqual(results[-1], self.payload)
+
+    def test_no_re_request_while_chunks_keep_coming(self):
+        chunks = reassembler(self.receiver)
+        chunks.add(self.chunks[0], ADDR)
+        chunks.check()
+        self.assertEqual(self.receiver.sent, [])
+
+    def test_re_requests_stop_after_max_nacks(self):
+        chunks = reassembler(self.receiver)
+        chunks.add(self.chunks[0], ADDR)
+        for _ in range(MAX_NACKS + 2):
+            time.sleep(NACK_DELAY)
+            chunks.check()
+        self.assertEqual(len(self.receiver.sent), MAX_NACKS)
+
+    def test_incomplete_messages_expire(self):
+        chunks = reassembler(self.receiver, timeout=0.01)
+        chunks.add(self.chunks[0], ADDR)
+        time.sleep(0.02)
+        chunks.check()
+        self.assertEqual(chunks.stats["expired"], 1)
+        self.assertEqual(chunks.buffered, 0)
+
+    def test_memory_cap_evicts_oldest(self):
+        chunks = reassembler(self.receiver, memory=2 * CHUNK_PAYLOAD)
+        chunks.add(self.chunks[0], ('10.0.0.8', 1))
+        chunks.add(self.chunks[0], ('10.0.0.9', 1))
+        chunks.add(self.chunks[1], ('10.0.0.9', 1))
+        self.assertEqual(chunks.stats["evicted"], 1)
+        self.assertEqual([addr for addr, _ in chunks.partial], [('10.0.0.9', 1)])
+
+    def test_malformed_headers_are_rejected(self):
+        chunks = reassembler(self.receiver)
+        self.assertIsNone(chunks.add(CHUNK_HEADER.pack(CHUNK_MAGIC, 1, 0, 0) + b'x', ADDR))
+        self.assertIsNone(chunks.add(CHUNK_HEADER.pack(CHUNK_MAGIC, 1, 2, 2) + b'x', ADDR))
+        self.assertEqual(chunks.stats["malformed"], 2)
+        self.assertEqual(chunks.partial, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,12 +21,14 @@ class User:
         return f"User({self.username}, {self.ip}, {self.t_port}, {self.p_port}, {self.state})"
 
 class Game:
-    def __init__(self, dealer, players, game_id, holes, allow_steal=False):
+    def __init__(self, dealer, players, game_id, holes, allow_steal=False, seed=None, turn_timeout=None):
         self.dealer = dealer  # Instance of User
         self.players = players  # List of User instances
         self.id = game_id
         self.holes = holes
         self.allow_steal = allow_steal  # New attribute
+        self.seed = seed  # Seeds every hole's deal; see gamelog.hole_rng
+        self.turn_timeout = turn_timeout  # Seconds a seat has for its turn before the dealer skips it
 
     def to_dict(self):
         return {
@@ -34,8 +36,98 @@ class Game:
             'dealer': self.dealer.to_dict(),
             'players': [player.to_dict() for player in self.players],
             'holes': self.holes,
-            'allow_steal': self.allow_steal  # Include in dict
+            'allow_steal': self.allow_steal,  # Include in dict
+            'seed': self.seed,
+            'turn_timeout': self.turn_timeout
         }
 
     def __repr__(self):
         return f"Game({self.id}, {self.dealer.username}, {[p.username for p in self.players]}, {self.holes}, Allow Steal: {self.allow_steal})"
+
+# Card encoding shared by the dealer, the event log and the replay engine.
+# Card ids run suit-major, then value.
+SUITS = ['♣', '♦', '♥', '♠']
+VALUES = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+CARD_VALUES = [f"{v}{s}" for s in SUITS for v in VALUES]
+CARD_IDS = {value: card_id for card_id, value in enumerate(CARD_VALUES)}
+DECK_SIZE = len(CARD_VALUES)
+
+# Table sizes. Bigger tables play from a shoe of several decks shuffled
+# together, so the deal always leaves SHOE_RESERVE cards for the stock.
+MAX_SEATS = 16
+HAND_SIZE = 6
+SHOE_RESERVE = 26
+
+def card_value(card_str):
+    value_str = card_str[:-1]
+    if value_str == 'A':
+        return 1
+    elif value_str == '2':
+        return -2
+    elif value_str in ['J', 'Q']:
+        return 10
+    elif value_str == 'K':
+        return 0
+    elif value_str.isdigit():
+        return int(value_str)
+    else:
+        return 0
+
+CARD_POINTS = [card_value(value) for value in CARD_VALUES]
+
+def score_card_ids(cards):
+    """Score a 2x3 hand given as six card ids in row-major order.
+
+    A column whose two cards share a rank scores zero.
+    """
+    total = 0
+    for col in range(3):
+        top, bottom = cards[col], cards[col + 3]
+        if top % 13 != bottom % 13:
+            total += CARD_POINTS[top] + CARD_POINTS[bottom]
+    return total
+
+def shoe_decks(seats):
+    """Decks in the shoe of a ``seats``-player game; one up to four seats."""
+    return -(-(seats * HAND_SIZE + 1 + SHOE_RESERVE) // DECK_SIZE)
+
+class Shoe:
+    """One hole's shuffled cards as a list of shoe positions, dealt by moving an index.
+
+    Positions run over every deck and ``position % DECK_SIZE`` is the card
+    id, so a one-deck shoe shuffles and deals exactly as a list of cards
+    popped from the end. Nothing is copied until the stock is handed out.
+    """
+
+    __slots__ = ('cards', 'top', 'decks')
+
+    def __init__(self, rng, decks=1):
+        self.cards = list(range(decks * DECK_SIZE))
+        rng.shuffle(self.cards)
+        self.top = len(self.cards)  # cards[:top] are still in the shoe, the next one last
+        self.decks = decks
+
+    def __len__(self):
+        return self.top
+
+    def ids(self, positions):
+        return positions if self.decks == 1 else [card % DECK_SIZE for card in positions]
+
+    def deal(self, count):
+        """Card ids of the next ``count`` cards, in the order they come off the shoe."""
+        start = self.top - count
+        dealt = self.ids(self.cards[start:self.top])
+        dealt.reverse()
+        self.top = start
+        return dealt
+
+    def draw(self):
+        """Card id of the next card, or None once the shoe is empty."""
+        if not self.top:
+            return None
+        self.top -= 1
+        return self.cards[self.top] % DECK_SIZE
+
+    def stock(self):
+        """Card ids left in the shoe as a stock pile, top last."""
+        return self.ids(self.cards[:self.top])
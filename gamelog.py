@@ -0,0 +1,114 @@
+# gamelog.py
+
+import random
+import struct
+from common import CARD_IDS, CARD_VALUES
+
+MAGIC = b'GLG1'
+
+# Event type -> struct format of its payload (after the one-byte type)
+DEAL, DRAW, SWAP, DISCARD, STEAL, SCORE, SKIP = range(1, 8)
+EVENT_FORMATS = {
+    DEAL: 'B',      # hole
+    DRAW: 'BBB',    # seat, source (0 stock / 1 discard), card id
+    SWAP: 'BB',     # seat, hand position 0-5 receiving the drawn card
+    DISCARD: 'B',   # seat (drawn card goes to the discard pile)
+    STEAL: 'BBBB',  # seat, target seat, target position, own position
+    SCORE: 'Bb',    # seat, hole score
+    SKIP: 'B',      # seat
+}
+EVENT_STRUCTS = {kind: struct.Struct('<B' + fmt) for kind, fmt in EVENT_FORMATS.items()}
+SOURCES = ['stock', 'discard']
+
+def hole_rng(seed, hole, turn=None):
+    """Independent, reproducible RNG stream for one hole (or one reshuffle within it)."""
+    if turn is None:
+        return random.Random(f"{seed}:{hole}")
+    return random.Random(f"{seed}:{hole}:{turn}")
+
+class GameLog:
+    """Compact binary record of one game.
+
+    Layout: MAGIC, seed (u32), holes (u8), player count (u8), then each
+    player name as u8 length + UTF-8 bytes, then fixed-size events. Deals
+    are stored as the hole number only; the cards follow from the seed.
+    """
+
+    def __init__(self, seed, players, holes):
+        self.seed = seed
+        self.players = list(players)
+        self.holes = holes
+        self.events = bytearray()
+        self.seats = {name: seat for seat, name in enumerate(self.players)}
+
+    def append(self, kind, *fields):
+        self.events += EVENT_STRUCTS[kind].pack(kind, *fields)
+
+    def deal(self, hole):
+        self.append(DEAL, hole)
+
+    def score(self, player, score):
+        self.append(SCORE, self.seats[player], score)
+
+    def action(self, player, action):
+        """Record one turn as described by the ``action`` dict players exchange in turn_over."""
+        seat = self.seats[player]
+        kind = (action or {}).get('type')
+        if kind == 'draw':
+            self.append(DRAW, seat, SOURCES.index(action['source']), CARD_IDS[action['card']])
+            if action.get('pos') is None:
+                self.append(DISCARD, seat)
+            else:
+                self.append(SWAP, seat, action['pos'])
+        elif kind == 'steal':
+            self.append(STEAL, seat, self.seats[action['target']], action['target_pos'], action['own_pos'])
+        else:
+            self.append(SKIP, seat)
+
+    def __iter__(self):
+        offset = 0
+        events = self.events
+        while offset < len(events):
+            record = EVENT_STRUCTS[events[offset]]
+            yield record.unpack_from(events, offset)
+            offset += record.size
+
+    def to_bytes(self):
+        out = bytearray(MAGIC)
+        out += struct.pack('<IBB', self.seed, self.holes, len(self.players))
+        for name in self.players:
+            encoded = name.encode()
+            out += struct.pack('<B', len(encoded)) + encoded
+        return bytes(out + self.events)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError("Not a game log")
+        seed, holes, count = struct.unpack_from('<IBB', data, 4)
+        offset = 10
+        players = []
+        for _ in range(count):
+            length = data[offset]
+            players.append(bytes(data[offset + 1:offset + 1 + length]).decode())
+            offset += 1 + length
+        log = cls(seed, players, holes)
+        log.events = bytearray(data[offset:])
+        return log
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+def describe(event):
+    """Human-readable rendering of one decoded event tuple."""
+    kind = event[0]
+    if kind == DRAW:
+        return f"seat {event[1]} draws {CARD_VALUES[event[3]]} from {SOURCES[event[2]]}"
+    names = {DEAL: 'deal', SWAP: 'swap', DISCARD: 'discard', STEAL: 'steal', SCORE: 'score', SKIP: 'skip'}
+    return f"{names[kind]} {event[1:]}"
@@ -0,0 +1,223 @@
+# gamestate.py
+
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+from common import CARD_IDS, CARD_VALUES, score_card_ids
+
+ALL_FACE_UP = 0b111111
+SEQ_WINDOW = 1024  # sequence numbers remembered per sender below the highest one seen
+# Face-up positions for every possible mask, so enumeration is a table lookup.
+FACE_UP_POSITIONS = [tuple(pos for pos in range(6) if mask >> pos & 1) for mask in range(64)]
+
+class HandState:
+    """One player's 2x3 hand: six card ids in row-major order plus a 6-bit face-up mask.
+
+    Position ``pos`` is ``row * 3 + col``. The same model backs the
+    dealer, the other seats and the replay engine.
+    """
+
+    __slots__ = ('cards', 'face_up')
+
+    def __init__(self, cards=None, face_up=0):
+        self.cards = bytearray(cards if cards is not None else 6)
+        self.face_up = face_up
+
+    @classmethod
+    def from_wire(cls, values, statuses):
+        """Build from the card strings and nested status lists used in messages."""
+        mask = 0
+        for row in range(2):
+            for col in range(3):
+                if statuses[row][col]:
+                    mask |= 1 << (row * 3 + col)
+        return cls([CARD_IDS[value] for value in values], mask)
+
+    def values(self):
+        return [CARD_VALUES[card] for card in self.cards]
+
+    def statuses(self):
+        return [[bool(self.face_up >> (row * 3 + col) & 1) for col in range(3)] for row in range(2)]
+
+    def value_at(self, pos):
+        return CARD_VALUES[self.cards[pos]]
+
+    def is_face_up(self, pos):
+        return bool(self.face_up >> pos & 1)
+
+    def all_face_up(self):
+        return self.face_up == ALL_FACE_UP
+
+    def face_up_positions(self):
+        return FACE_UP_POSITIONS[self.face_up]
+
+    def face_down_positions(self):
+        return FACE_UP_POSITIONS[self.face_up ^ ALL_FACE_UP]
+
+    def place(self, pos, card, face_up):
+        """Put ``card`` at ``pos`` and return the card id it replaced."""
+        previous = self.cards[pos]
+        self.cards[pos] = card
+        if face_up:
+            self.face_up |= 1 << pos
+        else:
+            self.face_up &= ~(1 << pos)
+        return previous
+
+    def score(self):
+        return score_card_ids(self.cards)
+
+    def copy(self):
+        return HandState(self.cards, self.face_up)
+
+    def __repr__(self):
+        return f"HandState({self.values()}, {self.face_up:06b})"
+
+class FrozenHand(HandState):
+    """Read-only HandState held by snapshots; its cards are immutable bytes."""
+
+    __slots__ = ()
+
+    def __init__(self, cards, face_up):
+        object.__setattr__(self, 'cards', bytes(cards))
+        object.__setattr__(self, 'face_up', face_up)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenHand is immutable")
+
+    def place(self, pos, card, face_up):
+        raise AttributeError("FrozenHand is immutable")
+
+    def copy(self):
+        return HandState(self.cards, self.face_up)
+
+# Phases of one game as seen from a seat
+IDLE, PLAYING, HOLE_OVER, GAME_OVER = 'idle', 'playing', 'hole_over', 'game_over'
+
+Snapshot = namedtuple('Snapshot', [
+    'version',         # bumped by every applied event
+    'phase',
+    'hole',
+    'players',         # tuple of usernames in seat order
+    'current_player',  # seat index whose turn it is
+    'turn',            # completed turns in this hole
+    'hands',           # read-only mapping username -> FrozenHand
+    'stock',           # tuple of card ids, top of pile last
+    'discard',         # tuple of card ids, top of pile last
+    'done',            # frozenset of players with every card face-up
+    'scores',          # read-only mapping username -> cumulative score
+    'hole_scores',     # read-only mapping username -> score for this hole
+    'hole_winner',
+])
+
+EMPTY = MappingProxyType({})
+INITIAL_SNAPSHOT = Snapshot(0, IDLE, 0, (), 0, 0, EMPTY, (), (), frozenset(), EMPTY, EMPTY, None)
+
+class GameStateMachine:
+    """Applies a seat's game events in order and publishes immutable, versioned snapshots.
+
+    Writers serialise on an internal lock. Readers (rendering, bots) just
+    read ``snapshot``; each snapshot is a complete state that never
+    changes, so they need no lock. ``accept`` tracks per-sender sequence
+    numbers so duplicated and lost peer messages can be detected, while
+    messages that merely arrive out of order are still applied.
+    On the dealer this is the authoritative state of the game; the other
+    seats mirror it from the dealer's broadcasts.
+    """
+
+    def __init__(self):
+        self.snapshot = INITIAL_SNAPSHOT
+        self.write_lock = threading.Lock()
+        # (sender, epoch) -> [highest sequence number seen, bitmap of the ones
+        # seen below it: bit i set means highest - i arrived]
+        self.seen_seq = {}
+        self.stats = {"applied": 0, "duplicates": 0, "gaps": 0, "missing": 0, "late": 0}
+
+    def accept(self, stream, seq):
+        """Check a peer message's sequence number before it is applied.
+
+        Returns None for a message already seen (or too old to tell),
+        which must be dropped, otherwise the number of messages skipped
+        just before it. A skipped message that turns up later (e.g. one
+        whose chunks had to be re-requested) is still accepted and counted
+        as late. Unnumbered messages (tracker, relay) always pass.
+        """
+        if seq is None:
+            return 0
+        with self.write_lock:
+            window = self.seen_seq.get(stream)
+            if window is None:
+                window = self.seen_seq[stream] = [0, 1]  # seq 0 counts as seen
+            highest, seen = window
+            if seq > highest:
+                missing = seq - highest - 1
+                if missing:
+                    self.stats["gaps"] += 1
+                    self.stats["missing"] += missing
+                window[0] = seq
+                window[1] = ((seen << (seq - highest)) | 1) & ((1 << SEQ_WINDOW) - 1)
+                return missing
+            offset = highest - seq
+            if offset >= SEQ_WINDOW or seen >> offset & 1:
+                self.stats["duplicates"] += 1
+                return None
+            window[1] = seen | (1 << offset)
+            self.stats["late"] += 1
+            return 0
+
+    def apply(self, event, **fields):
+        """Apply one event (see the ``on_*`` transitions) and return the new snapshot."""
+        transition = getattr(self, f"on_{event}")
+        with self.write_lock:
+            current = self.snapshot
+            changes = transition(current, **fields)
+            self.snapshot = current._replace(version=current.version + 1, **changes)
+            self.stats["applied"] += 1
+            return self.snapshot
+
+    def on_start(self, state, players):
+        return dict(self.cleared(), players=tuple(players), scores=MappingProxyType({name: 0 for name in players}))
+
+    def on_deal(self, state, hole, hands, stock, discard):
+        return dict(phase=PLAYING, hole=hole, current_player=0, turn=0, done=frozenset(),
+                    hands=MappingProxyType({name: FrozenHand(h.cards, h.face_up) for name, h in hands.items()}),
+                    stock=tuple(stock), discard=tuple(discard), hole_scores=EMPTY, hole_winner=None)
+
+    def on_hand(self, state, player, hand):
+        hands = dict(state.hands)
+        hands[player] = FrozenHand(hand.cards, hand.face_up)
+        return dict(hands=MappingProxyType(hands))
+
+    def on_piles(self, state, stock, discard):
+        return dict(stock=tuple(stock), discard=tuple(discard))
+
+    def on_turn(self, state, current_player, turn):
+        return dict(current_player=current_player, turn=turn)
+
+    def on_player_done(self, state, player):
+        # The hole ends as soon as any player has turned every card face-up.
+        done = state.done | {player}
+        return dict(done=done, phase=HOLE_OVER if state.phase == PLAYING else state.phase)
+
+    def on_hole_end(self, state, scores, hole_scores, winner):
+        return dict(phase=HOLE_OVER, scores=MappingProxyType(dict(scores)),
+                    hole_scores=MappingProxyType(dict(hole_scores)), hole_winner=winner)
+
+    def on_game_end(self, state, scores):
+        return dict(phase=GAME_OVER, scores=MappingProxyType(dict(scores)))
+
+    def on_leave(self, state, player):
+        # A seat left mid-game (its dealer role moved to another seat)
+        hands = {name: hand for name, hand in state.hands.items() if name != player}
+        scores = {name: score for name, score in state.scores.items() if name != player}
+        return dict(players=tuple(name for name in state.players if name != player),
+                    hands=MappingProxyType(hands), scores=MappingProxyType(scores), done=state.done - {player})
+
+    def on_reset(self, state):
+        return self.cleared()
+
+    def cleared(self):
+        # Every field but the version, which keeps counting across games
+        fields = INITIAL_SNAPSHOT._asdict()
+        del fields['version']
+        return fields
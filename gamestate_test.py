@@ -0,0 +1,39 @@
+# gamestate_test.py
+
+import unittest
+from gamestate import GameStateMachine, SEQ_WINDOW
+
+STREAM = ('alice', 1)
+
+class AcceptTest(unittest.TestCase):
+    def setUp(self):
+        self.machine = GameStateMachine()
+
+    def test_in_order(self):
+        self.assertEqual([self.machine.accept(STREAM, seq) for seq in (1, 2, 3)], [0, 0, 0])
+        self.assertEqual(self.machine.stats["gaps"], 0)
+
+    def test_gaps_late_and_duplicates(self):
+        results = [self.machine.accept(STREAM, seq) for seq in (2, 1, 1, 2, 3, 5, 4, 4, 0)]
+        self.assertEqual(results, [1, 0, None, None, 0, 1, 0, None, None])
+        self.assertEqual(self.machine.stats["gaps"], 2)
+        self.assertEqual(self.machine.stats["missing"], 2)
+        self.assertEqual(self.machine.stats["late"], 2)
+        self.assertEqual(self.machine.stats["duplicates"], 4)
+
+    def test_too_old_to_tell(self):
+        self.machine.accept(STREAM, SEQ_WINDOW + 10)
+        self.assertIsNone(self.machine.accept(STREAM, 5))
+        self.assertEqual(self.machine.accept(STREAM, 11), 0)
+
+    def test_unnumbered_always_pass(self):
+        self.assertEqual(self.machine.accept(STREAM, None), 0)
+        self.assertEqual(self.machine.accept(STREAM, None), 0)
+
+    def test_streams_are_separate(self):
+        self.machine.accept(STREAM, 3)
+        self.assertEqual(self.machine.accept(('alice', 2), 1), 0)
+        self.assertEqual(self.machine.accept(('bob', 1), 3), 2)
+
+if __name__ == '__main__':
+    unittest.main()
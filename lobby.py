@@ -0,0 +1,164 @@
+# lobby.py
+
+import json
+import threading
+import time
+
+LOBBY_TICK = 0.1                 # seconds between coalesced lobby updates
+LOBBY_TTL = 60                   # seconds a subscription lives without being renewed
+MAX_LOBBY_SUBSCRIBERS = 10000    # subscriptions the tracker keeps at once
+
+class LobbySubscriber:
+    def __init__(self, addr, player=None):
+        self.addr = addr
+        self.player = player    # registered username whose heartbeats renew this subscription
+        self.version = None     # version of the last update or snapshot sent; None forces a snapshot
+        self.previous = None    # the version before that, which an update in flight may still report
+        self.expires = time.monotonic() + LOBBY_TTL
+
+class LobbyFeed:
+    """Pushes roster and game changes to lobby subscribers instead of making them poll.
+
+    The tracker reports every change to a player or game under its lock.
+    Changes are coalesced per key until the next tick, so a player who
+    registers and leaves within one tick costs nothing, and each tick
+    sends one ``lobby_update`` holding only the keys that changed, encoded
+    once for every subscriber. Updates carry the version they apply to
+    (``from``) and the version they produce.
+
+    A subscriber whose version does not match, because it is new, lost an
+    update, or a send to it failed, gets a full ``lobby_snapshot`` on the
+    next tick instead. Subscribers report their version when they renew
+    (players through their heartbeats), so a lost update is noticed even
+    when nothing else changes.
+    """
+
+    def __init__(self, lock, snapshot, generation, chunker, tick=LOBBY_TICK):
+        self.lock = lock          # the tracker's lock: changes are recorded and collected under it
+        self.snapshot = snapshot  # returns the full lobby state with its version; called holding lock
+        self.generation = generation  # returns the tracker's current version; called holding lock
+        self.chunker = chunker    # snapshots of a large roster go out in chunks
+        self.tick = tick
+        self.sock = None
+        self.players = {}         # username -> player dict, or None once gone, since the last tick
+        self.games = {}           # str(game id) -> game dict, or None once over
+        self.version = None       # version the last tick left subscribers at
+        self.subscribers = {}     # addr -> LobbySubscriber
+        self.by_player = {}       # username -> LobbySubscriber
+        self.stats = {"updates": 0, "snapshots": 0, "resyncs": 0, "delivered": 0, "failed": 0, "expired": 0}
+
+    def start(self, sock):
+        self.sock = sock
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            time.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"DEBUG: Lobby flush failed: {e}")
+
+    def player_changed(self, player, removed=False):
+        # Caller holds self.lock
+        if self.subscribers:
+            self.players[player.username] = None if removed else player.to_dict()
+
+    def game_changed(self, game, removed=False):
+        # Caller holds self.lock
+        if self.subscribers:
+            self.games[str(game.id)] = None if removed else game.to_dict()
+
+    def subscribe(self, addr, player=None, version=None):
+        """Add or renew a subscription. Returns False when the tracker is full."""
+        with self.lock:
+            sub = self.subscribers.get(addr)
+            if sub is None:
+                if len(self.subscribers) >= MAX_LOBBY_SUBSCRIBERS:
+                    return False
+                sub = self.subscribers[addr] = LobbySubscriber(addr, player)
+                if player:
+                    self.by_player[player] = sub
+                print(f"DEBUG: {player or addr} subscribed to the lobby")
+            else:
+                self.check_version(sub, version)
+            sub.expires = time.monotonic() + LOBBY_TTL
+        return True
+
+    def unsubscribe(self, addr):
+        with self.lock:
+            sub = self.subscribers.pop(addr, None)
+            if sub and sub.player:
+                self.by_player.pop(sub.player, None)
+
+    def renew(self, player, version):
+        """Renew ``player``'s subscription from a heartbeat; False if it has none."""
+        # Caller holds self.lock
+        sub = self.by_player.get(player)
+        if sub is None:
+            return False
+        sub.expires = time.monotonic() + LOBBY_TTL
+        self.check_version(sub, version)
+        return True
+
+    def check_version(self, sub, version):
+        if version is not None and sub.version is not None and version not in (sub.version, sub.previous):
+            sub.version = None
+            self.stats["resyncs"] += 1
+
+    def drop(self, sub):
+        # Caller holds self.lock
+        del self.subscribers[sub.addr]
+        if sub.player:
+            self.by_player.pop(sub.player, None)
+
+    def flush(self):
+        """Send this tick's changes to up-to-date subscribers and a snapshot to the rest."""
+        now = time.monotonic()
+        update = snapshot = None
+        with self.lock:
+            if not self.subscribers:
+                self.players.clear()
+                self.games.clear()
+                self.version = None
+                return
+            players, games = self.players, self.games
+            self.players, self.games = {}, {}
+            for sub in list(self.subscribers.values()):
+                if sub.expires <= now or (sub.player and players.get(sub.player, True) is None):
+                    # Lapsed, or its player is gone
+                    self.drop(sub)
+                    self.stats["expired"] += 1
+            previous = self.version
+            if (players or games) and previous is not None:
+                self.version = self.generation()
+                update = {"command": "lobby_update", "from": previous, "version": self.version,
+                          "players": players, "games": games}
+            behind, current = [], []
+            for sub in self.subscribers.values():
+                (current if sub.version == previous and previous is not None else behind).append(sub)
+            if behind:
+                snapshot = self.snapshot()
+                self.version = snapshot["version"]
+            for sub in self.subscribers.values():
+                sub.previous, sub.version = sub.version, self.version
+        sends = []
+        if update and current:
+            sends.append((json.dumps(update).encode(), current, "updates"))
+        if snapshot:
+            sends.append((json.dumps(dict(snapshot, command="lobby_snapshot")).encode(), behind, "snapshots"))
+        for payload, subs, kind in sends:
+            for sub in subs:
+                try:
+                    self.chunker.sendto(self.sock, payload, sub.addr)
+                    self.stats["delivered"] += 1
+                except (OSError, ValueError) as e:
+                    print(f"DEBUG: Failed to send a lobby update to {sub.addr}: {e}")
+                    self.stats["failed"] += 1
+                    with self.lock:
+                        sub.version = None  # resync with a snapshot next tick
+            self.stats[kind] += 1
+
+    def metrics(self):
+        with self.lock:
+            return dict(self.stats, subscribers=len(self.subscribers))
@@ -6,15 +6,64 @@ import threading
 import sys
 import random
 import math
+import itertools
 import os
 import time
-import traceback
-from common import User, Game  # Ensure 'common.py' defines User and Game classes appropriately
+import queue
+from common import User, CARD_VALUES, CARD_IDS, MAX_SEATS, HAND_SIZE, Shoe, shoe_decks
+from transport import StreamClient, parse_endpoint, decode_json, MAX_DATAGRAM
+from chunking import Chunker, Reassembler, is_chunk, is_nack
+from batching import AutoBatcher, split_batches
+# Game-only modules (ai, gamestate, gamelog, render, timers, profiling) are
+# imported where they are first needed, so a lobby-only client never loads them.
 
 TRACE = False  # Set to True to enable debug tracing
+HEARTBEAT_INTERVAL = 5  # Seconds between liveness heartbeats to the tracker
+HOLE_PAUSE = 10  # Seconds the results of a hole stay on screen before the next one
+SUBSCRIPTION_RENEW_INTERVAL = 20  # Seconds between spectator subscription renewals
+GAME_LOG_DIR = os.environ.get('CARDGAME_LOG_DIR')  # Dealers save binary game logs here when set
+TRACKER_TRANSPORT = os.environ.get('CARDGAME_TRANSPORT', 'udp')  # 'udp', 'tcp[:HOST:PORT]' or 'unix:PATH'
+AI_PLAYER = os.environ.get('CARDGAME_AI') == '1'  # Let the Monte-Carlo engine (ai.py) play our turns
+RECV_BUFFER = int(os.environ.get('CARDGAME_RCVBUF', 1 << 20))  # Requested SO_RCVBUF for the player socket
+WORK_QUEUE_SIZE = 1024  # Decoded messages waiting per game before new ones are dropped
+WORKER_IDLE_TIMEOUT = 30  # Seconds an idle per-game worker lingers before exiting
+TRACKER_FALLBACKS = os.environ.get('CARDGAME_TRACKERS', '')  # 'HOST:PORT,...' tried after the given tracker
+TRACKER_FAILOVER_TIMEOUT = 1.0  # Per-request timeout when there are other trackers to fall back on
+TRACKER_FAILOVER_WAIT = 3.0  # Seconds to keep cycling through the trackers while a follower takes over
+LOCAL_IP = os.environ.get('CARDGAME_LOCAL_IP')  # Address to register with; skips discovery when set
+LOBBY_PUSH = os.environ.get('CARDGAME_LOBBY', '1') == '1'  # Have the tracker push lobby changes instead of polling
+PIPELINED_DEALS = os.environ.get('CARDGAME_PIPELINE', '1') == '1'  # Prepare each hole's deal ahead on a worker
+DEAL_POOL_SIZE = 64  # Prepared deals kept at most (games that end early leave theirs behind)
+PROFILE = os.environ.get('CARDGAME_PROFILE')  # Sample manage_turns and handlers with profiling.py when set
+TURN_TIMEOUT = os.environ.get('CARDGAME_TURN_TIMEOUT')  # Seconds per turn requested for games we start (tracker default when unset)
+DEALER_SNAPSHOT_INTERVAL = 0.25  # Seconds between the dealer's game snapshots to the next seat
+DEALER_FAILOVER_TIMEOUT = 1.0  # Seconds without a dealer snapshot before the next seat takes over dealing
+
+# Discovered local addresses keyed by tracker ip, shared by every Player in
+# the process so a bot farm probes the routing table once, not per player.
+local_ip_cache = {}
+local_ip_lock = threading.Lock()
+
+# Game-only state shared by a process or owned by a Player is built on first
+# use, under this lock (see dealer_timers and the Player properties).
+lazy_lock = threading.Lock()
+
+# Turn deadlines of every game this process deals, on one timer wheel and
+# thread; built when the first dealer needs it.
+turn_timers = None
+
+def dealer_timers():
+    global turn_timers
+    with lazy_lock:
+        if turn_timers is None:
+            from timers import Timers
+            turn_timers = Timers()
+        return turn_timers
 
 def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    # ANSI clear instead of spawning `clear`; also resets the pinned hand frame
+    from render import screen
+    screen.clear()
 
 # ANSI color codes for terminal output
 class Colors:
@@ -27,53 +76,153 @@ class Colors:
     RESET = '\033[0m'
     BOLD = '\033[1m'
 
-class Card:
-    def __init__(self, value):
-        self.value = value  # e.g., 'A♠', '10♥', 'K♦'
+# Positions two of which are turned face-up in every dealt hand
+DEAL_POSITIONS = [(i, j) for i in range(2) for j in range(3)]
+
+class Deal:
+    """One hole's shuffled stock (card ids, top last), dealt hands and first discard."""
+    __slots__ = ('stock', 'hands', 'top_card')
+
+    def __init__(self, stock, hands, top_card):
+        self.stock = stock
+        self.hands = hands
+        self.top_card = top_card
+
+def prepare_deal(seed, hole, usernames):
+    """Deal a hole for the seats in ``usernames`` order.
+
+    Everything random comes from the hole's own seeded stream, so the deal
+    can be reproduced from the log and is the same whether it was prepared
+    ahead or just now.
+    """
+    from gamelog import hole_rng
+    from gamestate import HandState
+    rng = hole_rng(seed, hole)
+    shoe = Shoe(rng, shoe_decks(len(usernames)))
+    hands = {}
+    for username in usernames:
+        hand = HandState(shoe.deal(HAND_SIZE))
+        # Turn two random cards face-up
+        for i, j in rng.sample(DEAL_POSITIONS, 2):
+            hand.face_up |= 1 << (i * 3 + j)
+        hands[username] = hand
+    top_card = shoe.draw()
+    return Deal(shoe.stock(), hands, top_card)
+
+class DealPool:
+    """Deals prepared ahead of time by one worker thread, shared by every game this process deals.
+
+    The dealer asks for the next hole's deal while the current one is
+    played, so setting up the next hole only picks it up. Deals are
+    keyed by (seed, hole, seats); a deal that is not ready yet is simply
+    computed inline, which gives the same cards.
+    """
+
+    def __init__(self, size=DEAL_POOL_SIZE):
+        self.size = size
+        self.ready = {}  # (seed, hole, seats) -> Deal, or None while the worker prepares it
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stats = {"prepared": 0, "hits": 0, "misses": 0}
 
-    def __repr__(self):
-        return self.value
+    def prefetch(self, seed, hole, usernames):
+        key = (seed, hole, tuple(usernames))
+        with self.lock:
+            if key in self.ready:
+                return
+            self.ready[key] = None
+            while len(self.ready) > self.size:
+                del self.ready[next(iter(self.ready))]
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="deals", daemon=True)
+                self.thread.start()
+        self.requests.put(key)
+
+    def take(self, seed, hole, usernames):
+        key = (seed, hole, tuple(usernames))
+        with self.lock:
+            deal = self.ready.pop(key, None)
+            self.stats["hits" if deal else "misses"] += 1
+        return deal or prepare_deal(*key)
 
-class Deck:
-    def __init__(self):
-        suits = ['♣', '♦', '♥', '♠']
-        values = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
-        self.cards = [Card(f"{v}{s}") for s in suits for v in values]
-        self.shuffle()
+    def run(self):
+        while True:
+            key = self.requests.get()
+            deal = prepare_deal(*key)
+            with self.lock:
+                if key in self.ready:  # not taken or evicted meanwhile
+                    self.ready[key] = deal
+                    self.stats["prepared"] += 1
 
-    def shuffle(self):
-        random.shuffle(self.cards)
+# Next-hole deals of every game this process deals, prepared by one worker.
+deal_pool = DealPool()
 
 class Player:
-    def __init__(self, tracker_ip, tracker_port, t_port, p_port, group_number):
+    def __init__(self, tracker_ip, tracker_port, t_port, p_port, group_number, rcvbuf=RECV_BUFFER,
+                 transport=TRACKER_TRANSPORT, ai=AI_PLAYER, fallbacks=TRACKER_FALLBACKS, host=None):
         self.tracker_ip = tracker_ip
         self.tracker_port = tracker_port
+        # Replicated trackers: on a timeout or NOT_LEADER reply, requests move
+        # on to the next address (see send_to_tracker).
+        self.trackers = [(tracker_ip, tracker_port)]
+        for item in filter(None, (part.strip() for part in fallbacks.split(','))):
+            host, port = item.rsplit(':', 1)
+            self.trackers.append((host or tracker_ip, int(port)))
+        self.tracker_timeout = TRACKER_FAILOVER_TIMEOUT if len(self.trackers) > 1 else 5
+        self.auto_batcher = None  # built on first use, see the batcher property
         self.t_port = t_port
         self.p_port = p_port
         self.group_number = group_number
         self.name = None
-        self.hand = []
         self.score = 0
-        self.t_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try:
-            self.t_sock.bind(('', self.t_port))
-        except OSError as e:
-            print(f"Error binding t_port {self.t_port}: {e}")
-            sys.exit(1)
-        self.p_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try:
-            self.p_sock.bind(('', self.p_port))
-        except OSError as e:
-            print(f"Error binding p_port {self.p_port}: {e}")
-            sys.exit(1)
+        # A session of a multi-session client (sessions.py) shares the host's
+        # sockets, chunker and reassemblers; the host's loop receives for it.
+        self.host = host
+        if host:
+            self.t_sock, self.p_sock = host.t_sock, host.p_sock
+            self.chunker, self.peer_reassembler, self.reply_reassembler = host.chunker, host.peer_chunks, host.reply_chunks
+            self.replies = queue.Queue()  # tracker replies the host routed to us
+        else:
+            self.t_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                self.t_sock.bind(('', self.t_port))
+            except OSError as e:
+                print(f"Error binding t_port {self.t_port}: {e}")
+                sys.exit(1)
+            self.p_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                self.p_sock.bind(('', self.p_port))
+            except OSError as e:
+                print(f"Error binding p_port {self.p_port}: {e}")
+                sys.exit(1)
+            # A larger kernel buffer absorbs bursts (e.g. a full deal) while handlers run
+            self.p_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            # Messages above one chunk go out in MTU-sized chunks (see chunking.py);
+            # peers' chunks and chunked tracker replies are reassembled per
+            # socket, by reassemblers built when the first chunk arrives.
+            self.chunker = Chunker()
+            self.peer_reassembler = None
+            self.reply_reassembler = None
+        # The receive loop only decodes and enqueues; handlers run on one worker
+        # per game so a slow handler never stalls the socket.
+        self.work_queues = {}  # game id -> queue.Queue of (msg, addr)
+        self.work_lock = threading.Lock()
+        self.recv_stats = {"received": 0, "handled": 0, "malformed": 0, "duplicates": 0, "queue_full": 0,
+                           "rcvbuf": self.p_sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)}
+        # Tracker requests go over t_sock, or over one persistent framed
+        # connection when a stream transport is selected.
+        kind, address = parse_endpoint(transport, tracker_ip)
+        self.tracker_stream = None
+        if kind != 'udp':
+            self.tracker_stream = StreamClient(kind, address or (tracker_ip, tracker_port))
         self.players_info = []
         self.game_id = None
         self.holes = 0
         self.is_dealer = False
         self.stock_pile = []
         self.discard_pile = []
-        self.hand_grid = []
-        self.card_statuses = []
+        self.my_hand = None  # HandState once a hole is dealt
         self.current_player_index = 0
         self.game_over = False
         self.lock = threading.Lock()
@@ -82,9 +231,18 @@ class Player:
         self.hole_scores = {}      # Store scores for the current hole
         self.hole_winner = None    # Store winner of the current hole
         self.running = True
-        self.players_done = set()
         self.in_game = False
 
+        # Monte-Carlo decision engine when turns are played automatically,
+        # and the rest of the turn it planned (discard position or steal).
+        self.ai = None
+        if ai:
+            from ai import MonteCarloAI
+            self.ai = MonteCarloAI()
+        self.ai_plan = None
+        # The discard pile our current turn's draw reshuffled into the stock, if it did
+        self.reshuffled_from = None
+
         # Flags and data for thread communication
         self.is_my_turn = False
         self.turn_data = {}
@@ -92,9 +250,32 @@ class Player:
         # Initialize turn_event for synchronization
         self.turn_event = threading.Event()
 
+        # Turn deadlines. The dealer keeps the (hole, turn) it is waiting on so
+        # that a turn is closed once, by the player or by the timer, never both.
+        self.turn_timeout = None     # Seconds per turn in the current game (None: no deadline)
+        self.open_turn = None
+        self.turn_timed_out = False
+        self.turns_timed_out = 0
+        self.expired_turn = None     # Our turn number the dealer skipped, if we are still playing it
+        self.completed_turn = None   # (hole, turn) we last finished, so a re-sent your_turn is not played twice
+        self.closed_turn = None      # Dealer: (hole, turn) last closed and logged
+
+        # Dealer failover. The dealer sends its game snapshot to the next seat
+        # (its successor) every DEALER_SNAPSHOT_INTERVAL and after every turn;
+        # seats copy their turn_over to the successor too. When the snapshots
+        # stop for DEALER_FAILOVER_TIMEOUT the successor takes over dealing.
+        self.dealer_backup = None    # Successor: the latest dealer_snapshot
+        self.dealer_contact = 0.0    # Successor: monotonic time it arrived
+        self.last_turn_over = None   # Successor: the latest turn_over copied to us
+        self.hole_scored = False     # Dealer: the current hole's scores are in the totals
+        self.dealer_takeovers = []   # Seconds from the last dealer snapshot to our first turn as its successor
+
         # Variables to track holes
         self.current_hole = 0
-        self.hole_over = False
+
+        # Dealer-side wall-clock durations (seconds) of every turn and hole played
+        self.turn_durations = []
+        self.hole_durations = []
 
         # Calculate the port range based on the group number
         self.port_min, self.port_max = self.calculate_port_range(group_number)
@@ -106,12 +287,88 @@ class Player:
         # Initialize set to keep track of received scores
         self.scores_received = set()
 
-        # New attribute to store other players' hands
+        # Other players' hands as compact HandState objects, keyed by username
         self.other_players_hands = {}
 
         # New attribute to indicate if stealing is allowed
         self.allow_steal = False
 
+        # Last versioned replies to tracker read commands, keyed by command
+        self.tracker_cache = {}
+
+        # Lobby pushed by the tracker while subscribed (see lobby.py):
+        # {'version', 'relay', 'players': {username: dict}, 'games': {str(id): dict}}
+        self.lobby_subscribed = False
+        self.lobby = None
+
+        # Seeded dealing and the dealer's event log (see gamelog.py)
+        self.game_seed = None
+        self.turn_number = 0       # Completed turns in the current hole
+        self.turn_action = None    # What this player did during its current turn
+        self.game_log = None
+
+        # Spectator relay advertised by the tracker, and the game we watch (if any)
+        self.relay_addr = None
+        self.spectating = None
+
+        # Versioned game state (authoritative on the dealer, mirrored elsewhere),
+        # built on first game entry by the game_state property.
+        # Peer messages carry a per-destination sequence number; the epoch
+        # tells a restarted sender apart from a replayed one.
+        self.state_machine = None
+        self.out_seq = {}  # (ip, port) -> itertools.count
+        self.seq_epoch = random.getrandbits(32)
+
+        # Relay that carries this game's messages when the tracker routes games
+        # (seats behind NAT); peers are then addressed by username, not ip/port.
+        self.route_addr = None
+        self.peers = {}  # username -> User for the other seats
+
+        # Sampling profiler over manage_turns and message handlers (CARDGAME_PROFILE)
+        self.profiler = None
+        if PROFILE:
+            import profiling
+            self.profiler = profiling.from_env(f'player{p_port}', {'manage_turns', 'dispatch_message'})
+
+    @property
+    def game_state(self):
+        if self.state_machine is None:
+            from gamestate import GameStateMachine
+            with lazy_lock:
+                if self.state_machine is None:
+                    self.state_machine = GameStateMachine()
+        return self.state_machine
+
+    @property
+    def peer_chunks(self):
+        if self.peer_reassembler is None:
+            with lazy_lock:
+                if self.peer_reassembler is None:
+                    self.peer_reassembler = Reassembler(self.p_sock)
+        return self.peer_reassembler
+
+    @property
+    def reply_chunks(self):
+        if self.reply_reassembler is None:
+            with lazy_lock:
+                if self.reply_reassembler is None:
+                    self.reply_reassembler = Reassembler(self.t_sock)
+        return self.reply_reassembler
+
+    @property
+    def batcher(self):
+        """Tracker requests from several threads share round trips through this."""
+        if self.auto_batcher is None:
+            with lazy_lock:
+                if self.auto_batcher is None:
+                    self.auto_batcher = AutoBatcher(self.send_batch)
+        return self.auto_batcher
+
+    @property
+    def hole_over(self):
+        from gamestate import HOLE_OVER, GAME_OVER
+        return self.game_state.snapshot.phase in (HOLE_OVER, GAME_OVER)
+
     def calculate_port_range(self, group_number):
         if group_number % 2 == 0:  # Even group number
             base_port = (group_number // 2) * 1000 + 1000
@@ -129,26 +386,77 @@ class Player:
             print(f"[TRACE] {message}")
 
     def get_local_ip(self):
-        """Retrieve the local IP address of the machine."""
+        """Retrieve the local IP address peers and the tracker can reach us on (cached per process)."""
+        if LOCAL_IP:
+            return LOCAL_IP
+        with local_ip_lock:
+            ip = local_ip_cache.get(self.tracker_ip)
+            if ip is None:
+                ip = local_ip_cache[self.tracker_ip] = self.discover_local_ip()
+            return ip
+
+    def discover_local_ip(self):
+        # Connecting a UDP socket sends nothing; it only asks the kernel which
+        # interface routes to the tracker. A tracker on this machine is reached
+        # over loopback, which remote seats cannot use, so then an address this
+        # host's name resolves to is preferred; loopback stays when there is
+        # none (CARDGAME_LOCAL_IP overrides it).
+        ip = self.route_source(self.tracker_ip, self.tracker_port)
+        if ip is None:
+            print("Error obtaining local IP: no route to the tracker")
+            return "127.0.0.1"  # Fallback to localhost
+        if ip.startswith('127.'):
+            ip = self.host_address() or ip
+        return ip
+
+    def host_address(self):
+        try:
+            infos = socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET, socket.SOCK_DGRAM)
+        except OSError:
+            return None
+        return next((info[4][0] for info in infos if not info[4][0].startswith('127.')), None)
+
+    def route_source(self, host, port):
         try:
-            # Connect to a public DNS server to get the local IP address
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-                s.connect(("8.8.8.8", 80))
+                s.connect((host, port))
                 return s.getsockname()[0]
-        except Exception as e:
-            print(f"Error obtaining local IP: {e}")
-            return "127.0.0.1"  # Fallback to localhost
-
-    def send_message(self, msg, ip, port, expect_response=False, timeout=5):
+        except OSError:
+            return None
+
+    def next_seq(self, destination):
+        # Numbered per destination session (a username), or per address when there is none.
+        return next(self.out_seq.setdefault(destination, itertools.count(1)))
+
+    def stamp(self, msg, seq=None, session=None):
+        """Number a peer message so the receiver can drop duplicates and count losses.
+
+        ``session`` names the recipient, so a multi-session client
+        (sessions.py) can tell which of its players a message is for.
+        """
+        msg = dict(msg, sender=self.name, epoch=self.seq_epoch, seq=seq, game=self.game_id)
+        if session:
+            msg['session'] = session
+        return msg
+
+    def send_message(self, msg, ip, port, expect_response=False, timeout=5, session=None):
+        if self.route_addr and session in self.peers:
+            self.send_routed([self.peers[session]], msg)
+            return None
+        if port != self.tracker_port:
+            msg = self.stamp(msg, self.next_seq(session or (ip, port)), session)
+        elif self.tracker_stream:
+            return self.send_to_tracker_stream(msg, expect_response)
+        elif self.host:
+            msg = dict(msg, session=self.name)  # the tracker echoes it in its reply
         self.trace(f"Sending to {ip}:{port}: {msg}")
         try:
             sock = self.t_sock if port == self.tracker_port else self.p_sock
-            sock.sendto(json.dumps(msg).encode(), (ip, port))
+            self.chunker.sendto(sock, json.dumps(msg).encode(), (ip, port))
             if expect_response:
-                sock.settimeout(timeout)
-                data, _ = sock.recvfrom(65535)
-                self.trace(f"Received from {ip}:{port}: {data}")
-                return json.loads(data.decode())
+                response = self.receive_reply(sock, timeout)
+                self.trace(f"Received from {ip}:{port}: {response}")
+                return response
         except socket.timeout:
             print("No response from server. Please try again later.")
         except Exception as e:
@@ -157,14 +465,159 @@ class Player:
             sock.settimeout(None)
         return None
 
-    def send_to_tracker(self, msg):
-        return self.send_message(msg, self.tracker_ip, self.tracker_port, expect_response=True)
+    def receive_reply(self, sock, timeout):
+        """Wait for one reply on ``sock``, reassembling it when it arrives in chunks."""
+        if self.host:
+            # The host's loop reads the shared socket and hands us our replies.
+            try:
+                return self.replies.get(timeout=timeout)
+            except queue.Empty:
+                raise socket.timeout from None
+        deadline = time.monotonic() + timeout
+        while True:
+            sock.settimeout(max(0.001, deadline - time.monotonic()))
+            data, addr = sock.recvfrom(MAX_DATAGRAM)
+            if is_nack(data):
+                # The tracker missed chunks of a large request of ours
+                self.chunker.resend(sock, data, addr)
+                continue
+            if is_chunk(data):
+                data = self.reply_chunks.add(data, addr)
+                if data is None:
+                    continue
+            return decode_json(data)
+
+    def send_to_tracker_stream(self, msg, expect_response=True):
+        self.trace(f"Sending to tracker over {self.tracker_stream.kind}: {msg}")
+        try:
+            if expect_response:
+                return self.tracker_stream.request(msg)
+            self.tracker_stream.post(msg)
+        except socket.timeout:
+            print("No response from server. Please try again later.")
+        except Exception as e:
+            print(f"Error communicating with the tracker over {self.tracker_stream.kind}: {e}")
+        return None
 
-    def register(self):
+    def send_to_tracker(self, msg, retries=3):
+        # The tracker answers with status BUSY when it is shedding load or rate
+        # limiting us; back off for the advertised interval and try again.
+        # With several trackers, silence or NOT_LEADER moves on to the next one
+        # for up to TRACKER_FAILOVER_WAIT while a follower takes over.
+        attempt = 0
+        failover_deadline = None
+        while True:
+            self.discard_stale_replies()
+            response = self.send_message(msg, self.tracker_ip, self.tracker_port, expect_response=True,
+                                         timeout=self.tracker_timeout)
+            if len(self.trackers) > 1 and (not response or response.get('status') == 'NOT_LEADER'):
+                if failover_deadline is None:
+                    failover_deadline = time.monotonic() + TRACKER_FAILOVER_WAIT
+                if time.monotonic() < failover_deadline:
+                    self.next_tracker()
+                    continue
+            if not response or response.get('status') != 'BUSY' or attempt == retries:
+                return response
+            attempt += 1
+            self.trace(f"Tracker busy: {response.get('message')}; retrying")
+            time.sleep(response.get('retry_after') or 0.1)
+
+    def send_batch(self, msgs):
+        """Send many tracker commands in as few batch envelopes as possible.
+
+        Returns one response per message, in order. Every message of an
+        envelope that failed as a whole gets that envelope's reply (or None).
+        """
+        responses = []
+        for envelope in split_batches(msgs):
+            reply = self.send_to_tracker(envelope)
+            if reply and reply.get('status') == 'SUCCESS':
+                responses.extend(reply['responses'])
+            else:
+                responses.extend([reply] * len(envelope['commands']))
+        return responses
+
+    def next_tracker(self):
+        """Switch tracker requests and heartbeats to the next address in the list."""
+        index = (self.trackers.index((self.tracker_ip, self.tracker_port)) + 1) % len(self.trackers)
+        if index == 0:
+            time.sleep(0.05)  # a whole round without a leader: give the followers a moment
+        self.trace(f"Trying tracker {self.trackers[index][0]}:{self.trackers[index][1]}")
+        self.switch_tracker(self.trackers[index])
+
+    def switch_tracker(self, address):
+        self.tracker_ip, self.tracker_port = address
+        if self.tracker_stream and self.tracker_stream.kind == 'tcp':
+            self.tracker_stream.close()
+            self.tracker_stream = StreamClient('tcp', address)
+
+    def send_routed(self, peers, msg):
+        """Hand one message for several seats to the relay as a single datagram."""
+        envelope = {
+            'command': 'route',
+            'game_id': self.game_id,
+            'from': self.name,
+            'to': [peer.username for peer in peers],
+            'seqs': [self.next_seq(peer.username) for peer in peers],
+            'msg': self.stamp(msg)
+        }
+        self.trace(f"Routing to {envelope['to']}: {msg}")
+        try:
+            self.p_sock.sendto(json.dumps(envelope).encode(), self.route_addr)
+        except OSError as e:
+            print(f"Error routing {msg.get('command')} through the relay: {e}")
+
+    def broadcast(self, msg):
+        """Send a message to every other seat: one routed datagram, or one datagram per peer."""
+        self.send_to_peers([player for player in self.players_info if player.username != self.name], msg)
+
+    def send_to_peers(self, peers, msg):
+        if not peers:
+            return
+        if self.route_addr:
+            self.send_routed(peers, msg)
+            return
+        # Encoded once for every peer: only the session and sequence number differ, and they go last.
+        body = json.dumps(dict(msg, sender=self.name, epoch=self.seq_epoch, game=self.game_id)).encode()[:-1]
+        self.trace(f"Sending to {len(peers)} peers: {msg}")
+        for player in peers:
+            addr = (player.ip, player.p_port)
+            try:
+                self.chunker.sendto(self.p_sock, b'%s, "session": %s, "seq": %d}' % (
+                    body, json.dumps(player.username).encode(), self.next_seq(player.username)), addr)
+            except Exception as e:
+                print(f"Error communicating with {addr[0]}:{addr[1]}: {e}")
+
+    def attach_route(self):
+        # Sent from the game socket so the relay learns (and NAT keeps open) our address.
+        msg = {'command': 'attach', 'game_id': self.game_id, 'player': self.name}
+        try:
+            self.p_sock.sendto(json.dumps(msg).encode(), self.route_addr)
+        except OSError as e:
+            self.trace(f"Attach to relay failed: {e}")
+
+    def discard_stale_replies(self):
+        """Drop late replies (e.g. a BUSY for a heartbeat) so they are not mistaken for ours."""
+        if self.tracker_stream:
+            return  # replies on a stream are matched to requests by order
+        if self.host:
+            while not self.replies.empty():
+                self.replies.get_nowait()
+            return
+        self.t_sock.setblocking(False)
+        try:
+            while True:
+                self.t_sock.recvfrom(65535)
+        except (BlockingIOError, OSError):
+            pass
+        finally:
+            self.t_sock.setblocking(True)
+
+    def register(self, username=None):
         if self.name:
             print("You are already registered.")
             return
-        self.name = input("Enter your username: ").strip()
+        self.name = username or input("Enter your username: ").strip()
         if not self.name:
             print("Username cannot be empty.")
             return
@@ -183,6 +636,46 @@ class Player:
         print(response.get('message', ''))
         if response.get('status') != "SUCCESS":
             self.name = None
+        else:
+            self.start_heartbeat()
+            # Pushes name no session, so a host would hand each one to all of its sessions.
+            if LOBBY_PUSH and not self.host:
+                self.subscribe_lobby()
+
+    def subscribe_lobby(self):
+        response = self.send_to_tracker({'command': 'subscribe_lobby', 'player': self.name})
+        self.lobby_subscribed = bool(response and response.get('status') == 'SUCCESS')
+        if not self.lobby_subscribed:
+            self.trace(f"Lobby subscription failed: {response}")
+
+    def start_heartbeat(self):
+        if self.host:
+            return  # the host sends every session's heartbeats together
+        if not hasattr(self, 'heartbeat_thread') or not self.heartbeat_thread.is_alive():
+            self.heartbeat_thread = threading.Thread(target=self.send_heartbeats, daemon=True)
+            self.heartbeat_thread.start()
+
+    def send_heartbeats(self):
+        # Heartbeats are fire-and-forget and bypass send_message so they never
+        # touch the timeout of a request that is waiting on t_sock.
+        while self.running and self.name:
+            self.post_heartbeat()
+            if self.route_addr and self.in_game:
+                self.attach_route()
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    def post_heartbeat(self):
+        msg = {'command': 'heartbeat', 'player': self.name}
+        if self.lobby_subscribed:
+            # Renews the lobby subscription; a stale version gets us a fresh snapshot.
+            msg['lobby_version'] = self.lobby['version'] if self.lobby else 0
+        try:
+            if self.tracker_stream:
+                self.tracker_stream.post(msg)
+            else:
+                self.t_sock.sendto(json.dumps(msg).encode(), (self.tracker_ip, self.tracker_port))
+        except OSError as e:
+            self.trace(f"Heartbeat failed: {e}")
 
     def de_register(self):
         if not self.name:
@@ -194,10 +687,14 @@ class Player:
             print(response.get('message', ''))
             if response.get('status') == "SUCCESS":
                 self.name = None
+                self.lobby_subscribed = False
+                self.lobby = None
 
     def query_players(self):
-        msg = {'command': 'query_players'}
-        response = self.send_to_tracker(msg)
+        if self.lobby:
+            self.display_players(list(self.lobby['players'].values()))
+            return
+        response = self.query_tracker_cached('query_players')
         if response and response.get('status') == 'SUCCESS':
             players = response.get('players', [])
             self.display_players(players)
@@ -205,14 +702,29 @@ class Player:
             print("Failed to query players.")
 
     def query_games(self):
-        msg = {'command': 'query_games'}
-        response = self.send_to_tracker(msg)
+        if self.lobby:
+            self.display_games(sorted(self.lobby['games'].values(), key=lambda game: game['id']))
+            return
+        response = self.query_tracker_cached('query_games')
         if response and response.get('status') == 'SUCCESS':
             games = response.get('games', [])
             self.display_games(games)
         else:
             print("Failed to query games.")
 
+    def query_tracker_cached(self, command):
+        """Send a read command with the last-seen version and reuse our copy on NOT_MODIFIED."""
+        cached = self.tracker_cache.get(command)
+        msg = {'command': command}
+        if cached:
+            msg['version'] = cached['version']
+        response = self.send_to_tracker(msg)
+        if response and response.get('status') == 'NOT_MODIFIED' and cached:
+            return cached
+        if response and response.get('status') == 'SUCCESS' and 'version' in response:
+            self.tracker_cache[command] = response
+        return response
+
     def display_players(self, players):
         clear_screen()
         print(f"{Colors.BOLD}{Colors.BLUE}=== Player List ({len(players)} players) ==={Colors.RESET}")
@@ -236,7 +748,7 @@ class Player:
         if not self.name:
             print("You must register first.")
             return
-        n = self.get_numeric_input("Enter number of additional players (1-3): ", 1, 3)
+        n = self.get_numeric_input(f"Enter number of additional players (1-{MAX_SEATS - 1}): ", 1, MAX_SEATS - 1)
         if n is None:
             return
         holes = self.get_numeric_input("Enter number of holes (1-9): ", 1, 9)
@@ -258,12 +770,82 @@ class Player:
             '#holes': holes,
             'allow_steal': allow_steal
         }
+        if TURN_TIMEOUT:
+            msg['turn_timeout'] = float(TURN_TIMEOUT)
         response = self.send_to_tracker(msg)
         if response and response.get('status') == 'SUCCESS':
             print("Game started successfully. Players have been notified.")
         else:
             print(f"Failed to start game: {response.get('message', '') if response else ''}")
 
+    def spectate(self):
+        response = self.query_tracker_cached('query_games')
+        if not response or response.get('status') != 'SUCCESS':
+            print("Failed to query games.")
+            return
+        relay = response.get('relay')
+        if not relay:
+            print("This tracker has no spectator relay configured.")
+            return
+        self.display_games(response.get('games', []))
+        try:
+            game_id = int(input("Enter the game ID to watch: "))
+        except ValueError:
+            print("Invalid input.")
+            return
+        self.stop_spectating()
+        self.relay_addr = tuple(relay)
+        self.spectating = game_id
+        threading.Thread(target=self.renew_subscription, args=(game_id,), daemon=True).start()
+
+    def renew_subscription(self, game_id):
+        # The relay forgets subscriptions that are not renewed within its TTL.
+        while self.running and self.spectating == game_id:
+            msg = {'command': 'subscribe', 'game_id': game_id}
+            self.send_message(msg, self.relay_addr[0], self.relay_addr[1])
+            time.sleep(SUBSCRIPTION_RENEW_INTERVAL)
+
+    def stop_spectating(self):
+        if self.spectating is None:
+            return
+        msg = {'command': 'unsubscribe', 'game_id': self.spectating}
+        self.send_message(msg, self.relay_addr[0], self.relay_addr[1])
+        print(f"Stopped watching game {self.spectating}.")
+        self.spectating = None
+
+    def handle_spectate_ack(self, msg, addr):
+        if msg.get('game_id') == self.spectating:
+            self.trace(f"Subscription to game {self.spectating} renewed")
+
+    def handle_spectate_batch(self, msg, addr):
+        if msg.get('game_id') != self.spectating:
+            return
+        if msg.get('dropped'):
+            print(f"{Colors.YELLOW}Missed {msg['dropped']} events (relay queue overflowed).{Colors.RESET}")
+        for event in msg.get('events', []):
+            self.show_spectated_event(event)
+
+    def show_spectated_event(self, event):
+        from gamestate import HandState
+        command = event.get('command')
+        prefix = f"{Colors.CYAN}[Game {self.spectating}]{Colors.RESET}"
+        if command == 'send_all_hands':
+            print(f"{prefix} New hole dealt")
+            for username, values in event.get('hands', {}).items():
+                self.print_player_hand(username, HandState.from_wire(values, event['card_statuses'][username]))
+        elif command == 'update_hand':
+            print(prefix, end='')
+            self.print_player_hand(event.get('player'), HandState.from_wire(event['hand'], event['card_statuses']))
+        elif command == 'update_piles':
+            discard = event.get('discard_pile', [])
+            top = self.format_card(discard[-1]) if discard else 'Empty'
+            print(f"{prefix} Discard pile top: {top}")
+        elif command == 'end_hole':
+            print(f"{prefix} Hole over. Hole scores: {event.get('hole_scores')} Winner: {event.get('hole_winner')}")
+        elif command == 'end_game':
+            print(f"{prefix} Game over. Final scores: {event.get('scores')} Winner: {event.get('winner')}")
+            self.spectating = None
+
     def get_numeric_input(self, prompt, min_value, max_value):
         try:
             value = int(input(prompt))
@@ -276,25 +858,177 @@ class Player:
         return None
 
     def start_listening(self):
+        if self.host:
+            return  # the host's loop receives for every session
         if not hasattr(self, 'listener_thread') or not self.listener_thread.is_alive():
             self.listener_thread = threading.Thread(target=self.listen_for_player_messages, daemon=True)
             self.listener_thread.start()
 
     def listen_for_player_messages(self):
+        # Receive loop: decode, drop duplicates and hand off; never run handlers here.
+        # Datagrams land in one reused buffer and are decoded in place, since
+        # decoding finishes before the next receive.
+        buffer = bytearray(MAX_DATAGRAM)
+        view = memoryview(buffer)
         while self.running:
             try:
-                data, addr = self.p_sock.recvfrom(65535)
-                msg = json.loads(data.decode())
-                command = msg.get('command', '')
-                print(f"Received message: {command} from {addr}")
-                handler = getattr(self, f"handle_{command}", None)
-                if handler:
-                    handler(msg, addr)
-                else:
-                    print(f"Unknown command received: {command}")
-            except Exception as e:
+                nbytes, addr = self.p_sock.recvfrom_into(buffer)
+            except OSError as e:
                 self.trace(f"Error in listen_for_player_messages: {e}")
-                traceback.print_exc()
+                continue
+            self.recv_stats["received"] += 1
+            packet = view[:nbytes]
+            if is_chunk(packet):
+                packet = self.peer_chunks.add(packet, addr)
+                if packet is None:
+                    continue
+            elif is_nack(packet):
+                self.chunker.resend(self.p_sock, packet, addr)
+                continue
+            try:
+                msg = decode_json(packet)
+            except ValueError:
+                self.recv_stats["malformed"] += 1
+                continue
+            self.deliver(msg, addr)
+
+    def deliver(self, msg, addr):
+        """Take one decoded datagram from the game socket."""
+        if msg.get('command') == 'routed_batch' and addr == self.route_addr:
+            # Relayed messages: reply to the sender's seat, which send_message routes back.
+            for inner in msg.get('messages', []):
+                peer = next((p for p in self.players_info if p.username == inner.get('sender')), None)
+                self.receive_message(inner, (peer.ip, peer.p_port) if peer else addr)
+        else:
+            self.receive_message(msg, addr)
+
+    def receive_message(self, msg, addr):
+        command = msg.get('command', '')
+        # Only peer messages are numbered; tracker pushes must not build the game state.
+        missing = self.game_state.accept((msg.get('sender'), msg.get('epoch')), msg['seq']) if 'seq' in msg else 0
+        if missing is None:
+            self.recv_stats["duplicates"] += 1
+            self.trace(f"Dropped duplicate {command} from {addr}")
+            return
+        if missing:
+            print(f"{Colors.YELLOW}Lost {missing} message(s) from {msg.get('sender')} before {command}{Colors.RESET}")
+        self.enqueue_message(msg.get('game', msg.get('game_id')), msg, addr)
+
+    def enqueue_message(self, game_key, msg, addr):
+        """Queue a message for its game's worker, starting the worker if needed."""
+        with self.work_lock:
+            work = self.work_queues.get(game_key)
+            if work is None:
+                work = self.work_queues[game_key] = queue.Queue(maxsize=WORK_QUEUE_SIZE)
+                threading.Thread(target=self.process_messages, args=(game_key, work), daemon=True).start()
+            try:
+                work.put_nowait((msg, addr))
+            except queue.Full:
+                self.recv_stats["queue_full"] += 1
+                print(f"{Colors.RED}Dropped {msg.get('command', '')}: work queue for game {game_key} is full{Colors.RESET}")
+
+    def process_messages(self, game_key, work):
+        """Run handlers for one game, strictly in arrival order."""
+        while self.running:
+            try:
+                msg, addr = work.get(timeout=WORKER_IDLE_TIMEOUT)
+            except queue.Empty:
+                with self.work_lock:
+                    # Retire only if nothing arrived meanwhile; the receive loop
+                    # enqueues under the same lock.
+                    if work.empty():
+                        del self.work_queues[game_key]
+                        return
+                continue
+            self.dispatch_message(msg, addr)
+
+    def dispatch_message(self, msg, addr):
+        command = msg.get('command', '')
+        print(f"Received message: {command} from {addr}")
+        handler = getattr(self, f"handle_{command}", None)
+        try:
+            if handler and self.profiler:
+                self.profiler.start()
+                started = time.perf_counter()
+                handler(msg, addr)
+                self.profiler.record(f"handle_{command}", time.perf_counter() - started)
+            elif handler:
+                handler(msg, addr)
+            else:
+                print(f"Unknown command received: {command}")
+        except Exception as e:
+            self.trace(f"Error handling {command}: {e}")
+            import traceback  # only needed on this error path; costs ~5 ms at startup
+            traceback.print_exc()
+        self.recv_stats["handled"] += 1
+
+    def show_stats(self):
+        print(f"{Colors.BOLD}{Colors.BLUE}=== Receive Statistics ==={Colors.RESET}")
+        for name, value in self.recv_stats.items():
+            print(f"{name}: {value}")
+        for name, value in self.game_state.stats.items():
+            print(f"{name}: {value}")
+        for stats in (self.chunker.stats, self.peer_chunks.stats):
+            for name, value in stats.items():
+                print(f"{name}: {value}")
+        with self.work_lock:
+            print(f"queued: {sum(work.qsize() for work in self.work_queues.values())}")
+        if self.is_dealer or self.turn_durations:
+            print(f"deals: {deal_pool.stats}")
+        if self.turn_durations:
+            ordered = sorted(self.turn_durations)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+            print(f"turns_dealt: {len(ordered)}, turns_timed_out: {self.turns_timed_out}, "
+                  f"turn_ms p50/p90/p99/max: {pick(0.5):.1f}/{pick(0.9):.1f}/{pick(0.99):.1f}/{ordered[-1] * 1000:.1f}")
+        if self.dealer_takeovers:
+            print(f"dealer_takeovers: {len(self.dealer_takeovers)}, "
+                  f"takeover_ms: {', '.join(f'{t * 1000:.0f}' for t in self.dealer_takeovers)}")
+        if self.ai:
+            print(f"ai_turns: {self.ai.stats['turns']}, ai_rollouts: {self.ai.stats['rollouts']}, "
+                  f"ai_rollouts_per_s: {self.ai.rollouts_per_second():.0f}")
+        if self.profiler:
+            for name, timing in self.profiler.timing_summary().items():
+                print(f"{name}: {timing['calls']} calls, {timing['total_ms']:.1f} ms total, "
+                      f"{timing['max_ms']:.1f} ms max")
+
+    def handle_tracker_leader(self, msg, addr):
+        """A follower tracker took over; send requests and heartbeats there from now on."""
+        candidates = [t for t in self.trackers if t[1] == msg.get('port')]
+        leader = next((t for t in candidates if t[0] == addr[0]), candidates[0] if candidates else None)
+        if leader is None:
+            print(f"Ignoring tracker takeover from unknown tracker {addr[0]}:{msg.get('port')}")
+            return
+        if leader != (self.tracker_ip, self.tracker_port):
+            print(f"Tracker failed over to {leader[0]}:{leader[1]}")
+            self.switch_tracker(leader)
+            if self.lobby_subscribed:
+                self.post_heartbeat()  # subscribes us on the new leader
+
+    def handle_lobby_snapshot(self, msg, addr):
+        if addr[1] != self.tracker_port:
+            return
+        self.lobby = {'version': msg['version'], 'relay': msg.get('relay'),
+                      'players': {player['username']: player for player in msg['players']},
+                      'games': {str(game['id']): game for game in msg['games']}}
+        self.trace(f"Lobby snapshot {msg['version']}: {len(msg['players'])} players, {len(msg['games'])} games")
+
+    def handle_lobby_update(self, msg, addr):
+        if addr[1] != self.tracker_port:
+            return
+        lobby = self.lobby
+        if not lobby or msg.get('from') != lobby['version']:
+            # Missed an update: report our version now rather than at the next heartbeat.
+            self.trace(f"Lobby update {msg.get('from')} -> {msg.get('version')} does not apply; resyncing")
+            self.post_heartbeat()
+            return
+        for section in ('players', 'games'):
+            entries = lobby[section]
+            for key, value in msg.get(section, {}).items():
+                if value is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = value
+        lobby['version'] = msg['version']
 
     def handle_assigned_game(self, msg, addr):
         game_id = msg.get('game_id')
@@ -302,6 +1036,12 @@ class Player:
         players = msg.get('players', [])
         holes = msg.get('holes', 0)
         self.allow_steal = msg.get('allow_steal', False)  # Get allow_steal flag
+        relay = msg.get('relay')
+        self.relay_addr = tuple(relay) if relay else None
+        seed = msg.get('seed')
+        self.game_seed = seed if seed is not None else random.getrandbits(32)
+        self.turn_timeout = msg.get('turn_timeout')
+        route = msg.get('route')
 
         # Validation
         if game_id is None or dealer_info is None or not players or holes <= 0:
@@ -315,12 +1055,20 @@ class Player:
             self.players_info = [User(**player) for player in players]
             self.dealer_info = User(**dealer_info) if dealer_info else None
             self.is_dealer = (self.name == self.dealer_info.username)
+            self.route_addr = tuple(route) if route else None
+            self.peers = {p.username: p for p in self.players_info if p.username != self.name}
             # Initialize cumulative scores
             self.scores = {player.username: 0 for player in self.players_info}
             self.score = 0
-            self.players_done = set()
             self.game_over = False
+            self.completed_turn = None
+            self.dealer_backup = None
+            self.last_turn_over = None
+            self.dealer_contact = time.monotonic()
             self.in_game = True  # Important: Set in_game to True
+        self.game_state.apply('start', players=[player.username for player in self.players_info])
+        if self.route_addr:
+            self.attach_route()
 
         clear_screen()
         print(f"{Colors.BOLD}{Colors.GREEN}\n=== Assigned to Game {self.game_id} ==={Colors.RESET}")
@@ -335,45 +1083,57 @@ class Player:
         else:
             # If not the dealer, wait for the dealer to send hands
             print("Waiting for the dealer to distribute hands...")
+            threading.Thread(target=self.watch_dealer, daemon=True).start()
 
     def play_game(self):
         if self.is_dealer:
             threading.Thread(target=self.manage_turns, daemon=True).start()
+            threading.Thread(target=self.send_dealer_snapshots, daemon=True).start()
         else:
             pass  # Non-dealer players wait for their turns
 
-    def initialize_hand(self):
-        if len(self.hand) != 6:
-            print(f"{Colors.RED}Error: Hand does not contain 6 cards. Found {len(self.hand)} cards.{Colors.RESET}")
-            return
-        self.hand_grid = [self.hand[:3], self.hand[3:]]
-        # Initialize other players' hands and card statuses are set in handle_send_all_hands
-        self.print_hand()
-
-    def print_hand(self):
-        clear_screen()
-        print(f"{Colors.BOLD}{Colors.GREEN}\n=== All Players' Hands ==={Colors.RESET}")
-        self.print_player_hand(self.name, self.hand_grid, self.card_statuses)
-        for username, player_hand in self.other_players_hands.items():
-            print()
-            self.print_player_hand(username, [player_hand['hand'][:3], player_hand['hand'][3:]], player_hand['card_statuses'])
-        print(f"\n{Colors.YELLOW}Discard Pile Top Card:{Colors.RESET} {self.format_card(self.discard_pile[-1].value) if self.discard_pile else 'Empty'}")
+    def print_hand(self, full=False):
+        """Show every hand in the pinned frame at the top of the terminal.
+
+        Updates only repaint the cells that changed and are throttled by the
+        renderer; ``full`` forces an immediate complete repaint, used before
+        prompting for a turn.
+        """
+        # Drawn from one immutable snapshot, so no lock and no torn reads.
+        state = self.game_state.snapshot
+        rows = ["", f"{Colors.BOLD}{Colors.GREEN}=== All Players' Hands ==={Colors.RESET}"]
+        if self.name in state.hands:
+            rows += self.player_hand_rows(self.name, state.hands[self.name])
+        for username in state.players:
+            if username != self.name and username in state.hands:
+                rows.append("")
+                rows += self.player_hand_rows(username, state.hands[username])
+        rows.append("")
+        rows.append(f"{Colors.YELLOW}Discard Pile Top Card:{Colors.RESET} {self.format_card(CARD_VALUES[state.discard[-1]]) if state.discard else 'Empty'}")
         # Add Current Player Score display
-        current_score = self.scores.get(self.name, 0)
-        print(f"{Colors.BOLD}{Colors.YELLOW}Current Player Score: {current_score}{Colors.RESET}")
-        print("=" * 30)
-
-    def print_player_hand(self, username, hand_grid, card_statuses):
-        print(f"{Colors.BOLD}{Colors.GREEN}\n=== {username}'s Hand ==={Colors.RESET}")
+        current_score = state.scores.get(self.name, 0)
+        rows.append(f"{Colors.BOLD}{Colors.YELLOW}Current Player Score: {current_score}{Colors.RESET}")
+        rows.append("=" * 30)
+        from render import screen
+        if full:
+            screen.invalidate()
+        screen.render(rows, force=full)
+
+    def player_hand_rows(self, username, hand):
+        rows = ["", f"{Colors.BOLD}{Colors.GREEN}=== {username}'s Hand ==={Colors.RESET}"]
         for row in range(2):
-            row_display = ""
-            for col in range(3):
-                card = hand_grid[row][col]
-                if card_statuses[row][col]:
-                    row_display += self.format_card(card.value) + " "
+            cells = []
+            for pos in range(row * 3, row * 3 + 3):
+                if hand.is_face_up(pos):
+                    cells.append(self.format_card(hand.value_at(pos)) + " ")
                 else:
-                    row_display += self.format_card("??") + " "
-            print(row_display)
+                    cells.append(self.format_card("??") + " ")
+            rows.append(cells)
+        return rows
+
+    def print_player_hand(self, username, hand):
+        for row in self.player_hand_rows(username, hand):
+            print(''.join(row))
 
     def format_card(self, card_value):
         suit_symbols = {'S': '♠', 'H': '♥', 'D': '♦', 'C': '♣'}
@@ -390,12 +1150,11 @@ class Player:
         clear_screen()
         print(f"{Colors.BOLD}{Colors.GREEN}\n=== All Players' Full Hands ==={Colors.RESET}")
         # Reveal own hand
-        self.print_full_player_hand(self.name, self.hand_grid)
+        self.print_full_player_hand(self.name, self.my_hand)
         # Reveal other players' hands
         for username, player_hand in self.other_players_hands.items():
             print()
-            hand_grid = [player_hand['hand'][:3], player_hand['hand'][3:]]
-            self.print_full_player_hand(username, hand_grid)
+            self.print_full_player_hand(username, player_hand)
         # Display cumulative scores
         if self.scores:
             print(f"\n{Colors.BOLD}{Colors.YELLOW}Final Cumulative Scores:{Colors.RESET}")
@@ -403,42 +1162,39 @@ class Player:
                 print(f"{player}: {score}")
         print("=" * 30)
 
-    def print_full_player_hand(self, username, hand_grid):
+    def print_full_player_hand(self, username, hand):
         print(f"{Colors.BOLD}{Colors.GREEN}\n=== {username}'s Full Hand ==={Colors.RESET}")
+        values = hand.values()
         for row in range(2):
-            row_display = ""
-            for col in range(3):
-                card = hand_grid[row][col]
-                row_display += self.format_card(card.value) + " "
-            print(row_display)
+            print("".join(self.format_card(value) + " " for value in values[row * 3:row * 3 + 3]))
 
     def handle_send_all_hands(self, msg, addr):
+        from gamestate import HandState
         received_hands = msg.get('hands', {})
         received_statuses = msg.get('card_statuses', {})
         dealer_info = msg.get('dealer_info')
+        self.game_seed = msg.get('seed', self.game_seed)
+        self.current_hole = msg.get('hole', self.current_hole)
         if isinstance(received_hands, dict) and len(received_hands) == len(self.players_info):
             # Initialize hands and card statuses for all players
-            self.hand = [Card(val) for val in received_hands[self.name]]
-            self.card_statuses = received_statuses[self.name]
-            self.hand_grid = [self.hand[:3], self.hand[3:]]
+            self.my_hand = HandState.from_wire(received_hands[self.name], received_statuses[self.name])
             # Store other players' hands and card statuses
             for username, hand_values in received_hands.items():
                 if username != self.name:
-                    self.other_players_hands[username] = {
-                        'hand': [Card(val) for val in hand_values],
-                        'card_statuses': received_statuses[username]
-                    }
+                    self.other_players_hands[username] = HandState.from_wire(hand_values, received_statuses[username])
+            self.game_state.apply('deal', hole=self.current_hole, hands=dict(self.other_players_hands, **{self.name: self.my_hand}),
+                                  stock=(), discard=())
             self.print_hand()
-            self.trace(f"Hand initialized: {self.hand_grid}")
+            self.trace(f"Hand initialized: {self.my_hand}")
             # Send acknowledgment
             ack_msg = {"status": "SUCCESS", "message": "Hands received and initialized"}
-            self.send_message(ack_msg, addr[0], addr[1])
+            self.send_message(ack_msg, addr[0], addr[1], session=msg.get('sender'))
         else:
             self.trace("Invalid hands data received.")
             print(f"{Colors.RED}Error: Received invalid hands data.{Colors.RESET}")
             # Send failure acknowledgment
             ack_msg = {"status": "FAILURE", "message": "Invalid hands data"}
-            self.send_message(ack_msg, addr[0], addr[1])
+            self.send_message(ack_msg, addr[0], addr[1], session=msg.get('sender'))
         if dealer_info:
             self.dealer_info = User(**dealer_info)
             print(f"Dealer is {self.dealer_info.username}")
@@ -447,32 +1203,51 @@ class Player:
 
     def handle_your_turn(self, msg, addr):
         with self.lock:
-            self.stock_pile = [Card(val) for val in msg.get('stock_pile', [])]
-            self.discard_pile = [Card(val) for val in msg.get('discard_pile', [])]
+            turn = msg.get('turn', 0)
+            if (self.current_hole, turn) == self.completed_turn or (self.is_my_turn and turn == self.turn_number):
+                # Re-sent by a dealer that took over mid-turn; our turn_over reaches it anyway
+                self.trace(f"Ignored your_turn for turn {turn}: already played or in progress")
+                return
+            self.stock_pile = [CARD_IDS[value] for value in msg.get('stock_pile', [])]
+            self.discard_pile = [CARD_IDS[value] for value in msg.get('discard_pile', [])]
             self.current_player_index = msg.get('current_player_index', 0)
+            self.turn_number = msg.get('turn', 0)
+            self.expired_turn = None
             self.is_my_turn = True
             self.turn_data = msg  # Store any additional data if needed
+            self.turn_ready()
+        self.apply_piles()
+        self.game_state.apply('turn', current_player=self.current_player_index, turn=self.turn_number)
         self.trace(f"Updated stock_pile and discard_pile for turn.")
 
     def handle_update_piles(self, msg, addr):
         with self.lock:
-            self.stock_pile = [Card(val) for val in msg.get('stock_pile', [])]
-            self.discard_pile = [Card(val) for val in msg.get('discard_pile', [])]
+            if 'stock_pile' in msg:
+                self.stock_pile = [CARD_IDS[value] for value in msg['stock_pile']]
+                self.discard_pile = [CARD_IDS[value] for value in msg.get('discard_pile', [])]
+            else:
+                # A summary (see update_piles): cut our copies to the new sizes under the new top card
+                del self.stock_pile[msg.get('stock_count', 0):]
+                top = msg.get('discard_top')
+                self.discard_pile = (self.discard_pile[:max(msg.get('discard_count', 0) - 1, 0)] +
+                                     ([CARD_IDS[top]] if top else []))
+        self.apply_piles()
+        self.publish_event(msg)
         self.print_hand()
 
     def handle_update_hand(self, msg, addr):
+        from gamestate import HandState
         player = msg.get('player')
         hand_values = msg.get('hand')
         card_statuses = msg.get('card_statuses')
         if player and hand_values and card_statuses:
-            hand = [Card(val) for val in hand_values]
-            hand_grid = [hand[:3], hand[3:]]
+            hand = HandState.from_wire(hand_values, card_statuses)
             if player != self.name:
-                self.other_players_hands[player]['hand'] = hand
-                self.other_players_hands[player]['card_statuses'] = card_statuses
+                self.other_players_hands[player] = hand
             else:
-                self.hand_grid = hand_grid
-                self.card_statuses = card_statuses
+                self.my_hand = hand
+            self.game_state.apply('hand', player=player, hand=hand)
+            self.publish_event(msg)
             self.print_hand()
 
     def handle_end_game(self, msg, addr):
@@ -480,7 +1255,7 @@ class Player:
         self.in_game = False
         print("\nGame ended!")
 
-        if self.hand_grid:
+        if self.my_hand:
             self.print_full_hand()  # Reveal all cards
         else:
             print(f"{Colors.RED}Cannot reveal hand because it is empty.{Colors.RESET}")
@@ -490,8 +1265,10 @@ class Player:
             self.scores = msg['scores']
             winner = msg.get('winner', '')
             self.display_final_scores(winner)
-            if self.hand_grid:
+            if self.my_hand:
                 self.print_full_hand()  # Ensure all cards are revealed at game end
+        elif 'reason' in msg:
+            print(f"{Colors.YELLOW}Game aborted by tracker: {msg['reason']}{Colors.RESET}")
         else:
             print("Failed to receive final scores.")
 
@@ -503,15 +1280,14 @@ class Player:
         self.scores = {}
         self.hole_scores = {}
         self.hole_winner = None
-        self.hand = []
-        self.hand_grid = []
-        self.card_statuses = []
+        self.my_hand = None
         self.stock_pile = []
         self.discard_pile = []
         self.is_my_turn = False
         self.turn_data = {}
-        self.players_done = set()
-        self.hole_over = False
+        self.game_state.apply('reset')
+        self.route_addr = None
+        self.peers = {}
         self.current_hole = 0
         self.dealer_info = None
         self.is_dealer = False
@@ -524,18 +1300,223 @@ class Player:
             players = msg.get('players', [])
             if players:
                 self.players_info = [User(**player) for player in players]
+        self.game_state.apply('turn', current_player=self.current_player_index, turn=self.game_state.snapshot.turn)
         self.trace(f"Updated current_player_index to {self.current_player_index}")
 
     def handle_turn_over(self, msg, addr):
         if self.is_dealer:
-            self.turn_event.set()
+            player = msg.get('player')
+            with self.lock:
+                current = self.players_info[self.current_player_index].username if self.players_info else None
+                turn = (self.current_hole, msg.get('turn', self.turn_number))
+            if player != current or not self.finish_turn(turn, player, msg.get('action')):
+                self.trace(f"Ignored turn_over from {player}: not the open turn (timed out?)")
+                return
             self.trace("Turn event set by 'turn_over'.")
         else:
-            self.trace(f"Received turn_over from {addr}, but not the dealer.")
+            # The copy every seat sends the dealer's successor
+            with self.lock:
+                self.last_turn_over = msg
+
+    def finish_turn(self, turn, player_name, action, timed_out=False):
+        """Dealer only: close the open turn exactly once, whether it was played or timed out."""
+        with self.lock:
+            if self.open_turn != turn:
+                return False
+            self.open_turn = None
+            self.closed_turn = turn
+            self.turn_timed_out = timed_out
+            # Logged under the same lock as closed_turn, so a dealer snapshot has both or neither
+            self.record_action(player_name, action)
+        self.turn_event.set()
+        return True
+
+    def expire_turn(self, turn, player):
+        """Timer callback on the dealer: skip a seat that has not finished its turn in time."""
+        if not self.finish_turn(turn, player.username, {'type': 'timeout'}, timed_out=True):
+            return
+        print(f"{Colors.YELLOW}{player.username} ran out of time; turn skipped.{Colors.RESET}")
+        msg = {'command': 'turn_expired', 'hole': turn[0], 'turn': turn[1]}
+        if player.username == self.name:
+            self.handle_turn_expired(msg, None)
+        else:
+            self.send_message(msg, player.ip, player.p_port, session=player.username)
+
+    def handle_turn_expired(self, msg, addr):
+        with self.lock:
+            if msg.get('turn') != self.turn_number:
+                return
+            self.expired_turn = self.turn_number
+            self.is_my_turn = False
+        print(f"{Colors.YELLOW}Time is up: the dealer skipped your turn.{Colors.RESET}")
+
+    def turn_lapsed(self):
+        """True once the dealer has skipped the turn we are still playing; its moves must not be sent."""
+        if self.expired_turn is None or self.expired_turn != self.turn_number:
+            return False
+        print(f"{Colors.YELLOW}Too late: that turn was skipped.{Colors.RESET}")
+        return True
+
+    def successor(self):
+        """The seat after the dealer, which takes over if the dealer fails. Caller holds self.lock."""
+        names = [player.username for player in self.players_info]
+        if len(names) < 2 or not self.dealer_info or self.dealer_info.username not in names:
+            return None
+        return self.players_info[(names.index(self.dealer_info.username) + 1) % len(names)]
+
+    def dealer_snapshot(self):
+        """Dealer: what a successor needs to carry the game on. Caller holds self.lock."""
+        return {
+            'command': 'dealer_snapshot',
+            'game_id': self.game_id,
+            'hole': self.current_hole,
+            'turn': self.turn_number,
+            'current': self.players_info[self.current_player_index].username,
+            'closed': self.closed_turn == (self.current_hole, self.turn_number),
+            'done': sorted(self.game_state.snapshot.done),
+            'scored': self.hole_scored,
+            'scores': dict(self.scores),
+            'hole_scores': dict(self.hole_scores),
+            'seats': self.game_log.players,
+            'log': self.game_log.events.hex()
+        }
+
+    def replicate_game(self):
+        """Dealer: send the game snapshot to our successor now."""
+        with self.lock:
+            successor = self.successor()
+            if not self.is_dealer or not self.game_log or successor is None:
+                return
+            msg = self.dealer_snapshot()
+        self.send_message(msg, successor.ip, successor.p_port, session=successor.username)
+
+    def send_dealer_snapshots(self):
+        # The snapshots double as the dealer's heartbeat to its successor.
+        game_id = self.game_id
+        while self.running and self.in_game and self.is_dealer and self.game_id == game_id:
+            self.replicate_game()
+            time.sleep(DEALER_SNAPSHOT_INTERVAL)
+
+    def handle_dealer_snapshot(self, msg, addr):
+        with self.lock:
+            if msg.get('game_id') != self.game_id or self.is_dealer:
+                return
+            self.dealer_backup = msg
+            self.dealer_contact = time.monotonic()
+
+    def watch_dealer(self):
+        """Every non-dealer seat: take over dealing once we are the successor and the dealer fell silent."""
+        game_id = self.game_id
+        while self.running and self.in_game and self.game_id == game_id and not self.is_dealer:
+            time.sleep(DEALER_SNAPSHOT_INTERVAL)
+            with self.lock:
+                successor = self.successor()
+                silent = time.monotonic() - self.dealer_contact
+                if (self.dealer_backup is None or silent < DEALER_FAILOVER_TIMEOUT or
+                        successor is None or successor.username != self.name):
+                    continue
+            self.take_over_dealing(silent)
+            return
+
+    def take_over_dealing(self, silent):
+        """Successor: become the dealer from the last snapshot and resume the game where it stopped.
+
+        The failed dealer leaves the game. Its open turn is finished from
+        the turn_over copy we hold when the seat played it, skipped when it
+        was the dealer's own, and otherwise handed out again.
+        """
+        from gamelog import GameLog
+        started = time.monotonic()
+        with self.lock:
+            backup, self.dealer_backup = self.dealer_backup, None
+            previous = self.dealer_info
+            order = [player.username for player in self.players_info]
+            self.players_info = [player for player in self.players_info if player.username != previous.username]
+            self.peers = {p.username: p for p in self.players_info if p.username != self.name}
+            self.dealer_info = next(player for player in self.players_info if player.username == self.name)
+            self.is_dealer = True
+            self.current_hole = backup['hole']
+            self.turn_number = backup['turn']
+            self.scores = {name: score for name, score in backup['scores'].items() if name != previous.username}
+            self.hole_scores = {name: score for name, score in backup['hole_scores'].items()
+                                if name != previous.username}
+            self.hole_scored = backup['scored']
+            self.game_log = GameLog(self.game_seed, backup['seats'], self.holes)
+            self.game_log.events = bytearray.fromhex(backup['log'])
+            self.other_players_hands.pop(previous.username, None)
+            self.closed_turn = self.open_turn = None
+            self.turn_event.clear()
+            current = backup['current']
+            played = self.last_turn_over
+            if not (played and played.get('player') == current and played.get('turn') == backup['turn']):
+                played = None
+            if not backup['closed'] and (played or current == previous.username):
+                self.record_action(current, played['action'] if played else {'type': 'timeout'})
+                self.closed_turn = (self.current_hole, self.turn_number)
+        self.game_state.apply('leave', player=previous.username)
+        state = self.game_state.snapshot
+        for name in set(backup['done']) | {name for name, hand in state.hands.items() if hand.all_face_up()}:
+            self.game_state.apply('player_done', player=name)
+        with self.lock:
+            closed = self.closed_turn == (self.current_hole, self.turn_number) and not self.hole_over
+            if closed or current == previous.username:
+                # Hand the turn on to the next seat still in the game
+                if closed:
+                    self.turn_number += 1
+                current = next(name for name in order[order.index(current) + 1:] + order
+                               if name != previous.username)
+            self.current_player_index = next(i for i, p in enumerate(self.players_info) if p.username == current)
+        self.game_state.apply('turn', current_player=self.current_player_index, turn=self.turn_number)
+        print(f"{Colors.YELLOW}Dealer {previous.username} stopped responding; "
+              f"taking over hole {self.current_hole}, turn {self.turn_number}.{Colors.RESET}")
+        msg = {
+            'command': 'dealer_changed',
+            'game_id': self.game_id,
+            'dealer': self.dealer_info.to_dict(),
+            'previous': previous.username,
+            'players': [player.to_dict() for player in self.players_info]
+        }
+        with self.lock:
+            self.broadcast(msg)
+        # In case it is alive after all, it must stop dealing
+        self.send_message(msg, previous.ip, previous.p_port, session=previous.username)
+        response = self.send_to_tracker({'command': 'migrate_dealer', 'game-identifier': self.game_id,
+                                         'player': self.name, 'previous': previous.username})
+        if not response or response.get('status') != 'SUCCESS':
+            print(f"{Colors.RED}Tracker did not record the new dealer: "
+                  f"{response.get('message') if response else 'no response'}{Colors.RESET}")
+        self.dealer_takeovers.append(silent + time.monotonic() - started)
+        threading.Thread(target=self.send_dealer_snapshots, daemon=True).start()
+        self.manage_turns(resume=True)
+
+    def handle_dealer_changed(self, msg, addr):
+        if msg.get('game_id') != self.game_id:
+            return
+        previous = msg.get('previous')
+        with self.lock:
+            was_dealer = self.is_dealer
+            self.dealer_info = User(**msg['dealer'])
+            self.players_info = [User(**player) for player in msg.get('players', [])]
+            self.peers = {p.username: p for p in self.players_info if p.username != self.name}
+            self.is_dealer = self.name == self.dealer_info.username
+            self.other_players_hands.pop(previous, None)
+            self.scores.pop(previous, None)
+            self.dealer_backup = None
+            self.dealer_contact = time.monotonic()
+        self.game_state.apply('leave', player=previous)
+        if was_dealer and not self.is_dealer:
+            # Our successor gave up on us: stop dealing and leave the game
+            print(f"{Colors.RED}{self.dealer_info.username} took over dealing; leaving the game.{Colors.RESET}")
+            with self.lock:
+                self.in_game = False
+                self.is_my_turn = False
+            self.turn_event.set()
+        else:
+            print(f"{Colors.YELLOW}{self.dealer_info.username} took over dealing from {previous}.{Colors.RESET}")
 
     def handle_send_score(self, msg, addr):
         self.calculate_score()  # Calculate the current score before sending
-        self.send_score(addr)
+        self.send_score(addr, msg.get('sender'))
 
     def handle_score_response(self, msg, addr):
         player_name = msg.get('player')
@@ -548,11 +1529,9 @@ class Player:
                 print(f"{Colors.GREEN}Received score from {player_name}: {player_score}{Colors.RESET}")
 
     def handle_player_done(self, msg, addr):
-        player_name = msg.get('player')
-        with self.lock:
-            self.players_done.add(player_name)
-            if self.is_dealer and self.check_hole_end():
-                self.hole_over = True
+        if self.is_dealer:
+            # The state machine ends the hole once anyone is done.
+            self.game_state.apply('player_done', player=msg.get('player'))
 
     def handle_end_hole(self, msg, addr):
         # Handle end of hole message from the dealer
@@ -560,11 +1539,11 @@ class Player:
         self.hole_scores = msg.get('hole_scores', {})
         self.hole_winner = msg.get('hole_winner', None)
         self.display_current_scores()
-        if self.hand_grid:
+        if self.my_hand:
             self.print_full_hand()  # Reveal all cards
         else:
             print(f"{Colors.RED}Cannot reveal hand because it is empty.{Colors.RESET}")
-        self.hole_over = True
+        self.game_state.apply('hole_end', scores=self.scores, hole_scores=self.hole_scores, winner=self.hole_winner)
 
     def handle_steal_request(self, msg, addr):
         from_player_name = msg.get('from_player')
@@ -577,118 +1556,162 @@ class Player:
             return
 
         i, j = steal_position
-        if not self.card_statuses[i][j]:
+        if not self.my_hand.is_face_up(i * 3 + j):
             print(f"Cannot steal card at position ({i}, {j}) because it is not face-up.")
             return
 
-        # Swap the cards
-        stolen_card = self.hand_grid[i][j]
-        self.hand_grid[i][j] = Card(exchange_card_value)
-        # The exchanged card is now face-down in the target player's hand
-        self.card_statuses[i][j] = False
+        # Swap the cards; the exchanged card is now face-down in our hand
+        self.my_hand.place(i * 3 + j, CARD_IDS[exchange_card_value], face_up=False)
 
-        # Update own hand
-        self.print_hand()
-
-        # Send hand update to other players
+        # Send hand update to other players, then show the new hand
         self.send_hand_update()
+        self.print_hand()
 
-    def manage_turns(self):
-        # Initialize cumulative scores
-        with self.lock:
-            self.scores = {player.username: 0 for player in self.players_info}
-        for hole in range(1, self.holes + 1):
-            with self.lock:
-                self.current_hole = hole
-                self.hole_scores = {}      # Reset hole scores
-                self.hole_winner = None    # Reset hole winner
-            print(f"\n{Colors.BOLD}{Colors.GREEN}=== Starting Hole {hole}/{self.holes} ==={Colors.RESET}")
-            self.setup_hole()
+    def manage_turns(self, resume=False):
+        """Dealer: deal every hole and run its turns, then declare the winner.
+
+        With ``resume`` a seat that took over from a failed dealer carries on
+        from the restored hole and turn (see take_over_dealing) instead of
+        starting the game.
+        """
+        from gamelog import GameLog
+        if self.profiler:
+            self.profiler.start()
+        if resume:
+            first_hole = self.current_hole + 1 if self.hole_scored else self.current_hole
+        else:
+            first_hole = 1
+            # Initialize cumulative scores
             with self.lock:
-                self.players_done = set()
-                self.hole_over = False
-            while not self.hole_over and self.running:
+                self.scores = {player.username: 0 for player in self.players_info}
+                self.game_log = GameLog(self.game_seed, [p.username for p in self.players_info], self.holes)
+                self.closed_turn = None
+        dealt = not (resume and not self.hole_scored)  # the resumed hole is already dealt
+        for hole in range(first_hole, self.holes + 1):
+            hole_started = time.perf_counter()
+            if dealt:
+                with self.lock:
+                    self.current_hole = hole
+                    self.hole_scores = {}      # Reset hole scores
+                    self.hole_winner = None    # Reset hole winner
+                    self.hole_scored = False
+                print(f"\n{Colors.BOLD}{Colors.GREEN}=== Starting Hole {hole}/{self.holes} ==={Colors.RESET}")
+                self.setup_hole()
+                if self.profiler:
+                    self.profiler.record('manage_turns.setup_hole', time.perf_counter() - hole_started)
+            else:
+                print(f"\n{Colors.BOLD}{Colors.GREEN}=== Resuming Hole {hole}/{self.holes} ==={Colors.RESET}")
+            dealt = True
+            while not self.hole_over and self.running and self.is_dealer:
                 with self.lock:
                     current_player = self.players_info[self.current_player_index]
                 print(f"\nIt's {Colors.CYAN}{current_player.username}{Colors.RESET}'s turn.")
-                if current_player.username == self.name:
-                    with self.lock:
+                turn_started = time.perf_counter()
+                turn = (self.current_hole, self.turn_number)
+                with self.lock:
+                    if self.closed_turn != turn:  # not already played before a takeover caught up
+                        self.open_turn = turn
+                        self.turn_timed_out = False
+                    if current_player.username == self.name and self.completed_turn != turn:
+                        self.expired_turn = None
                         self.is_my_turn = True
-                else:
+                        self.turn_ready()
+                if current_player.username != self.name:
                     msg = {
                         'command': 'your_turn',
-                        'stock_pile': [card.value for card in self.stock_pile],
-                        'discard_pile': [card.value for card in self.discard_pile],
-                        'current_player_index': self.current_player_index
+                        'stock_pile': [CARD_VALUES[card] for card in self.stock_pile],
+                        'discard_pile': [CARD_VALUES[card] for card in self.discard_pile],
+                        'current_player_index': self.current_player_index,
+                        'turn': self.turn_number
                     }
-                    self.send_message(msg, current_player.ip, current_player.p_port)
+                    self.send_message(msg, current_player.ip, current_player.p_port, session=current_player.username)
+                self.replicate_game()
 
+                if self.turn_timeout:
+                    dealer_timers().schedule((self, turn), self.turn_timeout,
+                                         lambda turn=turn, player=current_player: self.expire_turn(turn, player))
                 self.turn_event.wait()
                 self.turn_event.clear()
-                if self.check_hole_end():
-                    with self.lock:
-                        self.hole_over = True
-                    break
+                if self.turn_timeout:
+                    dealer_timers().cancel((self, turn))
+                if self.turn_timed_out:
+                    self.turns_timed_out += 1
+                self.turn_durations.append(time.perf_counter() - turn_started)
+                if self.profiler:
+                    self.profiler.record('manage_turns.turn', self.turn_durations[-1])
+                if not self.is_dealer:
+                    return  # another seat took over dealing (see handle_dealer_changed)
+                hole_ended = self.check_hole_end()
                 with self.lock:
-                    self.current_player_index = (self.current_player_index + 1) % len(self.players_info)
+                    # Together, so a dealer snapshot never pairs the next turn with the last player
+                    self.turn_number += 1
+                    if not hole_ended:
+                        self.current_player_index = (self.current_player_index + 1) % len(self.players_info)
+                if hole_ended:
+                    break
+                self.game_state.apply('turn', current_player=self.current_player_index, turn=self.turn_number)
                 self.update_player_state()
-            # End of hole
+            if not self.is_dealer:
+                return
+            # End of hole (the duration includes collecting scores and HOLE_PAUSE)
+            hole_ending = time.perf_counter()
             self.end_hole()
+            if self.profiler:
+                self.profiler.record('manage_turns.end_hole', time.perf_counter() - hole_ending)
+            self.hole_durations.append(time.perf_counter() - hole_started)
             if not self.running:
                 break
         # After all holes, declare the winner
         self.declare_winner()
 
     def setup_hole(self):
-        # Dealer sets up the game for the hole
-        deck = Deck()
-        deck.shuffle()
-        self.stock_pile = deck.cards.copy()
-        hands = {}
-        card_statuses = {}
-        for player in self.players_info:
-            hand = [self.stock_pile.pop() for _ in range(6)]
-            hands[player.username] = hand
-            # Generate initial card statuses for this player's hand
-            statuses = [[False]*3 for _ in range(2)]
-            indices = [(i, j) for i in range(2) for j in range(3)]
-            random_indices = random.sample(indices, 2)
-            for i, j in random_indices:
-                statuses[i][j] = True
-            card_statuses[player.username] = statuses
+        # Dealer sets up the game for the hole. Everything random comes from the
+        # hole's own seeded stream so the deal can be reproduced from the log.
+        # Every seat the game started with is dealt, including a dealer that
+        # has since dropped out, so the deal stays the one the log replays.
+        seats = self.game_log.players if self.game_log else [player.username for player in self.players_info]
+        if PIPELINED_DEALS:
+            deal = deal_pool.take(self.game_seed, self.current_hole, seats)
+            if self.current_hole < self.holes:
+                # Shuffled and dealt on the pool's worker while this hole is played
+                deal_pool.prefetch(self.game_seed, self.current_hole + 1, seats)
+        else:
+            deal = prepare_deal(self.game_seed, self.current_hole, seats)
+        self.stock_pile = deal.stock
+        self.turn_number = 0
+        if self.game_log:
+            self.game_log.deal(self.current_hole)
+        seated = {player.username for player in self.players_info}
+        hands = {username: hand for username, hand in deal.hands.items() if username in seated}
         # Send all hands, card statuses, and dealer info to all players
+        msg = {
+            'command': 'send_all_hands',
+            'hands': {username: hand.values() for username, hand in hands.items()},
+            'card_statuses': {username: hand.statuses() for username, hand in hands.items()},
+            'dealer_info': self.dealer_info.to_dict(),
+            'seed': self.game_seed,
+            'hole': self.current_hole
+        }
         for player in self.players_info:
-            msg = {
-                'command': 'send_all_hands',
-                'hands': {username: [card.value for card in hand] for username, hand in hands.items()},
-                'card_statuses': card_statuses,
-                'dealer_info': self.dealer_info.to_dict()
-            }
-            self.send_message(msg, player.ip, player.p_port)
-        # Initialize dealer's own hand and card statuses
-        self.hand = hands[self.name]
-        self.card_statuses = card_statuses[self.name]
-        self.hand_grid = [self.hand[:3], self.hand[3:]]
-        # Initialize other players' hands and card statuses
-        for username in hands.keys():
-            if username != self.name:
-                self.other_players_hands[username] = {
-                    'hand': hands[username],
-                    'card_statuses': card_statuses[username]
-                }
-        self.print_hand()
+            self.send_message(msg, player.ip, player.p_port, session=player.username)
+        self.publish_event(msg)
         if not self.stock_pile:
             self.trace("Stock pile is empty after dealing.")
-        top_card = self.stock_pile.pop()
-        self.discard_pile = [top_card]
+        self.discard_pile = [deal.top_card]
         self.current_player_index = 0
+        # A new hole: the state machine resets turns, done players and phase
+        self.game_state.apply('deal', hole=self.current_hole, hands=hands,
+                              stock=self.stock_pile, discard=self.discard_pile)
+        # Initialize dealer's own hand and the other players' hands
+        self.my_hand = hands.pop(self.name)
+        self.other_players_hands.update(hands)
+        self.print_hand()
         self.update_piles()
-        self.update_player_state()
+        self.update_player_state(roster=True)
 
     def check_hole_end(self):
-        with self.lock:
-            # Hole ends when any player is done (can be modified as per game rules)
-            return len(self.players_done) >= 1
+        # Hole ends when any player is done (can be modified as per game rules)
+        return len(self.game_state.snapshot.done) >= 1
 
     def wait_for_scores(self, timeout=30):
         """Wait for all players to send their scores with a timeout."""
@@ -709,10 +1732,7 @@ class Player:
             with self.lock:
                 self.hole_scores[self.name] = self.score  # Store dealer's own hole score
                 self.scores_received = set([self.name])  # Include dealer's own name
-            for player in self.players_info:
-                if player.username != self.name:
-                    msg = {'command': 'send_score'}
-                    self.send_message(msg, player.ip, player.p_port)
+            self.broadcast({'command': 'send_score'})
             # Wait for all scores to be collected with timeout
             self.wait_for_scores(timeout=30)  # Wait for 30 seconds
             with self.lock:
@@ -723,8 +1743,13 @@ class Player:
                 # Update cumulative scores
                 for player_name, hole_score in self.hole_scores.items():
                     self.scores[player_name] += hole_score
+                self.hole_scored = True
                 # Determine hole winner
                 self.hole_winner = min(self.hole_scores, key=self.hole_scores.get)
+                if self.game_log:
+                    for player_name, hole_score in self.hole_scores.items():
+                        self.game_log.score(player_name, hole_score)
+            self.game_state.apply('hole_end', scores=self.scores, hole_scores=self.hole_scores, winner=self.hole_winner)
             # Send end_hole message with current scores and hole scores
             end_hole_msg = {
                 'command': 'end_hole',
@@ -732,68 +1757,60 @@ class Player:
                 'hole_scores': self.hole_scores,
                 'hole_winner': self.hole_winner
             }
-            for player in self.players_info:
-                if player.username != self.name:
-                    self.send_message(end_hole_msg, player.ip, player.p_port)
+            self.broadcast(end_hole_msg)
+            self.publish_event(end_hole_msg)
+            self.replicate_game()
             # Display current scores with Current Player Score label
             self.display_current_scores()
             # Reveal all cards for the dealer
-            if self.hand_grid:
+            if self.my_hand:
                 self.print_full_hand()  # Dealer reveals their own cards
             # Display results for 10 seconds before proceeding
-            print(f"\nNext hole will start in 10 seconds...")
-            time.sleep(10)
-            with self.lock:
-                self.hole_over = True
+            print(f"\nNext hole will start in {HOLE_PAUSE} seconds...")
+            time.sleep(HOLE_PAUSE)
         else:
-            self.send_score((self.dealer_info.ip, self.dealer_info.p_port))
+            self.send_score((self.dealer_info.ip, self.dealer_info.p_port), self.dealer_info.username)
             # Wait for hole_over signal with timeout
             start_time = time.time()
             timeout = 30  # 30 seconds timeout
             while True:
-                with self.lock:
-                    if self.hole_over:
-                        break
+                if self.hole_over:
+                    break
                 if time.time() - start_time > timeout:
                     print(f"{Colors.RED}Timeout reached while waiting for end of hole.{Colors.RESET}")
                     break
                 time.sleep(0.5)
             # Display results for 10 seconds before proceeding
-            print(f"\nNext hole will start in 10 seconds...")
-            if self.hand_grid:
+            print(f"\nNext hole will start in {HOLE_PAUSE} seconds...")
+            if self.my_hand:
                 self.print_full_hand()  # Non-dealer players reveal their own cards
             else:
                 print(f"{Colors.RED}Cannot reveal hand because it is empty.{Colors.RESET}")
-            time.sleep(10)
+            time.sleep(HOLE_PAUSE)
         if self.running:
             self.reset_for_next_hole()
 
     def reset_for_next_hole(self):
         # Reset game state for the next hole
-        self.hand = []
-        self.hand_grid = []
-        self.card_statuses = []
+        self.my_hand = None
         self.stock_pile = []
         self.discard_pile = []
         self.is_my_turn = False
         self.turn_data = {}
-        self.players_done = set()
         self.game_over = False
-        self.hole_over = False
         self.other_players_hands = {}
         self.hole_scores = {}
         self.hole_winner = None
         if self.current_hole < self.holes:
-            if self.is_dealer:
-                self.setup_hole()
-            else:
+            # The dealer's manage_turns loop deals the next hole itself.
+            if not self.is_dealer:
                 print(f"Waiting for dealer {self.dealer_info.username} to start next hole...")
         else:
             self.game_over = True
 
-    def send_score(self, addr):
+    def send_score(self, addr, session):
         msg = {'command': 'score_response', 'player': self.name, 'score': self.score}
-        self.send_message(msg, addr[0], addr[1])
+        self.send_message(msg, addr[0], addr[1], session=session)
 
     def declare_winner(self):
         winner = min(self.scores, key=self.scores.get)
@@ -807,15 +1824,16 @@ class Player:
             'winner': winner
         }
         with self.lock:
-            for player in self.players_info:
-                if player.username != self.name:
-                    self.send_message(end_game_msg, player.ip, player.p_port)
+            self.broadcast(end_game_msg)
+        self.publish_event(end_game_msg)
+        self.game_state.apply('game_end', scores=self.scores)
+        self.save_game_log()
         # Send end to tracker
         msg = {'command': 'end', 'game-identifier': self.game_id, 'player': self.name}
         response = self.send_to_tracker(msg)
         if response:
             print(response.get('message', ''))
-        if self.hand_grid:
+        if self.my_hand:
             self.print_full_hand()  # Reveal all cards at game end
         else:
             print(f"{Colors.RED}Cannot reveal hand because it is empty.{Colors.RESET}")
@@ -827,49 +1845,42 @@ class Player:
         self.scores = {}
         self.hole_scores = {}
         self.hole_winner = None
-        self.hand = []
-        self.hand_grid = []
-        self.card_statuses = []
+        self.my_hand = None
         self.stock_pile = []
         self.discard_pile = []
         self.is_my_turn = False
         self.turn_data = {}
-        self.players_done = set()
-        self.hole_over = False
+        self.game_state.apply('reset')
+        self.route_addr = None
+        self.peers = {}
         self.current_hole = 0
         self.dealer_info = None
         self.is_dealer = False
         self.score = 0
         print(f"{Colors.GREEN}Game has ended gracefully.{Colors.RESET}")
 
+    def save_game_log(self):
+        if not (GAME_LOG_DIR and self.game_log):
+            return
+        try:
+            os.makedirs(GAME_LOG_DIR, exist_ok=True)
+            path = os.path.join(GAME_LOG_DIR, f"game_{self.game_id}_{self.game_seed}.glog")
+            self.game_log.save(path)
+            print(f"Game log written to {path}")
+        except OSError as e:
+            print(f"Failed to write game log: {e}")
+        self.game_log = None
+
+    def record_action(self, player_name, action):
+        """Dealer only: append one finished turn to the game log. Caller holds self.lock."""
+        if self.game_log and player_name in self.game_log.seats:
+            self.game_log.action(player_name, action)
+
     def calculate_score(self):
-        total = 0
-        for col in range(3):
-            column_cards = [self.hand_grid[row][col] for row in range(2)]
-            # Check for pairs in the same column
-            if column_cards[0].value[:-1] == column_cards[1].value[:-1]:
-                continue  # Score for this column is zero
-            for row in range(2):
-                card_value = self.card_value(self.hand_grid[row][col].value)
-                total += card_value
-        self.score = total
+        # Columns whose two cards share a rank score zero (see common.score_card_ids)
+        self.score = self.my_hand.score()
         self.trace(f"Calculated score: {self.score}")  # Debug statement
 
-    def card_value(self, card_str):
-        value_str = card_str[:-1]
-        if value_str == 'A':
-            return 1
-        elif value_str == '2':
-            return -2
-        elif value_str in ['J', 'Q']:
-            return 10
-        elif value_str == 'K':
-            return 0
-        elif value_str.isdigit():
-            return int(value_str)
-        else:
-            return 0
-
     def display_current_scores(self):
         print(f"{Colors.BOLD}{Colors.GREEN}\n=== Current Cumulative Scores After Hole {self.current_hole} ==={Colors.RESET}")
         for player, score in self.scores.items():
@@ -902,10 +1913,11 @@ class Player:
         print("=" * 30)
 
     def play_turn(self):
-        self.print_hand()
+        self.ai_plan = None  # a plan a previous turn left unused (empty pile, lapsed turn) must not leak in
+        self.print_hand(full=True)
         print(f"{Colors.BOLD}{Colors.GREEN}\n=== {self.name}'s Turn ==={Colors.RESET}")
         if self.discard_pile:
-            print(f"{Colors.YELLOW}Discard Pile Top Card:{Colors.RESET} {self.format_card(self.discard_pile[-1].value)}")
+            print(f"{Colors.YELLOW}Discard Pile Top Card:{Colors.RESET} {self.format_card(CARD_VALUES[self.discard_pile[-1]])}")
         else:
             print("Discard Pile is empty.")
         # Display Current Player Score
@@ -916,7 +1928,9 @@ class Player:
         print(f"{Colors.CYAN}2{Colors.RESET}. Draw from Discard")
         if self.allow_steal:
             print(f"{Colors.CYAN}3{Colors.RESET}. Steal a face-up card from another player")
-        choice = input("Enter your choice: ").strip()
+        choice = self.choose_ai_action() if self.ai else input("Enter your choice: ").strip()
+        if self.turn_lapsed():
+            return
         if choice == '1':
             self.draw_from_stock()
         elif choice == '2':
@@ -927,21 +1941,50 @@ class Player:
             print("Invalid choice. Turn skipped.")
             self.end_turn()
 
+    def turn_view(self):
+        """What this seat may see, taken from the current game state snapshot."""
+        from ai import TurnView
+        state = self.game_state.snapshot
+        own = state.hands[self.name]
+        others = tuple((name, hand.cards, hand.face_up) for name, hand in state.hands.items() if name != self.name)
+        return TurnView(own.cards, own.face_up, others, state.discard, self.allow_steal, state.hole)
+
+    def choose_ai_action(self):
+        """Pick this turn's menu choice with the Monte-Carlo engine and remember the rest of the plan."""
+        decision = self.ai.decide(self.turn_view())
+        print(f"AI chose {decision.action} after {decision.rollouts} rollouts in {decision.elapsed:.2f}s "
+              f"({decision.rollouts_per_s:.0f} rollouts/s)")
+        action = decision.action
+        if action[0] == 'discard':
+            self.ai_plan = action[1]
+            return '2'
+        if action[0] == 'steal':
+            self.ai_plan = action[1:]
+            return '3'
+        return '1'
+
     def perform_steal(self):
+        if self.ai_plan:
+            target, target_pos, own_pos = self.ai_plan
+            self.ai_plan = None
+            card = self.other_players_hands[target].cards[target_pos]
+            self.execute_steal({'player_name': target, 'position': divmod(target_pos, 3), 'card': card},
+                               divmod(own_pos, 3))
+            return
         # Display other players and their face-up cards
         available_cards = []
-        for player_name, player_hand_info in self.other_players_hands.items():
-            face_up_positions = [(i, j) for i in range(2) for j in range(3) if player_hand_info['card_statuses'][i][j]]
+        for player_name, player_hand in self.other_players_hands.items():
+            face_up_positions = player_hand.face_up_positions()
             if face_up_positions:
                 print(f"\n{player_name}'s face-up cards:")
-                for idx, (i, j) in enumerate(face_up_positions):
-                    card = player_hand_info['hand'][i*3 + j]
+                for pos in face_up_positions:
+                    i, j = divmod(pos, 3)
                     card_idx = len(available_cards)  # Indexing over all available cards
-                    print(f"{card_idx + 1}. {self.format_card(card.value)} at position ({i}, {j})")
+                    print(f"{card_idx + 1}. {self.format_card(player_hand.value_at(pos))} at position ({i}, {j})")
                     available_cards.append({
                         'player_name': player_name,
                         'position': (i, j),
-                        'card': card
+                        'card': player_hand.cards[pos]
                     })
         if not available_cards:
             print("No face-up cards available to steal.")
@@ -964,7 +2007,7 @@ class Player:
             return
 
         # Now, choose a face-down card from your own hand to give in exchange
-        face_down_positions = [(i, j) for i in range(2) for j in range(3) if not self.card_statuses[i][j]]
+        face_down_positions = [divmod(pos, 3) for pos in self.my_hand.face_down_positions()]
         if not face_down_positions:
             print("You have no face-down cards to exchange. Cannot perform steal action.")
             self.end_turn()
@@ -984,35 +2027,40 @@ class Player:
             print("Invalid input. Turn skipped.")
             self.end_turn()
             return
+        self.execute_steal(target_info, exchange_position)
 
+    def execute_steal(self, target_info, exchange_position):
+        if self.turn_lapsed():
+            self.turn_action = None
+            return
         # Get the exchange card value
         i, j = exchange_position
-        exchange_card = self.hand_grid[i][j]
+        exchange_card = self.my_hand.cards[i * 3 + j]
 
         # Prepare and send steal request
         msg = {
             'command': 'steal_request',
             'from_player': self.name,
             'steal_position': target_info['position'],
-            'exchange_card_value': exchange_card.value,
+            'exchange_card_value': CARD_VALUES[exchange_card],
             'exchange_position': exchange_position
         }
         target_player = next((p for p in self.players_info if p.username == target_info['player_name']), None)
         if target_player:
+            self.turn_action = {
+                'type': 'steal',
+                'target': target_info['player_name'],
+                'target_pos': target_info['position'][0] * 3 + target_info['position'][1],
+                'own_pos': exchange_position[0] * 3 + exchange_position[1]
+            }
             # Send the steal request to the target player
-            self.send_message(msg, target_player.ip, target_player.p_port)
-            # Update our own hand
-            # Swap our face-down card with the stolen card
-            i, j = exchange_position
-            self.hand_grid[i][j] = target_info['card']
-            self.card_statuses[i][j] = True  # The swapped-in card is now face-up
-
-            # Update other player's hand in our records
-            other_player_hand_info = self.other_players_hands[target_info['player_name']]
-            other_i, other_j = target_info['position']
-            other_player_hand_info['hand'][other_i*3 + other_j] = exchange_card
+            self.send_message(msg, target_player.ip, target_player.p_port, session=target_player.username)
+            # Swap our face-down card with the stolen card, which is now face-up
+            self.my_hand.place(self.turn_action['own_pos'], target_info['card'], face_up=True)
             # The exchanged card is now face-down in the other player's hand
-            other_player_hand_info['card_statuses'][other_i][other_j] = False
+            other_hand = self.other_players_hands[target_info['player_name']]
+            other_hand.place(self.turn_action['target_pos'], exchange_card, face_up=False)
+            self.game_state.apply('hand', player=target_info['player_name'], hand=other_hand)
 
             # Send hand update to other players
             self.send_hand_update()
@@ -1021,12 +2069,9 @@ class Player:
             self.print_hand()
 
             # Check if all our cards are face-up
-            if self.is_all_cards_face_up():
+            if self.my_hand.all_face_up():
                 if self.is_dealer:
-                    with self.lock:
-                        self.players_done.add(self.name)
-                    if self.check_hole_end():
-                        self.hole_over = True
+                    self.game_state.apply('player_done', player=self.name)
                 else:
                     self.notify_dealer_player_done()
 
@@ -1035,40 +2080,81 @@ class Player:
             print("Target player not found.")
             self.end_turn()
 
-    def is_all_cards_face_up(self):
-        return all([status for row in self.card_statuses for status in row])
-
     def notify_dealer_player_done(self):
         if not self.is_dealer:
             msg = {'command': 'player_done', 'player': self.name}
-            self.send_message(msg, self.dealer_info.ip, self.dealer_info.p_port)
+            self.send_message(msg, self.dealer_info.ip, self.dealer_info.p_port,
+                              session=self.dealer_info.username)
 
     def draw_from_stock(self):
+        from gamelog import hole_rng
+        drawn_card = None
         with self.lock:
+            self.reshuffled_from = None
             if not self.stock_pile:
                 if len(self.discard_pile) > 1:
+                    self.reshuffled_from = self.discard_pile
                     self.stock_pile = self.discard_pile[:-1]
                     self.discard_pile = [self.discard_pile[-1]]
-                    random.shuffle(self.stock_pile)
+                    hole_rng(self.game_seed, self.current_hole, self.turn_number).shuffle(self.stock_pile)
                     self.trace("Re-shuffled discard pile into stock pile.")
-                else:
-                    print("No cards left to draw.")
-                    self.end_turn()
-                    return
-            drawn_card = self.stock_pile.pop()
+            if self.stock_pile:
+                drawn_card = self.stock_pile.pop()
+        if drawn_card is None:
+            # Ended outside the lock: end_turn takes it
+            print("No cards left to draw.")
+            self.end_turn()
+            return
+        self.turn_action = {'type': 'draw', 'source': 'stock', 'card': CARD_VALUES[drawn_card], 'pos': None}
         self.handle_drawn_card(drawn_card)
 
     def draw_from_discard(self):
         with self.lock:
-            if not self.discard_pile:
-                print("Discard pile is empty.")
-                self.end_turn()
-                return
-            drawn_card = self.discard_pile.pop()
+            drawn_card = self.discard_pile.pop() if self.discard_pile else None
+        if drawn_card is None:
+            print("Discard pile is empty.")
+            self.end_turn()
+            return
+        self.turn_action = {'type': 'draw', 'source': 'discard', 'card': CARD_VALUES[drawn_card], 'pos': None}
         self.handle_drawn_card(drawn_card)
 
     def handle_drawn_card(self, drawn_card):
-        print(f"You drew {self.format_card(drawn_card.value)}")
+        print(f"You drew {self.format_card(CARD_VALUES[drawn_card])}")
+        pos = self.choose_ai_placement(drawn_card) if self.ai else self.choose_placement()
+        if self.turn_lapsed():
+            with self.lock:
+                # Put the card back, and undo the reshuffle the draw caused: on
+                # the dealer these piles are the authoritative ones
+                if self.turn_action['source'] == 'stock' and self.reshuffled_from is not None:
+                    self.stock_pile, self.discard_pile = [], self.reshuffled_from
+                    self.reshuffled_from = None
+                else:
+                    (self.stock_pile if self.turn_action['source'] == 'stock' else self.discard_pile).append(drawn_card)
+            self.turn_action = None
+            return
+        if pos is None:
+            with self.lock:
+                self.discard_pile.append(drawn_card)
+            print(f"Discarded {self.format_card(CARD_VALUES[drawn_card])}")
+        else:
+            discarded_card = self.my_hand.place(pos, drawn_card, face_up=True)
+            self.turn_action['pos'] = pos
+            with self.lock:
+                self.discard_pile.append(discarded_card)
+            print(f"Swapped {self.format_card(CARD_VALUES[discarded_card])} with {self.format_card(CARD_VALUES[drawn_card])}")
+            # Send update to other players
+            self.send_hand_update()
+        self.update_piles()
+        self.print_hand()
+        if self.my_hand.all_face_up():
+            if self.is_dealer:
+                self.game_state.apply('player_done', player=self.name)
+            else:
+                self.notify_dealer_player_done()
+        self.end_turn()
+
+    def choose_placement(self):
+        """Ask where to keep the drawn card; None means discard it."""
         while True:
             print("\nDo you want to:")
             print(f"{Colors.CYAN}1{Colors.RESET}. Swap a card in your hand")
@@ -1083,86 +2169,124 @@ class Player:
                     if not (0 <= row < 2 and 0 <= col < 3):
                         print("Invalid row or column.")
                         continue
-                    discarded_card = self.hand_grid[row][col]
-                    self.hand_grid[row][col] = drawn_card
-                    self.card_statuses[row][col] = True
-                    with self.lock:
-                        self.discard_pile.append(discarded_card)
-                    print(f"Swapped {self.format_card(discarded_card.value)} with {self.format_card(drawn_card.value)}")
-                    # Send update to other players
-                    self.send_hand_update()
-                    break
+                    return row * 3 + col
                 except ValueError:
                     print("Invalid input.")
             elif action == '2':
-                with self.lock:
-                    self.discard_pile.append(drawn_card)
-                print(f"Discarded {self.format_card(drawn_card.value)}")
-                break
+                return None
             else:
                 print("Invalid action. Please choose again.")
-        self.print_hand()
-        self.update_piles()
-        if self.is_all_cards_face_up():
-            if self.is_dealer:
-                with self.lock:
-                    self.players_done.add(self.name)
-                if self.check_hole_end():
-                    self.hole_over = True
-            else:
-                self.notify_dealer_player_done()
-        self.end_turn()
+
+    def choose_ai_placement(self, drawn_card):
+        # A card taken from the discard pile goes where the plan said; a stock
+        # card is placed by expected hand score.
+        plan, self.ai_plan = self.ai_plan, None
+        if plan is not None:
+            return plan
+        return self.ai.place(self.turn_view(), drawn_card)
 
     def send_hand_update(self):
         msg = {
             'command': 'update_hand',
             'player': self.name,
-            'hand': [card.value for row in self.hand_grid for card in row],
-            'card_statuses': self.card_statuses
+            'hand': self.my_hand.values(),
+            'card_statuses': self.my_hand.statuses()
         }
+        self.game_state.apply('hand', player=self.name, hand=self.my_hand)
         with self.lock:
-            for player in self.players_info:
-                if player.username != self.name:
-                    self.send_message(msg, player.ip, player.p_port)
+            self.broadcast(msg)
+        self.publish_event(msg)
+
+    def publish_event(self, msg):
+        """Dealer only: hand one game event to the spectator relay, which fans it out."""
+        if self.is_dealer and self.relay_addr and self.game_id is not None:
+            event = {'command': 'publish', 'game_id': self.game_id, 'event': msg}
+            self.send_message(event, self.relay_addr[0], self.relay_addr[1])
 
     def end_turn(self):
-        if self.is_dealer:
-            self.turn_event.set()
+        action, self.turn_action = self.turn_action, None
+        with self.lock:
+            # Decided under the lock a takeover holds, so the turn is reported
+            # to whoever deals it: ourselves, or the dealer and its successor.
+            self.completed_turn = (self.current_hole, self.turn_number)
+            dealing = self.is_dealer
+            successor = None if dealing else self.successor()
+            msg = {'command': 'turn_over', 'player': self.name, 'action': action, 'turn': self.turn_number}
+            if successor and successor.username == self.name:
+                self.last_turn_over = msg
+        if dealing:
+            self.finish_turn((self.current_hole, self.turn_number), self.name, action)
         else:
-            msg = {'command': 'turn_over'}
-            self.send_message(msg, self.dealer_info.ip, self.dealer_info.p_port)
+            self.send_message(msg, self.dealer_info.ip, self.dealer_info.p_port,
+                              session=self.dealer_info.username)
+            if successor and successor.username != self.name:
+                self.send_message(msg, successor.ip, successor.p_port, session=successor.username)
 
-    def update_piles(self):
-        msg = {
-            'command': 'update_piles',
-            'stock_pile': [card.value for card in self.stock_pile],
-            'discard_pile': [card.value for card in self.discard_pile]
-        }
+    def apply_piles(self):
         with self.lock:
-            for player in self.players_info:
-                if player.username != self.name:
-                    self.send_message(msg, player.ip, player.p_port)
+            stock, discard = tuple(self.stock_pile), tuple(self.discard_pile)
+        self.game_state.apply('piles', stock=stock, discard=discard)
 
-    def update_player_state(self):
+    def update_piles(self):
+        """Send the piles to the dealer and its successor, and a summary to every other seat.
+
+        Only those two keep the whole piles (the dealer hands them out with
+        each your_turn), so the stock, which grows with the number of decks,
+        is not sent to every seat after every turn. The summary carries the
+        pile sizes and the top discard, which is all a seat shows between
+        its turns. After a turn that reshuffled the discard pile into the
+        stock every seat gets the whole piles, since a summary can only cut
+        a seat's copy of the stock, not replace it.
+        """
+        self.apply_piles()
+        with self.lock:
+            stock = [CARD_VALUES[card] for card in self.stock_pile]
+            discard = [CARD_VALUES[card] for card in self.discard_pile]
+            msg = {'command': 'update_piles', 'stock_pile': stock, 'discard_pile': discard}
+            summary = {'command': 'update_piles', 'stock_count': len(stock), 'discard_count': len(discard),
+                       'discard_top': discard[-1] if discard else None}
+            successor = self.successor()
+            keepers = {self.dealer_info.username if self.dealer_info else None,
+                       successor.username if successor else None}
+            reshuffled, self.reshuffled_from = self.reshuffled_from is not None, None
+            peers = [player for player in self.players_info if player.username != self.name]
+            self.send_to_peers([player for player in peers if reshuffled or player.username in keepers], msg)
+            self.send_to_peers([player for player in peers if not reshuffled and player.username not in keepers],
+                               summary)
+        self.publish_event(msg)
+
+    def update_player_state(self, roster=False):
+        # The roster only changes with the dealer (dealer_changed carries it), so
+        # it goes out once per hole rather than to every seat after every turn.
         msg = {
             'command': 'update_player_state',
-            'current_player_index': self.current_player_index,
-            'players': [player.to_dict() for player in self.players_info]
+            'current_player_index': self.current_player_index
         }
+        if roster:
+            msg['players'] = [player.to_dict() for player in self.players_info]
         with self.lock:
-            for player in self.players_info:
-                if player.username != self.name:
-                    self.send_message(msg, player.ip, player.p_port)
+            self.broadcast(msg)
 
-    def run(self):
+    def turn_ready(self):
+        # Caller holds self.lock and has just set is_my_turn. A session's
+        # turns are played by its host's turn workers instead of run().
+        if self.host:
+            self.host.turns.put(self)
+
+    def take_turn(self):
+        self.play_turn()
+        with self.lock:
+            self.is_my_turn = False
+
+    def run(self, interactive=True):
+        # Headless players (bots, benchmarks) skip the command prompt.
         self.start_listening()
-        threading.Thread(target=self.input_thread, daemon=True).start()
+        if interactive:
+            threading.Thread(target=self.input_thread, daemon=True).start()
         while self.running:
             if self.in_game:
                 if self.is_my_turn:
-                    self.play_turn()
-                    with self.lock:
-                        self.is_my_turn = False
+                    self.take_turn()
                 else:
                     time.sleep(0.1)
             else:
@@ -1189,6 +2313,12 @@ class Player:
             self.start_game()
         elif command == 'de_register':
             self.de_register()
+        elif command == 'spectate':
+            self.spectate()
+        elif command == 'stop_spectating':
+            self.stop_spectating()
+        elif command == 'stats':
+            self.show_stats()
         elif command == 'help':
             self.show_help()
         elif command == 'exit':
@@ -1207,6 +2337,9 @@ class Player:
 {Colors.CYAN}query_games{Colors.RESET}      - List all active games
 {Colors.CYAN}start_game{Colors.RESET}       - Start a new game
 {Colors.CYAN}de_register{Colors.RESET}      - Deregister from the tracker
+{Colors.CYAN}spectate{Colors.RESET}         - Watch a game in progress
+{Colors.CYAN}stop_spectating{Colors.RESET}  - Stop watching a game
+{Colors.CYAN}stats{Colors.RESET}            - Show message counters (and handler timings when profiling)
 {Colors.CYAN}help{Colors.RESET}             - Show this help message
 {Colors.CYAN}exit{Colors.RESET}             - Exit the application
 {Colors.BLUE}========================={Colors.RESET}
@@ -0,0 +1,113 @@
+# profiling.py
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+PROFILE_PATH = os.environ.get('CARDGAME_PROFILE')  # output prefix; profiling is off when unset
+PROFILE_WINDOW = float(os.environ.get('CARDGAME_PROFILE_WINDOW', 60))  # seconds of sampling after the first event
+SAMPLE_INTERVAL = float(os.environ.get('CARDGAME_PROFILE_INTERVAL', 0.005))  # seconds between stack samples
+
+class Profiler:
+    """Opt-in sampling profiler plus per-handler wall-clock timings.
+
+    While the window is open a background thread samples every thread's
+    stack each ``interval`` seconds. Only stacks passing through one of the
+    ``focus`` functions are kept, trimmed to start there, so idle socket
+    loops do not drown out the handlers. When the window closes (or at
+    exit) the samples are written to ``<path>.collapsed`` in the
+    one-line-per-stack format flame-graph tools read, and the timings to
+    ``<path>.timings.json``.
+
+    Callers keep ``None`` instead of a Profiler when profiling is off, so
+    the disabled cost is one attribute test per handled command.
+    """
+
+    def __init__(self, path, focus, window=PROFILE_WINDOW, interval=SAMPLE_INTERVAL):
+        self.path = path
+        self.focus = frozenset(focus)
+        self.window = window
+        self.interval = interval
+        self.stacks = {}   # collapsed stack -> sample count
+        self.timings = {}  # handler name -> [calls, total seconds, max seconds]
+        self.lock = threading.Lock()
+        self.started = None
+        self.samples = 0
+        self.dumped = False
+        atexit.register(self.dump)
+
+    def start(self):
+        """Open the sampling window; later calls are no-ops."""
+        with self.lock:
+            if self.started is not None:
+                return
+            self.started = time.monotonic()
+        threading.Thread(target=self.sample_loop, name="profiler", daemon=True).start()
+
+    def sample_loop(self):
+        own = threading.get_ident()
+        deadline = self.started + self.window
+        while time.monotonic() < deadline:
+            time.sleep(self.interval)
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self.sample(frame)
+            self.samples += 1
+        self.dump()
+
+    def sample(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            if code.co_name in self.focus:
+                break
+            frame = frame.f_back
+        if frame is None:
+            return
+        stack = ';'.join(reversed(names))
+        with self.lock:
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def record(self, name, elapsed):
+        with self.lock:
+            entry = self.timings.get(name)
+            if entry is None:
+                self.timings[name] = [1, elapsed, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                if elapsed > entry[2]:
+                    entry[2] = elapsed
+
+    def timing_summary(self):
+        with self.lock:
+            return {name: {"calls": calls, "total_ms": round(total * 1000, 3),
+                           "mean_ms": round(total * 1000 / calls, 3), "max_ms": round(peak * 1000, 3)}
+                    for name, (calls, total, peak) in sorted(self.timings.items(), key=lambda item: -item[1][1])}
+
+    def dump(self):
+        with self.lock:
+            if self.dumped or self.started is None:
+                return
+            self.dumped = True
+            stacks = sorted(self.stacks.items())
+        try:
+            with open(f"{self.path}.collapsed", 'w') as f:
+                for stack, count in stacks:
+                    f.write(f"{stack} {count}\n")
+            with open(f"{self.path}.timings.json", 'w') as f:
+                json.dump({"window_s": self.window, "interval_s": self.interval, "samples": self.samples,
+                           "handlers": self.timing_summary()}, f, indent=2)
+            print(f"DEBUG: Profile written to {self.path}.collapsed and {self.path}.timings.json")
+        except OSError as e:
+            print(f"DEBUG: Could not write profile {self.path}: {e}")
+
+def from_env(role, focus, path=PROFILE_PATH):
+    """The Profiler for ``role`` when profiling is enabled, else None."""
+    if not path:
+        return None
+    return Profiler(f"{path}.{role}.{os.getpid()}", focus)
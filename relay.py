@@ -0,0 +1,282 @@
+# relay.py
+
+import argparse
+import json
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from transport import MAX_DATAGRAM, decode_json
+
+BATCH_INTERVAL = 0.05     # seconds between fan-out flushes
+MAX_PENDING = 256         # queued events per subscriber before the oldest are dropped
+MAX_BATCH = 32            # events per outgoing datagram
+SUBSCRIPTION_TTL = 60     # seconds a subscription lives without being renewed
+ROUTE_INTERVAL = 0.01     # seconds between flushes of routed game messages
+ROUTE_BATCH_BYTES = 60000 # bytes of routed messages coalesced into one datagram
+HOLD_TTL = 30             # seconds messages wait for a seat that has not attached
+
+class Subscriber:
+    def __init__(self, addr, max_pending):
+        self.addr = addr
+        self.pending = deque(maxlen=max_pending)
+        self.dropped = 0
+        self.expires = time.monotonic() + SUBSCRIPTION_TTL
+
+class Relay:
+    """Fans game events published once by a dealer out to many spectators.
+
+    Events are queued per subscriber and flushed in batches every
+    BATCH_INTERVAL. A subscriber that cannot keep up loses its oldest
+    events; the next batch reports how many were dropped.
+
+    In routing mode the relay also carries the game itself. The tracker opens
+    each game with its roster. Every seat attaches from its game socket, and
+    the relay keeps the address it sees, so players behind NAT are reachable
+    on the mapping they opened. Seats then send ``route`` messages naming the
+    recipients; the relay queues them per destination and flushes each queue
+    as one ``routed_batch`` datagram every ROUTE_INTERVAL. Messages for a
+    rostered seat that has not attached yet are held, up to max_pending,
+    and queued when it attaches; a seat that does not attach within
+    HOLD_TTL loses them.
+    """
+
+    def __init__(self, sock, max_pending=MAX_PENDING, max_batch=MAX_BATCH, tracker_host=None):
+        self.sock = sock
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.tracker_host = tracker_host  # only this host may open/close routed games, if set
+        self.subscribers = {}  # game_id -> {addr: Subscriber}
+        self.games = {}        # routed game_id -> {username: attached addr or None}
+        self.outbox = {}       # addr -> list of routed messages awaiting flush
+        self.held = {}         # (game_id, username) -> (expiry, messages routed before that seat attached)
+        self.lock = threading.Lock()
+        self.metrics = {"published": 0, "delivered": 0, "batches": 0, "dropped": 0,
+                        "routed": 0, "route_batches": 0, "unroutable": 0, "held": 0,
+                        "held_expired": 0}
+
+    def handle_command(self, msg, addr):
+        command = msg.get('command', '')
+        method = getattr(self, f"cmd_{command}", None)
+        if method:
+            try:
+                response = method(msg, addr)
+            except Exception as e:
+                response = {"status": "FAILURE", "message": f"Error processing command: {e}"}
+        else:
+            response = {"status": "FAILURE", "message": "Unknown command"}
+        if response is not None:
+            self.sock.sendto(json.dumps(response).encode(), addr)
+
+    def cmd_subscribe(self, msg, addr):
+        game_id = msg['game_id']
+        with self.lock:
+            game_subs = self.subscribers.setdefault(game_id, {})
+            sub = game_subs.get(addr)
+            if sub is None:
+                game_subs[addr] = Subscriber(addr, self.max_pending)
+                print(f"DEBUG: {addr} is spectating game {game_id}")
+            else:
+                sub.expires = time.monotonic() + SUBSCRIPTION_TTL
+        return {"command": "spectate_ack", "status": "SUCCESS", "game_id": game_id, "ttl": SUBSCRIPTION_TTL}
+
+    def cmd_unsubscribe(self, msg, addr):
+        with self.lock:
+            game_subs = self.subscribers.get(msg['game_id'], {})
+            game_subs.pop(addr, None)
+            if not game_subs:
+                self.subscribers.pop(msg['game_id'], None)
+        return None
+
+    def cmd_publish(self, msg, addr):
+        # Publishers never get a reply; the dealer's cost is one datagram per event.
+        game_id = msg['game_id']
+        event = msg['event']
+        with self.lock:
+            self.metrics["published"] += 1
+            game_subs = self.subscribers.get(game_id)
+            if not game_subs:
+                return None
+            for sub in game_subs.values():
+                if len(sub.pending) == sub.pending.maxlen:
+                    sub.dropped += 1
+                    self.metrics["dropped"] += 1
+                sub.pending.append(event)
+            if event.get('command') == 'end_game':
+                # Deliver what is queued, then forget the game.
+                for sub in game_subs.values():
+                    sub.expires = 0
+        return None
+
+    def cmd_metrics(self, msg, addr):
+        with self.lock:
+            subscribers = sum(len(subs) for subs in self.subscribers.values())
+            return {"status": "SUCCESS", "metrics": dict(self.metrics), "subscribers": subscribers,
+                    "routed_games": len(self.games)}
+
+    def cmd_open_game(self, msg, addr):
+        if self.tracker_host and addr[0] != self.tracker_host:
+            return {"status": "FAILURE", "message": "Only the tracker may open games"}
+        with self.lock:
+            self.games[msg['game_id']] = {name: None for name in msg['players']}
+        print(f"DEBUG: Routing game {msg['game_id']} for {msg['players']}")
+        return None
+
+    def cmd_close_game(self, msg, addr):
+        if self.tracker_host and addr[0] != self.tracker_host:
+            return {"status": "FAILURE", "message": "Only the tracker may close games"}
+        with self.lock:
+            self.games.pop(msg['game_id'], None)
+            for key in [key for key in self.held if key[0] == msg['game_id']]:
+                del self.held[key]
+        return None
+
+    def cmd_attach(self, msg, addr):
+        # Sent when a seat joins and repeated as a keepalive, which also keeps
+        # the seat's NAT mapping open.
+        with self.lock:
+            roster = self.games.get(msg['game_id'])
+            if roster is None or msg['player'] not in roster:
+                self.metrics["unroutable"] += 1
+                return None
+            roster[msg['player']] = addr
+            _, held = self.held.pop((msg['game_id'], msg['player']), (None, None))
+            if held:
+                self.outbox.setdefault(addr, []).extend(held)
+        return None
+
+    def cmd_route(self, msg, addr):
+        """Queue one message for each named recipient.
+
+        A broadcast travels as one datagram with one sequence number per
+        recipient; the relay stamps each copy with its own.
+        """
+        with self.lock:
+            roster = self.games.get(msg['game_id'])
+            if roster is None or roster.get(msg['from']) != addr:
+                self.metrics["unroutable"] += 1
+                return None
+            inner = msg['msg']
+            for target, seq in zip(msg['to'], msg['seqs']):
+                target_addr = roster.get(target)
+                if target_addr is None:
+                    # A seat that has not attached yet (the deal can beat it
+                    # here) gets what was routed to it once it does.
+                    key = (msg['game_id'], target)
+                    if target in roster and key not in self.held:
+                        self.held[key] = (time.monotonic() + HOLD_TTL, [])
+                    _, held = self.held.get(key, (None, None))
+                    if held is None or len(held) >= self.max_pending:
+                        self.metrics["unroutable"] += 1
+                        continue
+                    held.append(dict(inner, seq=seq, session=target))
+                    self.metrics["held"] += 1
+                    continue
+                self.outbox.setdefault(target_addr, []).append(dict(inner, seq=seq, session=target))
+                self.metrics["routed"] += 1
+        return None
+
+    def flush_routes(self):
+        """Coalesce everything queued for each destination into as few datagrams as possible."""
+        now = time.monotonic()
+        with self.lock:
+            outbox, self.outbox = self.outbox, {}
+            for key in [key for key, (expiry, _) in self.held.items() if expiry <= now]:
+                self.metrics["held_expired"] += len(self.held.pop(key)[1])
+        for addr, messages in outbox.items():
+            batch, size = [], 0
+            for message in messages:
+                encoded = json.dumps(message)
+                if batch and size + len(encoded) > ROUTE_BATCH_BYTES:
+                    self.send_route_batch(addr, batch)
+                    batch, size = [], 0
+                batch.append(encoded)
+                size += len(encoded) + 1
+            self.send_route_batch(addr, batch)
+
+    def send_route_batch(self, addr, batch):
+        # Messages are already encoded; splice them into the envelope.
+        datagram = '{"command": "routed_batch", "messages": [' + ','.join(batch) + ']}'
+        try:
+            self.sock.sendto(datagram.encode(), addr)
+        except OSError as e:
+            print(f"DEBUG: Failed to route batch to {addr}: {e}")
+            return
+        with self.lock:
+            self.metrics["route_batches"] += 1
+
+    def flush(self):
+        """Send each subscriber its queued events, at most max_batch per datagram."""
+        now = time.monotonic()
+        outgoing = []
+        with self.lock:
+            for game_id, game_subs in list(self.subscribers.items()):
+                for addr, sub in list(game_subs.items()):
+                    while sub.pending:
+                        count = min(self.max_batch, len(sub.pending))
+                        events = [sub.pending.popleft() for _ in range(count)]
+                        outgoing.append((addr, {'command': 'spectate_batch', 'game_id': game_id,
+                                                'events': events, 'dropped': sub.dropped}))
+                        sub.dropped = 0
+                    if sub.expires <= now:
+                        del game_subs[addr]
+                if not game_subs:
+                    del self.subscribers[game_id]
+        for addr, batch in outgoing:
+            try:
+                self.sock.sendto(json.dumps(batch).encode(), addr)
+            except OSError as e:
+                print(f"DEBUG: Failed to deliver batch to {addr}: {e}")
+                continue
+            with self.lock:
+                self.metrics["batches"] += 1
+                self.metrics["delivered"] += len(batch['events'])
+
+def run_flusher(relay, interval):
+    while True:
+        time.sleep(interval)
+        relay.flush()
+
+def run_route_flusher(relay, interval):
+    while True:
+        time.sleep(interval)
+        relay.flush_routes()
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(usage="python relay.py <port> [options]")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--batch-interval", type=float, default=BATCH_INTERVAL, help="seconds between flushes")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="queued events per subscriber")
+    parser.add_argument("--route-interval", type=float, default=ROUTE_INTERVAL, help="seconds between routed-message flushes")
+    parser.add_argument("--tracker", metavar="HOST", help="only accept open_game/close_game from this host")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.bind(('', args.port))
+    except Exception as e:
+        print(f"DEBUG: Failed to bind to port {args.port}: {e}")
+        sys.exit(1)
+    relay = Relay(sock, args.max_pending, tracker_host=args.tracker)
+    threading.Thread(target=run_flusher, args=(relay, args.batch_interval), daemon=True).start()
+    threading.Thread(target=run_route_flusher, args=(relay, args.route_interval), daemon=True).start()
+    print(f"DEBUG: Relay listening on port {args.port}")
+    # One receive buffer, reused: commands are handled inline before the next datagram.
+    buffer = bytearray(MAX_DATAGRAM)
+    view = memoryview(buffer)
+    while True:
+        try:
+            nbytes, addr = sock.recvfrom_into(buffer)
+            relay.handle_command(decode_json(view[:nbytes]), addr)
+        except KeyboardInterrupt:
+            print("\nDEBUG: Shutting down the relay.")
+            break
+        except Exception as e:
+            print(f"DEBUG: Error receiving data: {e}")
+    sock.close()
+
+if __name__ == "__main__":
+    main()
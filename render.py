@@ -0,0 +1,133 @@
+# render.py
+
+import re
+import sys
+import threading
+import time
+
+ANSI_PATTERN = re.compile(r'\033\[[0-9;]*[A-Za-z]')
+CLEAR = '\033[2J\033[H'
+SAVE_CURSOR = '\0337'
+RESTORE_CURSOR = '\0338'
+MIN_INTERVAL = 0.05  # seconds between repaints; bursts in between are coalesced
+
+def visible_width(text):
+    return len(ANSI_PATTERN.sub('', text))
+
+class Renderer:
+    """Keeps a frame of text pinned to the top of the terminal and repaints it in place.
+
+    A frame is a list of rows; each row is a string or a list of cell
+    strings. The first paint clears the screen and confines scrolling to
+    the lines below the frame. Later paints only rewrite the cells that
+    changed, in one buffered write, and at most once per ``min_interval``.
+    When the stream is not a terminal every frame is simply printed.
+    """
+
+    def __init__(self, stream=None, min_interval=MIN_INTERVAL):
+        self.stream = stream or sys.stdout
+        self.min_interval = min_interval
+        self.interactive = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.screen = None        # rows currently on screen; None forces a full paint
+        self.pending = None       # newest frame not yet written
+        self.last_paint = 0.0
+        self.timer = None
+        self.lock = threading.RLock()
+        self.stats = {"paints": 0, "full_paints": 0, "coalesced": 0, "bytes": 0}
+
+    def clear(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.pending = None
+            self.write(CLEAR + ('\033[r' if self.interactive else ''))
+            self.screen = None
+
+    def invalidate(self):
+        """Forget what is on screen; the next frame is painted in full."""
+        with self.lock:
+            self.screen = None
+
+    def render(self, rows, force=False):
+        with self.lock:
+            if self.pending is not None:
+                self.stats["coalesced"] += 1
+            self.pending = [row if isinstance(row, list) else [row] for row in rows]
+            if force:
+                self.flush()
+                return
+            wait = self.min_interval - (time.monotonic() - self.last_paint)
+            if wait <= 0 or self.screen is None:
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(wait, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            frame, self.pending = self.pending, None
+            if frame is None:
+                return
+            if not self.interactive:
+                self.write('\n'.join(''.join(row) for row in frame) + '\n')
+                self.screen = frame
+            elif self.screen is None:
+                self.paint_full(frame)
+            else:
+                self.paint_diff(frame)
+            self.last_paint = time.monotonic()
+
+    def paint_full(self, frame):
+        out = [CLEAR]
+        out.extend(''.join(row) + '\n' for row in frame)
+        # Keep later output scrolling underneath the frame.
+        import shutil  # first full paint only; keeps it off the startup path
+        height = shutil.get_terminal_size().lines
+        if len(frame) < height - 1:
+            out.append(f'\033[{len(frame) + 1};{height}r\033[{len(frame) + 1};1H')
+        self.write(''.join(out))
+        self.screen = frame
+        self.stats["full_paints"] += 1
+
+    def paint_diff(self, frame):
+        if len(frame) != len(self.screen):
+            self.paint_full(frame)
+            return
+        out = []
+        for row_index, (old, new) in enumerate(zip(self.screen, frame)):
+            if old == new:
+                continue
+            widths = [visible_width(cell) for cell in new]
+            if len(old) == len(new) and widths == [visible_width(cell) for cell in old]:
+                column = 1
+                for cell, previous, width in zip(new, old, widths):
+                    if cell != previous:
+                        out.append(f'\033[{row_index + 1};{column}H{cell}')
+                    column += width
+            else:
+                # Cells moved: rewrite the line from the first change onwards.
+                first = next((i for i in range(len(new)) if i >= len(old) or new[i] != old[i]), len(new))
+                column = 1 + sum(widths[:first])
+                out.append(f'\033[{row_index + 1};{column}H{"".join(new[first:])}\033[K')
+        if out:
+            self.write(SAVE_CURSOR + ''.join(out) + RESTORE_CURSOR)
+        self.screen = frame
+
+    def write(self, text):
+        self.stream.write(text)
+        self.stream.flush()
+        self.stats["bytes"] += len(text)
+        self.stats["paints"] += 1
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            if self.interactive:
+                self.write('\033[r')
+
+screen = Renderer()
@@ -0,0 +1,167 @@
+# replay.py
+"""Headless replay of binary game logs. Usage: python replay.py <log>... | --synthetic N [--repeat R]"""
+
+import argparse
+import random
+import sys
+import time
+from common import CARD_VALUES, HAND_SIZE, Shoe, shoe_decks
+from gamelog import GameLog, hole_rng, DEAL, DRAW, SWAP, DISCARD, STEAL, SCORE, SKIP
+from gamestate import HandState
+
+STATUS_POSITIONS = [(i, j) for i in range(2) for j in range(3)]
+
+class ReplayError(Exception):
+    pass
+
+class Table:
+    """Rules engine over card ids that mirrors the dealer's setup_hole and the turn actions.
+
+    Hands are HandState objects, the same model the players keep.
+    """
+
+    def __init__(self, seed, seats):
+        self.seed = seed
+        self.seats = seats
+        self.hole = 0
+        self.turn = 0
+        self.stock = []
+        self.discard = []
+        self.hands = []
+
+    def deal(self, hole):
+        rng = hole_rng(self.seed, hole)
+        shoe = Shoe(rng, shoe_decks(self.seats))
+        self.hands = []
+        for _ in range(self.seats):
+            hand = HandState(shoe.deal(HAND_SIZE))
+            for i, j in rng.sample(STATUS_POSITIONS, 2):
+                hand.face_up |= 1 << (i * 3 + j)
+            self.hands.append(hand)
+        self.discard = [shoe.draw()]
+        self.stock = shoe.stock()
+        self.hole = hole
+        self.turn = 0
+
+    def draw(self, source):
+        if source == 1:
+            return self.discard.pop() if self.discard else None
+        if not self.stock:
+            if len(self.discard) <= 1:
+                return None
+            self.stock = self.discard[:-1]
+            self.discard = [self.discard[-1]]
+            hole_rng(self.seed, self.hole, self.turn).shuffle(self.stock)
+        return self.stock.pop()
+
+    def swap(self, seat, pos, card):
+        self.discard.append(self.hands[seat].place(pos, card, face_up=True))
+        self.turn += 1
+
+    def discard_card(self, card):
+        self.discard.append(card)
+        self.turn += 1
+
+    def steal(self, seat, target, target_pos, own_pos):
+        mine, theirs = self.hands[seat], self.hands[target]
+        if not theirs.is_face_up(target_pos):
+            raise ReplayError(f"Seat {seat} stole face-down position {target_pos} from seat {target}")
+        stolen = theirs.place(target_pos, mine.cards[own_pos], face_up=False)
+        mine.place(own_pos, stolen, face_up=True)
+        self.turn += 1
+
+    def skip(self):
+        self.turn += 1
+
+    def all_face_up(self, seat):
+        return self.hands[seat].all_face_up()
+
+    def score(self, seat):
+        return self.hands[seat].score()
+
+def replay_game(log, verify=True):
+    """Re-execute a logged game and return the cumulative scores.
+
+    With ``verify`` every drawn card and every logged score is checked
+    against the re-executed state; a divergence raises ReplayError.
+    """
+    table = Table(log.seed, len(log.players))
+    totals = [0] * len(log.players)
+    drawn = None
+    for event in log:
+        kind = event[0]
+        if kind == DRAW:
+            drawn = table.draw(event[2])
+            if verify and drawn != event[3]:
+                raise ReplayError(f"Hole {table.hole} turn {table.turn}: expected card {event[3]}, drew {drawn}")
+        elif kind == SWAP:
+            table.swap(event[1], event[2], drawn)
+        elif kind == DISCARD:
+            table.discard_card(drawn)
+        elif kind == STEAL:
+            table.steal(*event[1:])
+        elif kind == SKIP:
+            table.skip()
+        elif kind == SCORE:
+            score = table.score(event[1])
+            if verify and score != event[2]:
+                raise ReplayError(f"Hole {table.hole}: seat {event[1]} logged {event[2]}, replay scored {score}")
+            totals[event[1]] += score
+        elif kind == DEAL:
+            table.deal(event[1])
+    return dict(zip(log.players, totals))
+
+def simulate_game(seed, players, holes, max_turns=500):
+    """Play a whole game headlessly with a random policy and return its log."""
+    policy = random.Random(seed)
+    log = GameLog(seed, players, holes)
+    table = Table(seed, len(players))
+    for hole in range(1, holes + 1):
+        table.deal(hole)
+        log.deal(hole)
+        seat = 0
+        for _ in range(max_turns):
+            source = 1 if table.discard and policy.random() < 0.3 else 0
+            card = table.draw(source)
+            if card is None:
+                table.skip()
+                log.action(players[seat], None)
+            else:
+                face_down = table.hands[seat].face_down_positions()
+                pos = policy.choice(face_down) if face_down and policy.random() < 0.8 else None
+                if pos is None:
+                    table.discard_card(card)
+                else:
+                    table.swap(seat, pos, card)
+                log.action(players[seat], {'type': 'draw', 'source': ['stock', 'discard'][source],
+                                           'card': CARD_VALUES[card], 'pos': pos})
+            if table.all_face_up(seat):
+                break
+            seat = (seat + 1) % len(players)
+        for s, name in enumerate(players):
+            log.score(name, table.score(s))
+    return log
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("logs", nargs="*", help="game log files written by the dealer")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N random games instead of reading logs")
+    parser.add_argument("--repeat", type=int, default=1, help="replay every log this many times")
+    args = parser.parse_args()
+    logs = [GameLog.load(path) for path in args.logs]
+    logs += [simulate_game(seed, ['p0', 'p1', 'p2', 'p3'], 9) for seed in range(args.synthetic)]
+    if not logs:
+        parser.error("no logs given")
+    if args.logs:
+        for path, log in zip(args.logs, logs):
+            print(f"{path}: seed={log.seed} players={log.players} scores={replay_game(log)}")
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for log in logs:
+            replay_game(log)
+    elapsed = time.perf_counter() - start
+    games = len(logs) * args.repeat
+    print(f"Replayed {games} games in {elapsed:.3f}s ({games / elapsed:.0f} games/s)")
+
+if __name__ == "__main__":
+    sys.exit(main())
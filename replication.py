@@ -0,0 +1,161 @@
+# replication.py
+
+import json
+import queue
+import socket
+import threading
+import time
+from transport import encode_frame, decode_json, FrameReader, FramingError
+
+KEEPALIVE_INTERVAL = 0.1  # seconds between leader keep-alives on an idle replication stream
+FAILOVER_TIMEOUT = 0.4    # leader silence after which the first follower takes over
+CONNECT_TIMEOUT = 0.1     # per attempt when looking for a leader
+FOLLOWER_BACKLOG = 10000  # unsent ops per follower before it is dropped and must resync
+
+def parse_addresses(spec):
+    """'HOST:PORT,HOST:PORT' -> [(host, port), ...]"""
+    addresses = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        host, port = item.rsplit(':', 1)
+        addresses.append((host or '127.0.0.1', int(port)))
+    return addresses
+
+class ReplicationServer:
+    """Leader side: streams every state mutation to the connected followers.
+
+    A follower that connects first gets a snapshot of the whole state and
+    then every op published after it. ``snapshot`` is called while
+    holding ``lock``, the same lock under which ops are published, so no
+    op can fall between the two. Each follower has its own sender thread
+    and queue, so a slow follower never blocks the tracker; one that
+    falls FOLLOWER_BACKLOG ops behind is disconnected and resyncs from a
+    fresh snapshot when it reconnects.
+    """
+
+    def __init__(self, address, lock, snapshot):
+        self.lock = lock
+        self.snapshot = snapshot
+        self.followers = []  # queue.Queue per connected follower
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(address)
+        self.sock.listen(16)
+
+    def start(self):
+        threading.Thread(target=self.accept_followers, daemon=True).start()
+
+    def accept_followers(self):
+        while True:
+            try:
+                conn, addr = self.sock.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            backlog = queue.Queue(maxsize=FOLLOWER_BACKLOG)
+            with self.lock:
+                backlog.put_nowait({"type": "snapshot", "state": self.snapshot()})
+                self.followers.append(backlog)
+            print(f"DEBUG: Follower {addr} attached")
+            threading.Thread(target=self.feed_follower, args=(conn, addr, backlog), daemon=True).start()
+
+    def publish(self, op):
+        # Caller holds self.lock, which orders ops exactly as they were applied.
+        for backlog in list(self.followers):
+            try:
+                backlog.put_nowait({"type": "op", "op": op})
+            except queue.Full:
+                self.followers.remove(backlog)
+                print("DEBUG: Dropped a follower that fell too far behind")
+
+    def feed_follower(self, conn, addr, backlog):
+        try:
+            while backlog in self.followers:
+                try:
+                    frame = backlog.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    frame = {"type": "ping"}
+                batch = [frame]
+                # Drain whatever else is queued into the same write
+                while len(batch) < 256:
+                    try:
+                        batch.append(backlog.get_nowait())
+                    except queue.Empty:
+                        break
+                conn.sendall(b''.join(encode_frame(json.dumps(item).encode()) for item in batch))
+        except OSError as e:
+            print(f"DEBUG: Follower {addr} detached: {e}")
+        finally:
+            with self.lock:
+                if backlog in self.followers:
+                    self.followers.remove(backlog)
+            conn.close()
+
+class Follower:
+    """Follower side: mirrors a leader and takes over when every tracker ahead of it is gone.
+
+    ``ahead`` lists the replication addresses of the trackers that rank
+    above this one, best first. Only a leader listens on its replication
+    address, so whichever of them accepts a connection is the current
+    leader. When none does, the follower waits ``rank * FAILOVER_TIMEOUT``
+    (rank = len(ahead)) from losing its leader and then calls
+    ``promote``. The first follower therefore takes over after one
+    timeout, and the next one would take over only if the first has not
+    started leading a timeout later.
+    """
+
+    def __init__(self, ahead, load, apply, promote, timeout=FAILOVER_TIMEOUT):
+        self.ahead = ahead
+        self.load = load
+        self.apply = apply
+        self.promote = promote
+        self.timeout = timeout
+        self.leader = None
+        self.stats = {"snapshots": 0, "ops": 0, "leaders_lost": 0}
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        lost = time.monotonic()
+        patience = self.timeout * len(self.ahead)
+        while True:
+            for address in self.ahead:
+                conn = self.connect(address)
+                if conn is None:
+                    continue
+                self.follow(conn, address)
+                lost = time.monotonic()
+                self.stats["leaders_lost"] += 1
+                break
+            else:
+                if time.monotonic() - lost >= patience:
+                    self.leader = None
+                    self.promote()
+                    return
+                time.sleep(CONNECT_TIMEOUT / 2)
+
+    def connect(self, address):
+        try:
+            return socket.create_connection(address, timeout=CONNECT_TIMEOUT)
+        except OSError:
+            return None
+
+    def follow(self, conn, address):
+        self.leader = address
+        print(f"DEBUG: Following leader at {address[0]}:{address[1]}")
+        conn.settimeout(self.timeout)
+        reader = FrameReader(conn)
+        try:
+            while True:
+                frame = decode_json(reader.read())
+                if frame["type"] == "op":
+                    self.apply(frame["op"])
+                    self.stats["ops"] += 1
+                elif frame["type"] == "snapshot":
+                    self.load(frame["state"])
+                    self.stats["snapshots"] += 1
+        except (OSError, ConnectionError, FramingError, ValueError) as e:
+            print(f"DEBUG: Lost leader {address[0]}:{address[1]}: {e or 'timed out'}")
+        finally:
+            conn.close()
+            self.leader = None
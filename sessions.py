@@ -0,0 +1,241 @@
+# sessions.py
+
+import json
+import queue
+import selectors
+import socket
+import sys
+import threading
+import time
+from player import Player, RECV_BUFFER, HEARTBEAT_INTERVAL
+from ai import MonteCarloAI, TURN_BUDGET
+from transport import decode_json, MAX_DATAGRAM
+from chunking import Chunker, Reassembler, is_chunk, is_nack
+from batching import split_batches
+
+TURN_WORKERS = 4  # threads playing the turns of every session on a host
+
+class SessionHost:
+    """Many player identities (sessions) on one t_port/p_port pair, driven by one loop.
+
+    A session is a headless AI Player built with ``host=self``. It keeps
+    its own game state, handlers and per-game workers, but sends on the
+    host's sockets and never receives by itself. Its session id is the
+    username it registers. Sessions name themselves in every tracker
+    request and the tracker echoes that in its reply. The tracker, the
+    relay and peers name the recipient of everything they send.
+
+    ``run`` is the host's loop. It reads both sockets and routes each
+    message by its session id: tracker replies go to the session's reply
+    queue and everything else to its receive path. A message that names
+    no session (spectator batches) goes to every session, and their
+    handlers ignore what is not theirs. The same loop sends the
+    heartbeats of all sessions as batch envelopes. TURN_WORKERS threads
+    play the turns of all sessions.
+
+    Sessions share the host's address and so its tracker rate limit. The
+    tracker also limits each registered session within it, and charges
+    heartbeat batches a fraction of a request per heartbeat.
+    """
+
+    def __init__(self, tracker_ip, tracker_port, t_port, p_port, group_number, rcvbuf=RECV_BUFFER,
+                 ai_budget=TURN_BUDGET, fallbacks=''):
+        self.tracker_ip = tracker_ip
+        self.tracker_port = tracker_port
+        self.t_port = t_port
+        self.p_port = p_port
+        self.group_number = group_number
+        self.ai_budget = ai_budget
+        self.fallbacks = fallbacks
+        self.t_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.t_sock.bind(('', self.t_port))
+        except OSError as e:
+            print(f"Error binding t_port {self.t_port}: {e}")
+            sys.exit(1)
+        self.p_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.p_sock.bind(('', self.p_port))
+        except OSError as e:
+            print(f"Error binding p_port {self.p_port}: {e}")
+            sys.exit(1)
+        self.p_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.t_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.chunker = Chunker()
+        self.peer_chunks = Reassembler(self.p_sock)
+        self.reply_chunks = Reassembler(self.t_sock)
+        self.sessions = {}  # username -> Player
+        self.lock = threading.Lock()
+        self.turns = queue.Queue()  # sessions whose turn it is, put by Player.turn_ready
+        self.playing = set()        # sessions a turn worker is playing for right now
+        self.requeued = set()       # of those, the ones whose next turn_ready came in meanwhile
+        self.running = True
+        self.stats = {"received": 0, "routed": 0, "fanned_out": 0, "unrouted": 0, "malformed": 0,
+                      "heartbeat_batches": 0}
+
+    def add(self, username):
+        """Register a new session as ``username``; returns its Player, or None if registration failed."""
+        session = Player(self.tracker_ip, self.tracker_port, self.t_port, self.p_port, self.group_number,
+                         transport='udp', ai=False, fallbacks=self.fallbacks, host=self)
+        session.ai = MonteCarloAI(workers=0, budget=self.ai_budget)
+        with self.lock:
+            if username in self.sessions:
+                print(f"Session {username} already exists.")
+                return None
+            self.sessions[username] = session  # before register, so its reply can be routed
+        session.register(username)
+        if session.name != username:
+            with self.lock:
+                self.sessions.pop(username, None)
+            return None
+        return session
+
+    def remove(self, username):
+        with self.lock:
+            session = self.sessions.get(username)
+        if session is None:
+            return
+        session.de_register()
+        session.running = False
+        with self.lock:
+            self.sessions.pop(username, None)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        for _ in range(TURN_WORKERS):
+            threading.Thread(target=self.play_turns, daemon=True).start()
+        selector = selectors.DefaultSelector()
+        selector.register(self.t_sock, selectors.EVENT_READ, self.route_reply)
+        selector.register(self.p_sock, selectors.EVENT_READ, self.route_message)
+        # Datagrams land in one reused buffer per socket and are decoded in
+        # place, since decoding finishes before the next receive.
+        buffers = {self.t_sock: bytearray(MAX_DATAGRAM), self.p_sock: bytearray(MAX_DATAGRAM)}
+        next_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+        while self.running:
+            for key, _ in selector.select(max(0.0, next_heartbeat - time.monotonic())):
+                sock = key.fileobj
+                try:
+                    nbytes, addr = sock.recvfrom_into(buffers[sock])
+                except OSError as e:
+                    print(f"Error receiving on the session host: {e}")
+                    continue
+                self.stats["received"] += 1
+                msg = self.decode(sock, memoryview(buffers[sock])[:nbytes], addr)
+                if msg is not None:
+                    key.data(msg, addr)
+            if time.monotonic() >= next_heartbeat:
+                self.send_heartbeats()
+                next_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+        selector.close()
+
+    def decode(self, sock, packet, addr):
+        if is_chunk(packet):
+            chunks = self.reply_chunks if sock is self.t_sock else self.peer_chunks
+            packet = chunks.add(packet, addr)
+            if packet is None:
+                return None
+        elif is_nack(packet):
+            self.chunker.resend(sock, packet, addr)
+            return None
+        try:
+            return decode_json(packet)
+        except ValueError:
+            self.stats["malformed"] += 1
+            return None
+
+    def route_reply(self, msg, addr):
+        session = self.sessions.get(msg.get('session'))
+        if session is None:
+            self.stats["unrouted"] += 1
+            return
+        session.replies.put(msg)
+        self.stats["routed"] += 1
+
+    def route_message(self, msg, addr):
+        if msg.get('command') == 'routed_batch':
+            # One relay datagram may carry messages for several of our sessions.
+            by_session = {}
+            for inner in msg.get('messages', []):
+                by_session.setdefault(inner.get('session'), []).append(inner)
+            for name, messages in by_session.items():
+                self.deliver(name, {'command': 'routed_batch', 'messages': messages}, addr)
+        elif msg.get('session') is None:
+            for session in list(self.sessions.values()):
+                session.deliver(msg, addr)
+            self.stats["fanned_out"] += 1
+        else:
+            self.deliver(msg['session'], msg, addr)
+
+    def deliver(self, name, msg, addr):
+        session = self.sessions.get(name)
+        if session is None:
+            self.stats["unrouted"] += 1
+            return
+        session.deliver(msg, addr)
+        self.stats["routed"] += 1
+
+    def send_heartbeats(self):
+        """One batch envelope per tracker for every registered session, instead of a datagram each."""
+        by_tracker = {}
+        for session in list(self.sessions.values()):
+            if not session.name or not session.running:
+                continue
+            by_tracker.setdefault((session.tracker_ip, session.tracker_port), []).append(
+                {'command': 'heartbeat', 'player': session.name})
+            if session.route_addr and session.in_game:
+                session.attach_route()
+        for address, msgs in by_tracker.items():
+            for envelope in split_batches(msgs):
+                try:
+                    self.t_sock.sendto(json.dumps(envelope).encode(), address)
+                    self.stats["heartbeat_batches"] += 1
+                except OSError as e:
+                    print(f"Heartbeats to {address[0]}:{address[1]} failed: {e}")
+
+    def play_turns(self):
+        while self.running:
+            session = self.turns.get()
+            with self.lock:
+                if session in self.playing:
+                    # Queued again while its turn is being played: the
+                    # worker playing it queues it once more when done.
+                    self.requeued.add(session)
+                    continue
+                self.playing.add(session)
+            try:
+                if session.running and session.in_game and session.is_my_turn:
+                    session.take_turn()
+            except Exception as e:
+                print(f"Error playing {session.name}'s turn: {e}")
+            finally:
+                with self.lock:
+                    self.playing.discard(session)
+                    if session in self.requeued:
+                        self.requeued.discard(session)
+                        self.turns.put(session)
+
+    def metrics(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+        return dict(self.stats, sessions=len(sessions), in_game=sum(session.in_game for session in sessions),
+                    chunking=dict(self.chunker.stats))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (7, 8):
+        print("Usage: python sessions.py <tracker_ip> <tracker_port> <t_port> <p_port> <group_number> "
+              "<sessions> [name_prefix]")
+        sys.exit(1)
+
+    host = SessionHost(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5]))
+    prefix = sys.argv[7] if len(sys.argv) == 8 else f"session{sys.argv[4]}_"
+    host.start()
+    registered = sum(host.add(f"{prefix}{i}") is not None for i in range(int(sys.argv[6])))
+    print(f"{registered} sessions registered on ports {host.t_port}/{host.p_port}")
+    try:
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+    except KeyboardInterrupt:
+        print("\nShutting down the session host.")
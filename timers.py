@@ -0,0 +1,103 @@
+# timers.py
+
+import math
+import threading
+import time
+
+class TimingWheel:
+    """Hashed timing wheel: O(1) schedule/cancel and O(1) amortised expiry per tick.
+
+    Keys live in the slot ``ticks`` ahead of the cursor. Delays longer than the
+    wheel are kept in their slot with a remaining round count. The wheel is not
+    thread-safe; callers hold their own lock around it.
+    """
+
+    def __init__(self, slots):
+        self.slots = [dict() for _ in range(slots)]  # key -> [rounds, value]
+        self.positions = {}  # key -> slot index
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def schedule(self, key, ticks, value=None):
+        """(Re)arm ``key`` to expire after ``ticks`` ticks (minimum one)."""
+        self.cancel(key)
+        ticks = max(1, int(ticks))
+        rounds, offset = divmod(ticks - 1, len(self.slots))
+        slot = (self.cursor + offset + 1) % len(self.slots)
+        self.slots[slot][key] = [rounds, value]
+        self.positions[key] = slot
+
+    def cancel(self, key):
+        slot = self.positions.pop(key, None)
+        if slot is None:
+            return False
+        del self.slots[slot][key]
+        return True
+
+    def advance(self):
+        """Move the cursor one tick and return the list of expired (key, value) pairs."""
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        bucket = self.slots[self.cursor]
+        expired = []
+        for key, entry in list(bucket.items()):
+            if entry[0] > 0:
+                entry[0] -= 1
+                continue
+            del bucket[key]
+            del self.positions[key]
+            expired.append((key, entry[1]))
+        return expired
+
+class Timers:
+    """One-shot callbacks on a TimingWheel, fired by a single daemon thread.
+
+    Meant to be shared: every pending deadline in the process is one wheel
+    entry instead of a thread or a timed wait of its own. A callback never
+    fires early and at most one tick late. Callbacks run on the timer
+    thread, so they must be quick.
+    """
+
+    def __init__(self, tick=0.05, slots=1200):
+        self.tick = tick
+        self.wheel = TimingWheel(slots)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stats = {"scheduled": 0, "fired": 0, "cancelled": 0}
+
+    def schedule(self, key, delay, callback):
+        """(Re)arm ``key`` to call ``callback()`` after ``delay`` seconds."""
+        with self.lock:
+            # +1: the first advance comes anywhere within the current tick
+            self.wheel.schedule(key, math.ceil(delay / self.tick) + 1, callback)
+            self.stats["scheduled"] += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="timers", daemon=True)
+                self.thread.start()
+
+    def cancel(self, key):
+        with self.lock:
+            cancelled = self.wheel.cancel(key)
+            if cancelled:
+                self.stats["cancelled"] += 1
+            return cancelled
+
+    def run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            with self.lock:
+                expired = self.wheel.advance()
+                self.stats["fired"] += len(expired)
+            for key, callback in expired:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"DEBUG: Timer {key} failed: {e}")
@@ -0,0 +1,89 @@
+# timers_test.py
+
+import threading
+import unittest
+from timers import TimingWheel, Timers
+
+class TimingWheelTest(unittest.TestCase):
+    def advance(self, wheel, ticks):
+        """Advance ``ticks`` times; returns {tick: expired keys} for the ticks that expired any."""
+        fired = {}
+        for tick in range(1, ticks + 1):
+            expired = wheel.advance()
+            if expired:
+                fired[tick] = sorted(key for key, _ in expired)
+        return fired
+
+    def test_expires_after_its_ticks(self):
+        wheel = TimingWheel(8)
+        wheel.schedule('a', 3, 'value')
+        self.assertEqual(wheel.advance(), [])
+        self.assertEqual(wheel.advance(), [])
+        self.assertEqual(wheel.advance(), [('a', 'value')])
+        self.assertNotIn('a', wheel)
+        self.assertEqual(len(wheel), 0)
+
+    def test_at_least_one_tick(self):
+        wheel = TimingWheel(8)
+        wheel.schedule('now', 0)
+        wheel.schedule('past', -5)
+        self.assertEqual(self.advance(wheel, 2), {1: ['now', 'past']})
+
+    def test_delays_longer_than_the_wheel(self):
+        wheel = TimingWheel(4)
+        wheel.schedule('a', 4)
+        wheel.schedule('b', 5)
+        wheel.schedule('c', 13)
+        self.assertEqual(self.advance(wheel, 20), {4: ['a'], 5: ['b'], 13: ['c']})
+
+    def test_schedule_from_a_moved_cursor(self):
+        wheel = TimingWheel(4)
+        self.advance(wheel, 3)
+        wheel.schedule('a', 6)
+        self.assertEqual(self.advance(wheel, 10), {6: ['a']})
+
+    def test_reschedule_replaces(self):
+        wheel = TimingWheel(8)
+        wheel.schedule('a', 2, 'old')
+        wheel.schedule('a', 5, 'new')
+        self.assertEqual(len(wheel), 1)
+        fired = []
+        for _ in range(6):
+            fired.extend(wheel.advance())
+        self.assertEqual(fired, [('a', 'new')])
+
+    def test_cancel(self):
+        wheel = TimingWheel(8)
+        wheel.schedule('a', 2)
+        wheel.schedule('b', 2)
+        self.assertTrue(wheel.cancel('a'))
+        self.assertFalse(wheel.cancel('a'))
+        self.assertFalse(wheel.cancel('missing'))
+        self.assertEqual(self.advance(wheel, 4), {2: ['b']})
+
+class TimersTest(unittest.TestCase):
+    def test_fires_once_and_not_early(self):
+        timers = Timers(tick=0.01, slots=16)
+        fired = threading.Event()
+        timers.schedule('a', 0.05, fired.set)
+        self.assertFalse(fired.wait(0.03))
+        self.assertTrue(fired.wait(1.0))
+        self.assertEqual(timers.stats["fired"], 1)
+
+    def test_cancelled_never_fires(self):
+        timers = Timers(tick=0.01, slots=16)
+        fired = threading.Event()
+        timers.schedule('a', 0.05, fired.set)
+        self.assertTrue(timers.cancel('a'))
+        self.assertFalse(fired.wait(0.15))
+        self.assertEqual(timers.stats["cancelled"], 1)
+
+    def test_failing_callback_does_not_stop_the_thread(self):
+        timers = Timers(tick=0.01, slots=16)
+        fired = threading.Event()
+        timers.schedule('bad', 0.01, lambda: 1 / 0)
+        timers.schedule('good', 0.03, fired.set)
+        self.assertTrue(fired.wait(1.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,72 +1,387 @@
 # tracker.py
 
+import argparse
+import queue
 import socket
 import json
+import math
 import sys
+import random
 import threading
-from common import User, Game
-
-if len(sys.argv) != 2:
-    print("Usage: python tracker.py <port>")
-    sys.exit(1)
+import time
+from common import User, Game, MAX_SEATS
+from admission import AdmissionControl
+from timers import TimingWheel
+from transport import StreamServer, BufferPool, recv_datagram, decode_json
+from chunking import Chunker, Reassembler, is_chunk, is_nack
+from profiling import Profiler, PROFILE_PATH, PROFILE_WINDOW
+from replication import ReplicationServer, Follower, parse_addresses
+from lobby import LobbyFeed, LOBBY_TICK, LOBBY_TTL
 
 HOST = ''
-PORT = int(sys.argv[1])
 
-# Validate port number (Example range: 1500-1999)
-if not (1500 <= PORT <= 1999):
-    print("Port number must be in the range 1500-1999")
-    sys.exit(1)
+# Admission control defaults (all overridable on the command line)
+RATE_LIMIT = 50.0     # sustained requests per second per source address
+RATE_BURST = 100      # burst allowance per source address
+SESSION_RATE = 10.0   # requests per second per registered session, within its source's limit
+SESSION_BURST = 20    # burst allowance per registered session
+QUEUE_SIZE = 1024     # datagrams waiting for a worker before load is shed
+WORKERS = 8           # concurrent command handlers
+MAX_REQUEST = 16384   # bytes per receive buffer; every queued datagram holds one until a worker is done
+
+# Liveness: players send a heartbeat every few seconds; anyone silent for
+# HEARTBEAT_TIMEOUT seconds is evicted and any game they were in is reclaimed.
+HEARTBEAT_TICK = 1.0      # seconds per timing-wheel tick
+HEARTBEAT_TIMEOUT = 15    # ticks without a heartbeat before eviction
+
+# Turn deadlines: the dealer skips a seat that has not finished its turn in
+# time. start_game may set its own limit within the bounds; 0 disables it.
+TURN_TIMEOUT = 60.0       # default seconds per turn
+MAX_TURN_TIMEOUT = 3600.0
+
+# Commands that never get a reply, alone or as a whole batch (is_one_way).
+# Stream clients read replies strictly in order, so these must not be
+# answered with BUSY either.
+ONE_WAY_COMMANDS = {"heartbeat"}
+
+# Batch envelopes: {"command": "batch", "commands": [...]} runs every command
+# under one acquisition of the tracker lock and answers {"responses": [...]}
+# in order. Each command counts against the sender's rate limit; one-way
+# commands (a multi-session client's heartbeats) count ONE_WAY_COST each.
+MAX_BATCH = 256
+ONE_WAY_COST = 1 / 16
+
+# Commands a follower answers itself; everything else gets NOT_LEADER so
+# clients move on to the next tracker in their list.
+FOLLOWER_COMMANDS = {"metrics"}
 
 class Tracker:
-    def __init__(self):
+    def __init__(self, heartbeat_timeout=HEARTBEAT_TIMEOUT, relay_addr=None, route=False):
         self.players = []
         self.games = []
         self.game_id_counter = 0
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()  # reentrant: a batch holds it across its commands
+        self.heartbeat_timeout = heartbeat_timeout
+        self.liveness = TimingWheel(heartbeat_timeout)
+        self.metrics = {"players_evicted": 0, "games_reclaimed": 0, "heartbeats": 0}
+        self.admission = None  # AdmissionControl installed by main()
+        self.relay_addr = relay_addr  # (ip, port) of the spectator relay, if any
+        self.route = route and relay_addr is not None  # carry in-game traffic through the relay
+        # Every mutation bumps the generation; read commands are served as
+        # pre-encoded bytes while it stays unchanged. Starting from the clock
+        # keeps versions from a previous tracker run from matching this one.
+        self.generation = int(time.time() * 1000)
+        self.response_cache = {}  # command -> (generation, encoded response)
+        self.metrics.update(cache_hits=0, cache_misses=0, not_modified=0, batches=0, batched_commands=0)
+        self.chunker = Chunker()  # replies above one chunk go out in MTU-sized chunks
+        self.profiler = None  # Profiler installed by main() when --profile or CARDGAME_PROFILE is set
+        # Replication: the leader publishes every mutation to its followers;
+        # a follower mirrors them and only serves FOLLOWER_COMMANDS.
+        self.leader = True
+        self.port = None          # our client-facing port, announced to players on takeover
+        self.replica_addr = None  # where this tracker accepts followers once it leads
+        self.replicator = None    # ReplicationServer while leading with a replica_addr
+        self.follower = None      # Follower while following
+        # Lobby subscribers get roster and game changes pushed once per tick
+        # instead of polling query_players / query_games.
+        self.lobby = LobbyFeed(self.lock, self.lobby_snapshot, lambda: self.generation, self.chunker)
 
     def handle_command(self, msg, addr, sock):
+        if self.profiler:
+            self.profiler.start()
+            started = time.perf_counter()
+            self.dispatch_command(msg, addr, sock)
+            self.profiler.record(msg.get('command', ''), time.perf_counter() - started)
+        else:
+            self.dispatch_command(msg, addr, sock)
+
+    def dispatch_command(self, msg, addr, sock):
         command = msg.get('command', '')
         method = getattr(self, f"cmd_{command}", None)
-        if method:
+        if not self.leader and command not in FOLLOWER_COMMANDS:
+            if is_one_way(msg):
+                return
+            leader = self.follower.leader if self.follower else None
+            response = {"status": "NOT_LEADER", "message": "This tracker is a follower", "leader": leader}
+        elif command == 'batch':
+            response = self.run_batch(msg, addr)
+        elif command in ('subscribe_lobby', 'unsubscribe_lobby'):
+            response = getattr(self, command)(msg, addr)
+        elif method:
             try:
                 response = method(msg)
             except Exception as e:
                 response = {"status": "FAILURE", "message": f"Error processing command: {e}"}
+            if (command == 'register' and self.admission and msg.get('session') is not None
+                    and msg['session'] == msg.get('player') and response.get('status') == 'SUCCESS'):
+                self.admission.add_session(addr, msg['session'])
         else:
             error_msg = {"status": "FAILURE", "message": "Unknown command"}
             response = error_msg
-        sock.sendto(json.dumps(response).encode(), addr)
+        if response is None:
+            return
+        if not isinstance(response, bytes):
+            response = json.dumps(response).encode()
+        if msg.get('session') is not None:
+            # Echoed so a multi-session client can route the reply on its shared socket.
+            response = b'%s, "session": %s}' % (response[:-1], json.dumps(msg['session']).encode())
+        if isinstance(sock, socket.socket):
+            self.chunker.sendto(sock, response, addr)
+        else:
+            sock.sendto(response, addr)  # a stream connection frames any size
+
+    def run_batch(self, msg, addr):
+        commands = msg.get('commands')
+        if not isinstance(commands, list) or not 0 < len(commands) <= MAX_BATCH:
+            return {"status": "FAILURE", "message": f"A batch needs 1 to {MAX_BATCH} commands"}
+        one_way = [isinstance(inner, dict) and inner.get('command') in ONE_WAY_COMMANDS for inner in commands]
+        if self.admission:
+            # Admission already took one token for the envelope.
+            cost = sum(ONE_WAY_COST if flag else 1 for flag in one_way) - 1
+            if cost > 0:
+                self.admission.charge(addr, cost, msg.get('session'))
+        parts = []
+        with self.lock:
+            for inner in commands:
+                name = inner.get('command', '') if isinstance(inner, dict) else ''
+                method = getattr(self, f"cmd_{name}", None)
+                if method is None:
+                    response = {"status": "FAILURE", "message": "Unknown command in batch"}
+                else:
+                    try:
+                        response = method(inner)
+                    except Exception as e:
+                        response = {"status": "FAILURE", "message": f"Error processing command: {e}"}
+                # Cached read replies are already encoded; splice them in as they are.
+                parts.append(b'null' if response is None else
+                             response if isinstance(response, bytes) else json.dumps(response).encode())
+            self.metrics["batches"] += 1
+            self.metrics["batched_commands"] += len(commands)
+        if is_one_way(msg):
+            return None  # e.g. a multi-session client's heartbeats
+        return b'{"status": "SUCCESS", "responses": [' + b', '.join(parts) + b']}'
 
     def cmd_register(self, msg):
         return self.register_player(msg['player'], msg['IPv4'], msg['t-port'], msg['p-port'])
 
     def cmd_query_players(self, msg):
-        return self.query_players()
+        return self.cached_response('query_players', msg, self.query_players)
 
     def cmd_start_game(self, msg):
         return self.start_game(
             msg['player'], 
             msg['n'], 
             msg['#holes'], 
-            msg.get('allow_steal', False)  # Handle allow_steal
+            msg.get('allow_steal', False),  # Handle allow_steal
+            msg.get('seed'),  # Optional: reproduce a previous game's deals
+            msg.get('turn_timeout', TURN_TIMEOUT)
         )
 
     def cmd_query_games(self, msg):
-        return self.query_games()
+        return self.cached_response('query_games', msg, self.query_games)
 
     def cmd_end(self, msg):
         return self.end_game(msg['game-identifier'], msg['player'])
 
+    def cmd_migrate_dealer(self, msg):
+        return self.migrate_dealer(msg['game-identifier'], msg['player'], msg['previous'])
+
     def cmd_de_register(self, msg):
         return self.de_register(msg['player'])
 
+    def cmd_heartbeat(self, msg):
+        # Fire-and-forget: replying would land in the player's request/response socket.
+        self.heartbeat(msg['player'], msg.get('lobby_version'))
+        return None
+
+    def subscribe_lobby(self, msg, addr):
+        """Push lobby changes to a registered player's game port, or else to the requesting address.
+
+        Re-sending the command renews the subscription; a ``version`` that
+        is not the one last pushed gets a full snapshot on the next tick.
+        """
+        username = msg.get('player')
+        if username:
+            with self.lock:
+                player = next((p for p in self.players if p.username == username), None)
+                if not player:
+                    return {"status": "FAILURE", "message": "Player not registered"}
+                addr = (player.ip, player.p_port)
+        if not self.lobby.subscribe(addr, username, msg.get('version')):
+            return {"status": "BUSY", "message": "Too many lobby subscribers", "retry_after": LOBBY_TTL}
+        return {"status": "SUCCESS", "message": "Subscribed to lobby updates", "tick": LOBBY_TICK,
+                "ttl": LOBBY_TTL}
+
+    def unsubscribe_lobby(self, msg, addr):
+        username = msg.get('player')
+        if username:
+            with self.lock:
+                sub = self.lobby.by_player.get(username)
+            addr = sub.addr if sub else None
+        self.lobby.unsubscribe(addr)
+        return {"status": "SUCCESS", "message": "Unsubscribed from lobby updates"}
+
+    def cmd_metrics(self, msg):
+        with self.lock:
+            response = {
+                "status": "SUCCESS",
+                "metrics": dict(self.metrics),
+                "tracked_players": len(self.liveness),
+                "role": "leader" if self.leader else "follower",
+                "players": len(self.players),
+                "games": len(self.games),
+            }
+            if self.replicator:
+                response["followers"] = len(self.replicator.followers)
+            if self.follower:
+                response["replication"] = dict(self.follower.stats)
+        if self.admission:
+            response["admission"] = self.admission.snapshot()
+        response["chunking"] = dict(self.chunker.stats)
+        response["lobby"] = self.lobby.metrics()
+        if self.profiler:
+            response["handlers"] = self.profiler.timing_summary()
+        return response
+
+    def bump_generation(self):
+        # Caller holds self.lock
+        self.generation += 1
+
+    def replicate(self, op, **fields):
+        # Caller holds self.lock and has just applied the mutation
+        if self.replicator:
+            self.replicator.publish(dict(fields, op=op, generation=self.generation))
+
+    def snapshot_state(self):
+        # Caller holds self.lock
+        return {
+            "generation": self.generation,
+            "game_id_counter": self.game_id_counter,
+            "players": [player.to_dict() for player in self.players],
+            "games": [self.game_record(game) for game in self.games],
+        }
+
+    def game_record(self, game):
+        return {"id": game.id, "players": [player.username for player in game.players], "holes": game.holes,
+                "allow_steal": game.allow_steal, "seed": game.seed, "turn_timeout": game.turn_timeout}
+
+    def load_state(self, state):
+        """Replace everything with a leader's snapshot (follower side)."""
+        with self.lock:
+            self.players = [User(p['username'], p['ip'], p['t_port'], p['p_port'], p['state'])
+                            for p in state['players']]
+            self.games = []
+            for record in state['games']:
+                self.restore_game(record)
+            self.game_id_counter = state['game_id_counter']
+            self.generation = state['generation']
+            self.response_cache.clear()
+        print(f"DEBUG: Loaded leader snapshot: {len(self.players)} players, {len(self.games)} games")
+
+    def restore_game(self, record):
+        # Caller holds self.lock
+        by_name = {player.username: player for player in self.players}
+        players = [by_name[name] for name in record['players']]
+        game = Game(players[0], players, record['id'], record['holes'], record['allow_steal'], record['seed'],
+                    record.get('turn_timeout'))
+        self.games.append(game)
+        return game
+
+    def apply_op(self, op):
+        """Apply one mutation streamed by the leader (follower side)."""
+        with self.lock:
+            getattr(self, f"apply_{op['op']}")(op)
+            self.generation = op['generation']
+
+    def apply_register(self, op):
+        self.players.append(User(op['player'], op['ip'], op['t_port'], op['p_port']))
+
+    def apply_start_game(self, op):
+        game = self.restore_game(op['game'])
+        for player in game.players:
+            player.state = "in-play"
+        self.game_id_counter = op['game']['id'] + 1
+
+    def apply_end_game(self, op):
+        game = next((g for g in self.games if g.id == op['game_id']), None)
+        if game:
+            for player in game.players:
+                player.state = "free"
+            self.games.remove(game)
+
+    def apply_migrate_dealer(self, op):
+        game = next((g for g in self.games if g.id == op['game_id']), None)
+        if game:
+            self.move_dealer(game, op['player'])
+
+    def apply_de_register(self, op):
+        self.players = [p for p in self.players if p.username != op['player']]
+
+    def apply_evict(self, op):
+        self.apply_end_game(op)
+        self.apply_de_register(op)
+
+    def promote(self):
+        """Take over as leader after the previous leader disappeared."""
+        with self.lock:
+            self.leader = True
+            # Heartbeats only ever reached the old leader: give everyone a full timeout.
+            for player in self.players:
+                self.liveness.schedule(player.username, self.heartbeat_timeout)
+            if self.replica_addr:
+                self.replicator = ReplicationServer(self.replica_addr, self.lock, self.snapshot_state)
+                self.replicator.start()
+            players = list(self.players)
+        print(f"DEBUG: Promoted to leader with {len(players)} players and {len(self.games)} games")
+        # Point heartbeats and requests at us straight away rather than after a timeout.
+        for player in players:
+            self.send_message_to_player({"command": "tracker_leader", "port": self.port}, player)
+
+    def follow(self, ahead):
+        """Start as a follower of the first reachable tracker in ``ahead``."""
+        self.leader = False
+        self.follower = Follower(ahead, self.load_state, self.apply_op, self.promote)
+        self.follower.start()
+
+    def lobby_snapshot(self):
+        # Caller holds self.lock
+        return {"version": self.generation, "relay": self.relay_addr,
+                "players": [player.to_dict() for player in self.players],
+                "games": [game.to_dict() for game in self.games]}
+
+    def cached_response(self, name, msg, build):
+        """Serve a read command from the response cache.
+
+        Clients that send the ``version`` they last saw get a small
+        NOT_MODIFIED reply when nothing changed since.
+        """
+        with self.lock:
+            generation = self.generation
+            if msg.get('version') == generation:
+                self.metrics["not_modified"] += 1
+                return {"status": "NOT_MODIFIED", "version": generation}
+            cached = self.response_cache.get(name)
+            if cached and cached[0] == generation:
+                self.metrics["cache_hits"] += 1
+                return cached[1]
+            self.metrics["cache_misses"] += 1
+        response = build()
+        encoded = json.dumps(response).encode()
+        with self.lock:
+            if response["version"] == self.generation:
+                self.response_cache[name] = (response["version"], encoded)
+        return encoded
+
     def register_player(self, username, ip, t_port, p_port):
         with self.lock:
             if any(player.username == username for player in self.players):
                 return {"status": "FAILURE", "message": "Duplicate username"}
             new_player = User(username, ip, t_port, p_port)
             self.players.append(new_player)
+            self.bump_generation()
+            self.lobby.player_changed(new_player)
+            self.liveness.schedule(username, self.heartbeat_timeout)
+            self.replicate("register", player=username, ip=ip, t_port=t_port, p_port=p_port)
             print(f"DEBUG: Registered player: {new_player}")
             return {"status": "SUCCESS", "message": "Registered successfully"}
 
@@ -74,11 +389,12 @@ class Tracker:
         with self.lock:
             return {
                 "status": "SUCCESS",
+                "version": self.generation,
                 "count": len(self.players),
                 "players": [player.to_dict() for player in self.players]
             }
 
-    def start_game(self, dealer_name, n, holes, allow_steal=False):
+    def start_game(self, dealer_name, n, holes, allow_steal=False, seed=None, turn_timeout=TURN_TIMEOUT):
         with self.lock:
             dealer = next((p for p in self.players if p.username == dealer_name and p.state == "free"), None)
             if not dealer:
@@ -86,19 +402,29 @@ class Tracker:
             try:
                 n = int(n)
                 holes = int(holes)
-            except ValueError:
-                return {"status": "FAILURE", "message": "Invalid number format for players or holes"}
-            if n < 1 or n > 3:
-                return {"status": "FAILURE", "message": "Invalid number of players"}
+                seed = random.getrandbits(32) if seed is None else int(seed)
+                turn_timeout = float(turn_timeout or 0)
+            except (TypeError, ValueError):
+                return {"status": "FAILURE", "message": "Invalid number format for players, holes or turn timeout"}
+            if not 0 <= seed < 2 ** 32:
+                return {"status": "FAILURE", "message": "Seed must be a 32-bit unsigned integer"}
+            if not 0 <= turn_timeout <= MAX_TURN_TIMEOUT:
+                return {"status": "FAILURE", "message": f"Turn timeout must be 0 to {MAX_TURN_TIMEOUT:g} seconds"}
+            if n < 1 or n > MAX_SEATS - 1:
+                return {"status": "FAILURE", "message": f"Invalid number of players (1 to {MAX_SEATS - 1} besides the dealer)"}
             available_players = [p for p in self.players if p.state == "free" and p.username != dealer_name]
             if len(available_players) < n:
                 return {"status": "FAILURE", "message": "Not enough available players"}
             players = [dealer] + available_players[:n]
             for player in players:
                 player.state = "in-play"
-            game = Game(dealer, players, self.game_id_counter, holes, allow_steal)
+                self.lobby.player_changed(player)
+            game = Game(dealer, players, self.game_id_counter, holes, allow_steal, seed, turn_timeout or None)
             self.games.append(game)
+            self.bump_generation()
+            self.lobby.game_changed(game)
             self.game_id_counter += 1
+            self.replicate("start_game", game=self.game_record(game))
             print(f"DEBUG: Started game {game.id} with players: {[p.username for p in players]} and holes: {holes} (Steal Allowed: {allow_steal})")
 
             # Notify all assigned players about the game assignment
@@ -108,8 +434,16 @@ class Tracker:
                 "dealer": dealer.to_dict(),
                 "players": [player.to_dict() for player in players],
                 "holes": holes,
-                "allow_steal": allow_steal  # Include allow_steal
+                "allow_steal": allow_steal,  # Include allow_steal
+                "relay": self.relay_addr,
+                "route": self.relay_addr if self.route else None,
+                "seed": seed,
+                "turn_timeout": game.turn_timeout
             }
+            if self.route:
+                # The relay must know the roster before the first seat attaches.
+                self.send_to_relay({"command": "open_game", "game_id": game.id,
+                                    "players": [player.username for player in players]})
             for player in players:
                 self.send_message_to_player(assigned_game_msg, player)
 
@@ -119,22 +453,34 @@ class Tracker:
                 "game_id": game.id,
                 "players": [player.to_dict() for player in players],
                 "holes": holes,
-                "allow_steal": allow_steal
+                "allow_steal": allow_steal,
+                "seed": seed,
+                "turn_timeout": game.turn_timeout
             }
 
     def send_message_to_player(self, msg, player):
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.sendto(json.dumps(msg).encode(), (player.ip, player.p_port))
+            # Players sharing one socket (sessions.py) are told apart by username.
+            sock.sendto(json.dumps(dict(msg, session=player.username)).encode(), (player.ip, player.p_port))
             sock.close()
-            print(f"DEBUG: Sent assigned_game message to {player.username} at {player.ip}:{player.p_port}")
+            print(f"DEBUG: Sent {msg.get('command')} message to {player.username} at {player.ip}:{player.p_port}")
         except Exception as e:
-            print(f"DEBUG: Failed to send assigned_game to {player.username}: {e}")
+            print(f"DEBUG: Failed to send {msg.get('command')} to {player.username}: {e}")
+
+    def send_to_relay(self, msg):
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(json.dumps(msg).encode(), self.relay_addr)
+        except Exception as e:
+            print(f"DEBUG: Failed to send {msg.get('command')} to the relay: {e}")
 
     def query_games(self):
         with self.lock:
             return {
                 "status": "SUCCESS",
+                "version": self.generation,
+                "relay": self.relay_addr,
                 "count": len(self.games),
                 "games": [game.to_dict() for game in self.games]
             }
@@ -151,10 +497,52 @@ class Tracker:
                 return {"status": "FAILURE", "message": "Game not found or dealer mismatch"}
             for player in game.players:
                 player.state = "free"
+                self.lobby.player_changed(player)
             self.games.remove(game)
+            self.bump_generation()
+            self.lobby.game_changed(game, removed=True)
+            self.replicate("end_game", game_id=game.id)
+            if self.route:
+                self.send_to_relay({"command": "close_game", "game_id": game.id})
             print(f"DEBUG: Ended game {game.id}")
             return {"status": "SUCCESS", "message": "Game ended successfully"}
 
+    def migrate_dealer(self, game_id, username, previous):
+        """Hand a game to the seat that took over dealing from ``previous``.
+
+        The previous dealer stopped sending its game snapshots to that seat,
+        so it leaves the game: evicting it later no longer reclaims the game,
+        and the new dealer's ``end`` matches.
+        """
+        with self.lock:
+            try:
+                game_id = int(game_id)
+            except (TypeError, ValueError):
+                return {"status": "FAILURE", "message": "Invalid game identifier"}
+
+            game = next((g for g in self.games if g.id == game_id and g.dealer.username == previous), None)
+            if not game:
+                return {"status": "FAILURE", "message": "Game not found or dealer mismatch"}
+            if username == previous or all(p.username != username for p in game.players):
+                return {"status": "FAILURE", "message": "Player is not another seat of this game"}
+            old = self.move_dealer(game, username)
+            self.bump_generation()
+            self.lobby.game_changed(game)
+            self.lobby.player_changed(old)
+            self.replicate("migrate_dealer", game_id=game.id, player=username)
+            print(f"DEBUG: {username} took over game {game.id} from dealer {previous}")
+            return {"status": "SUCCESS", "message": "Dealer changed", "game_id": game.id}
+
+    def move_dealer(self, game, username):
+        # Caller holds self.lock. The new dealer goes first, as dealers do in game records.
+        old = game.dealer
+        players = [p for p in game.players if p is not old]
+        first = next(i for i, p in enumerate(players) if p.username == username)
+        game.players = players[first:] + players[:first]
+        game.dealer = game.players[0]
+        old.state = "free"
+        return old
+
     def de_register(self, username):
         with self.lock:
             player = next((p for p in self.players if p.username == username), None)
@@ -163,28 +551,254 @@ class Tracker:
             if player.state == "in-play":
                 return {"status": "FAILURE", "message": "Player is in an ongoing game"}
             self.players.remove(player)
+            self.liveness.cancel(username)
+            self.bump_generation()
+            self.lobby.player_changed(player, removed=True)
+            self.replicate("de_register", player=username)
             print(f"DEBUG: Deregistered player: {player.username}")
             return {"status": "SUCCESS", "message": "Deregistered successfully"}
 
-def main():
-    tracker = Tracker()
+    def heartbeat(self, username, lobby_version=None):
+        with self.lock:
+            if username in self.liveness:
+                self.liveness.schedule(username, self.heartbeat_timeout)
+                self.metrics["heartbeats"] += 1
+                # Subscribed players report their lobby version with every
+                # heartbeat; one we do not know yet (e.g. after a failover) is
+                # subscribed again here.
+                if lobby_version is not None and not self.lobby.renew(username, lobby_version):
+                    player = next((p for p in self.players if p.username == username), None)
+                    if player:
+                        self.lobby.subscribe((player.ip, player.p_port), username)
+
+    def expire_tick(self):
+        """Advance the liveness wheel one tick and evict every player whose heartbeat lapsed."""
+        with self.lock:
+            for username, _ in self.liveness.advance():
+                self.evict_player(username)
+
+    def evict_player(self, username):
+        # Caller holds self.lock
+        player = next((p for p in self.players if p.username == username), None)
+        if not player:
+            return
+        game = next((g for g in self.games if player in g.players), None)
+        if game:
+            self.reclaim_game(game, f"Player {username} stopped responding", skip=player)
+        self.players.remove(player)
+        self.bump_generation()
+        self.lobby.player_changed(player, removed=True)
+        self.replicate("evict", player=username, game_id=game.id if game else None)
+        self.metrics["players_evicted"] += 1
+        print(f"DEBUG: Evicted player {username} (no heartbeat for {self.heartbeat_timeout} ticks)")
+
+    def reclaim_game(self, game, reason, skip=None):
+        # Caller holds self.lock
+        self.games.remove(game)
+        self.bump_generation()
+        self.lobby.game_changed(game, removed=True)
+        end_msg = {"command": "end_game", "game_id": game.id, "reason": reason}
+        for player in game.players:
+            player.state = "free"
+            self.lobby.player_changed(player)
+            if player is not skip:
+                self.send_message_to_player(end_msg, player)
+        if self.route:
+            self.send_to_relay({"command": "close_game", "game_id": game.id})
+        self.metrics["games_reclaimed"] += 1
+        print(f"DEBUG: Reclaimed game {game.id}: {reason}")
+
+def run_expiry(tracker, stop_event):
+    while not stop_event.wait(HEARTBEAT_TICK):
+        tracker.expire_tick()
+
+def run_worker(tracker, ingress, sock, pool):
+    while True:
+        buffer, view, addr = ingress.get()
+        try:
+            msg = decode_json(view)
+        except ValueError as e:
+            msg = None
+            print(f"DEBUG: Malformed datagram from {addr}: {e}")
+        finally:
+            # Decoded into a fresh object: the buffer can take the next datagram.
+            view.release()
+            if buffer is not None:  # None for a request reassembled from chunks
+                pool.release(buffer)
+        if msg is None:
+            continue
+        try:
+            tracker.handle_command(msg, addr, sock)
+        except Exception as e:
+            print(f"DEBUG: Error handling datagram from {addr}: {e}")
+
+def serve_stream_request(tracker, payload, addr, conn):
+    """One framed request from a persistent TCP/Unix connection, handled on that connection's thread."""
+    try:
+        msg = decode_json(payload)
+    except ValueError:
+        conn.sendto(json.dumps({"status": "FAILURE", "message": "Malformed request"}).encode(), addr)
+        return
+    admitted, retry_after = tracker.admission.admit(addr)
+    if not admitted:
+        if not is_one_way(msg):
+            send_busy(conn, addr, "Rate limit exceeded", max(retry_after, 0.001))
+        return
+    tracker.handle_command(msg, addr, conn)
+
+def is_one_way(msg):
+    """Whether ``msg`` gets no reply: a one-way command, or a batch made only of them."""
+    if msg.get('command') != 'batch':
+        return msg.get('command') in ONE_WAY_COMMANDS
+    commands = msg.get('commands')
+    return (isinstance(commands, list) and 0 < len(commands) <= MAX_BATCH and
+            all(isinstance(inner, dict) and inner.get('command') in ONE_WAY_COMMANDS for inner in commands))
+
+def peek_session(buffer, size):
+    """The session a request names, found without decoding it (sessions.py adds it last).
+
+    Client-chosen, so admission only uses it to find a bucket that was set
+    up when the tracker registered that session from the same address.
+    """
+    start = buffer.find(b'"session": "', 0, size)
+    if start < 0:
+        return None
+    end = buffer.find(b'"', start + 12, size)
+    try:
+        return json.loads(buffer[start + 11:end + 1]) if end > 0 else None
+    except ValueError:
+        return None
+
+def send_busy(sock, addr, message, retry_after, session=None):
+    # Rounded up: a client that waits exactly this long must find a token.
+    response = {"status": "BUSY", "message": message, "retry_after": math.ceil(retry_after * 1000) / 1000}
+    if session is not None:
+        response["session"] = session
+    try:
+        sock.sendto(json.dumps(response).encode(), addr)
+    except OSError:
+        pass
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(usage="python tracker.py <port> [options]")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT, help="requests per second per source address")
+    parser.add_argument("--burst", type=int, default=RATE_BURST, help="burst size per source address")
+    parser.add_argument("--session-rate", type=float, default=SESSION_RATE,
+                        help="requests per second per session registered from a source address")
+    parser.add_argument("--session-burst", type=int, default=SESSION_BURST, help="burst size per registered session")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="ingress queue bound before shedding")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="concurrent command handlers")
+    parser.add_argument("--relay", metavar="HOST:PORT", help="spectator relay advertised to games")
+    parser.add_argument("--route", action="store_true", help="route in-game messages through the relay (needs --relay)")
+    parser.add_argument("--tcp", action="store_true", help="also accept framed requests over TCP on the same port")
+    parser.add_argument("--unix", metavar="PATH", help="also accept framed requests on this Unix socket")
+    parser.add_argument("--replica-port", type=int,
+                        help="stream state changes to followers on this TCP port while leading")
+    parser.add_argument("--follow", metavar="HOST:PORT[,HOST:PORT...]",
+                        help="start as a follower of these replication addresses (higher priority first)")
+    parser.add_argument("--profile", metavar="PREFIX", default=PROFILE_PATH,
+                        help="sample handle_command and write PREFIX.collapsed / PREFIX.timings.json")
+    parser.add_argument("--profile-window", type=float, default=PROFILE_WINDOW,
+                        help="seconds to sample after the first request")
+    args = parser.parse_args(argv)
+    # Validate port number (Example range: 1500-1999)
+    if not (1500 <= args.port <= 1999):
+        print("Port number must be in the range 1500-1999")
+        sys.exit(1)
+    return args
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    relay_addr = None
+    if args.relay:
+        relay_host, relay_port = args.relay.rsplit(':', 1)
+        relay_addr = (relay_host, int(relay_port))
+    if args.route and not relay_addr:
+        print("--route requires --relay")
+        sys.exit(1)
+    tracker = Tracker(relay_addr=relay_addr, route=args.route)
+    tracker.port = args.port
+    if args.replica_port:
+        tracker.replica_addr = (HOST, args.replica_port)
+    if args.follow:
+        tracker.follow(parse_addresses(args.follow))
+        print(f"DEBUG: Tracker following {args.follow}")
+    elif tracker.replica_addr:
+        tracker.replicator = ReplicationServer(tracker.replica_addr, tracker.lock, tracker.snapshot_state)
+        tracker.replicator.start()
+        print(f"DEBUG: Tracker replicating on port {args.replica_port}")
+    if args.profile:
+        tracker.profiler = Profiler(args.profile, {"handle_command"}, window=args.profile_window)
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
-        sock.bind((HOST, PORT))
+        sock.bind((HOST, args.port))
     except Exception as e:
-        print(f"DEBUG: Failed to bind to port {PORT}: {e}")
+        print(f"DEBUG: Failed to bind to port {args.port}: {e}")
         sys.exit(1)
-    print(f"DEBUG: Tracker listening on port {PORT}")
+    print(f"DEBUG: Tracker listening on port {args.port}")
+    admission = AdmissionControl(args.rate, args.burst, session_rate=args.session_rate,
+                                 session_burst=args.session_burst)
+    tracker.admission = admission
+    ingress = queue.Queue(maxsize=args.queue_size)
+    # Datagrams are received straight into pooled buffers and decoded by the
+    # workers, so the receive loop allocates nothing per datagram.
+    pool = BufferPool(MAX_REQUEST, capacity=args.queue_size + args.workers + 1)
+    for _ in range(args.workers):
+        threading.Thread(target=run_worker, args=(tracker, ingress, sock, pool), daemon=True).start()
+    # Requests above one chunk (large batch envelopes) arrive in chunks.
+    chunks = Reassembler(sock)
+    tracker.lobby.start(sock)
+    stop_event = threading.Event()
+    threading.Thread(target=run_expiry, args=(tracker, stop_event), daemon=True).start()
+    # Stream transports run next to UDP and share the tracker and its admission control.
+    handler = lambda payload, addr, conn: serve_stream_request(tracker, payload, addr, conn)
+    if args.tcp:
+        StreamServer('tcp', (HOST, args.port), handler).start()
+        print(f"DEBUG: Tracker accepting TCP connections on port {args.port}")
+    if args.unix:
+        StreamServer('unix', args.unix, handler).start()
+        print(f"DEBUG: Tracker accepting Unix-socket connections on {args.unix}")
     while True:
         try:
-            data, addr = sock.recvfrom(65535)
-            msg = json.loads(data.decode())
-            threading.Thread(target=tracker.handle_command, args=(msg, addr, sock), daemon=True).start()
+            buffer, view, addr = recv_datagram(sock, pool)
+            session = peek_session(buffer, len(view))
+            admitted, retry_after = admission.admit(addr, session)
+            if admitted and is_nack(view):
+                # A client missed chunks of a large reply: cheap enough to answer inline.
+                tracker.chunker.resend(sock, view, addr)
+                view.release()
+                pool.release(buffer)
+                continue
+            if admitted and is_chunk(view):
+                payload = chunks.add(view, addr)
+                view.release()
+                pool.release(buffer)
+                if payload is None:
+                    continue
+                buffer, view = None, memoryview(payload)
+            if not admitted or (buffer is not None and len(view) == MAX_REQUEST):
+                view.release()
+                pool.release(buffer)
+                if not admitted and retry_after:
+                    send_busy(sock, addr, "Rate limit exceeded", retry_after, session)
+                elif admitted:
+                    sock.sendto(json.dumps({"status": "FAILURE", "message": "Request too large"}).encode(), addr)
+                continue
+            try:
+                ingress.put_nowait((buffer, view, addr))
+            except queue.Full:
+                view.release()
+                if buffer is not None:
+                    pool.release(buffer)
+                admission.record_shed()
+                send_busy(sock, addr, "Tracker overloaded", 0.1, session)
         except KeyboardInterrupt:
             print("\nDEBUG: Shutting down the tracker.")
             break
         except Exception as e:
             print(f"DEBUG: Error receiving data: {e}")
+    stop_event.set()
     sock.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+# transport.py
+
+import json
+import os
+import socket
+import struct
+import threading
+
+HEADER = struct.Struct('>I')   # 4-byte big-endian payload length before every frame
+MAX_FRAME = 16 * 1024 * 1024   # refuse frames larger than this (a corrupt or hostile length)
+MAX_DATAGRAM = 65535           # largest UDP payload; receive buffers for peers are this big
+
+class FramingError(Exception):
+    pass
+
+def encode_frame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+def decode_json(view):
+    """json.loads straight from a received buffer (bytes, bytearray or memoryview) without an intermediate copy.
+
+    Malformed input raises ValueError (UnicodeDecodeError is one).
+    """
+    return json.loads(str(view, 'utf-8'))
+
+class BufferPool:
+    """Receive buffers handed from a receive loop to worker threads and back.
+
+    Buffers are created on demand and kept for reuse, up to ``capacity``
+    of them; past that a released buffer is simply dropped. ``stats``
+    counts how often a receive needed a fresh allocation. list.pop and
+    list.append are atomic, so the pool needs no lock of its own.
+    """
+
+    def __init__(self, size=MAX_DATAGRAM, capacity=64):
+        self.size = size
+        self.capacity = capacity
+        self.free = []
+        self.stats = {"allocated": 0, "reused": 0}
+
+    def acquire(self):
+        try:
+            buffer = self.free.pop()
+        except IndexError:
+            self.stats["allocated"] += 1
+            return bytearray(self.size)
+        self.stats["reused"] += 1
+        return buffer
+
+    def release(self, buffer):
+        if len(self.free) < self.capacity:
+            self.free.append(buffer)
+
+def recv_datagram(sock, pool):
+    """recvfrom_into a pooled buffer -> (buffer, memoryview of the payload, addr).
+
+    The caller returns ``buffer`` to the pool once it is done with the view.
+    A payload that fills the whole buffer may have been truncated.
+    """
+    buffer = pool.acquire()
+    nbytes, addr = sock.recvfrom_into(buffer)  # on error the buffer is just dropped
+    return buffer, memoryview(buffer)[:nbytes], addr
+
+class FrameReader:
+    """Reads length-prefixed frames from one stream into a reusable buffer.
+
+    ``read`` returns a memoryview of the payload that stays valid until
+    the next ``read``. The buffer is replaced (never resized, which live
+    views would forbid) when a larger frame arrives.
+    """
+
+    def __init__(self, sock, size=4096):
+        self.sock = sock
+        self.buffer = bytearray(size)
+
+    def read(self):
+        self.fill(HEADER.size)
+        (length,) = HEADER.unpack_from(self.buffer)
+        if length > MAX_FRAME:
+            raise FramingError(f"frame of {length} bytes exceeds {MAX_FRAME}")
+        if length > len(self.buffer):
+            self.buffer = bytearray(length)
+        self.fill(length)
+        return memoryview(self.buffer)[:length]
+
+    def fill(self, count):
+        view = memoryview(self.buffer)
+        got = 0
+        while got < count:
+            received = self.sock.recv_into(view[got:count])
+            if not received:
+                raise ConnectionError("connection closed")
+            got += received
+
+def parse_endpoint(spec, default_host='127.0.0.1'):
+    """'udp', 'tcp', 'tcp:HOST:PORT' or 'unix:PATH' -> (kind, address or None)."""
+    kind, _, rest = spec.partition(':')
+    if kind == 'unix':
+        return kind, rest
+    if kind == 'tcp' and rest:
+        host, port = rest.rsplit(':', 1)
+        return kind, (host or default_host, int(port))
+    if kind in ('udp', 'tcp'):
+        return kind, None
+    raise ValueError(f"Unknown transport {spec!r}")
+
+def connect(kind, address):
+    if kind == 'unix':
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.connect(address)
+    return sock
+
+class StreamConnection:
+    """Server side of one persistent client connection.
+
+    ``sendto`` mirrors the datagram socket API so command handlers can
+    reply without knowing which transport the request came in on.
+    """
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.write_lock = threading.Lock()
+
+    def sendto(self, payload, addr=None):
+        with self.write_lock:
+            self.sock.sendall(encode_frame(payload))
+
+class StreamServer:
+    """Accepts persistent TCP or Unix-socket connections and serves framed requests.
+
+    Each connection gets a reader thread that handles its requests one
+    after another, so a client may pipeline any number of requests and
+    reads the replies back in the same order.
+    ``handle(payload, addr, conn)`` processes one request; a command
+    without a reply simply writes nothing.
+    """
+
+    def __init__(self, kind, address, handle):
+        self.kind = kind
+        self.address = address
+        self.handle = handle
+        if kind == 'unix':
+            if os.path.exists(address):
+                os.unlink(address)
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(address)
+        self.sock.listen(128)
+
+    def serve_forever(self):
+        while True:
+            try:
+                client, addr = self.sock.accept()
+            except OSError:
+                return
+            if self.kind != 'unix':
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            else:
+                addr = (self.address, client.fileno())  # unix peers have no address of their own
+            threading.Thread(target=self.serve_connection, args=(StreamConnection(client, addr),), daemon=True).start()
+
+    def serve_connection(self, conn):
+        reader = FrameReader(conn.sock)
+        try:
+            while True:
+                self.handle(reader.read(), conn.addr, conn)
+        except (ConnectionError, FramingError, OSError) as e:
+            print(f"DEBUG: Closing stream connection {conn.addr}: {e}")
+        finally:
+            conn.sock.close()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+class StreamClient:
+    """Client side of a persistent framed connection to the tracker.
+
+    ``request`` sends one message and waits for its reply; ``pipeline``
+    writes several requests back to back before reading the replies in
+    order; ``post`` sends a message that has no reply (heartbeats).
+    """
+
+    def __init__(self, kind, address, timeout=5):
+        self.kind = kind
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+        self.reader = None
+        self.write_lock = threading.Lock()
+        self.request_lock = threading.Lock()
+
+    def ensure_connected(self):
+        if self.sock is None:
+            self.sock = connect(self.kind, self.address)
+            self.sock.settimeout(self.timeout)
+            self.reader = FrameReader(self.sock)
+
+    def post(self, msg):
+        with self.write_lock:
+            self.ensure_connected()
+            self.sock.sendall(encode_frame(json.dumps(msg).encode()))
+
+    def request(self, msg):
+        return self.pipeline([msg])[0]
+
+    def pipeline(self, msgs):
+        with self.request_lock:
+            try:
+                with self.write_lock:
+                    self.ensure_connected()
+                    self.sock.sendall(b''.join(encode_frame(json.dumps(msg).encode()) for msg in msgs))
+                return [decode_json(self.reader.read()) for _ in msgs]
+            except (OSError, ConnectionError, FramingError):
+                # Drop the broken connection; the next call reconnects.
+                self.close()
+                raise
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+                self.reader = None